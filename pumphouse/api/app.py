@@ -18,7 +18,15 @@ from . import handlers
 from . import hooks
 
 from pumphouse import events
+from pumphouse import garbage
+from pumphouse import inventory
+from pumphouse import lanes
+from pumphouse import polling
+from pumphouse import scheduling
+from pumphouse import timeouts
+from pumphouse import transfer
 from pumphouse import utils
+from pumphouse.tasks import reset as reset_tasks
 
 
 def create_app():
@@ -56,6 +64,14 @@ def start_app(config=None, **kwargs):
     app.config.setdefault("PLUGINS", None)
     if config is not None:
         app.config.update(config)
+    inventory.configure(app.config.get("INVENTORY"))
+    lanes.configure(app.config.get("LANES"))
+    scheduling.configure(app.config.get("SCHEDULING"))
+    transfer.configure(app.config.get("TRANSFER"))
+    polling.configure(app.config.get("POLLING"))
+    garbage.configure(app.config.get("COLLECTOR"))
+    timeouts.configure(app.config.get("TIMEOUTS"))
+    reset_tasks.configure(app.config.get("IMAGE_CACHE"))
     events.init_app(app)
     hooks.source.init_app(app)
     hooks.destination.init_app(app)
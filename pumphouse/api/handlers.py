@@ -26,6 +26,7 @@ from . import hooks
 from pumphouse import context
 from pumphouse import events
 from pumphouse import flows
+from pumphouse import scheduling
 from pumphouse.tasks import evacuation
 from pumphouse.tasks import resources as resource_tasks
 from pumphouse.tasks import node as node_tasks
@@ -243,7 +244,8 @@ def migrate_tenant(tenant_id):
         try:
             flow = resource_tasks.migrate_resources(ctx, tenant_id)
             LOG.debug("Migration flow: %s", flow)
-            result = flows.run_flow(flow, ctx.store)
+            priorities = scheduling.get_priorities(ctx, flow)
+            result = flows.run_flow(flow, ctx.store, priorities=priorities)
             LOG.debug("Result of migration: %s", result)
         except taskflow_excs.Empty:
             msg = ("There aren't any resources for migration in the {} tenant"
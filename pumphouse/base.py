@@ -14,6 +14,7 @@
 
 import logging
 
+from pumphouse import inventory
 from pumphouse.tasks import base
 from pumphouse.tasks import reset
 
@@ -73,6 +74,8 @@ class Service(object):
             runner.run()
         except Exception:
             LOG.exception("Unexpected exception during cloud reset")
+        finally:
+            inventory.invalidate(cloud)
 
         events.emit("reset completed", {
             "cloud": cloud.name
@@ -0,0 +1,144 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+
+import collections
+
+# NOTE: Bindings are kept by their keys, so repeated lookups of the same
+#       binding don't format and hash a new name. The registry is cleared
+#       when it's full to keep long-lived processes bounded.
+MAX_REGISTERED = 2 ** 16
+
+registry = {}
+
+
+class Binding(str):
+    """Name of a value of a resource in the store of a migration
+
+    Bindings are keyed by the type and the ID of a resource and the
+    phase of its migration, e.g. `retrieve` or `ensure`, and they are
+    spelled in the single place. Because they are strings, they are
+    used as names of tasks and as keys of `context.store` directly, so
+    lookups and registrations in the store stay dict operations. The
+    same instance is returned for the same key while it's registered.
+
+    :param type_: a type of the resource, e.g. `server`
+    :param id_: an ID of the resource or a tuple of IDs for resources
+                like memberships which are identified by several ones
+    :param phase: a phase of the migration or None for the binding of
+                  the resource itself
+    """
+
+    def __new__(cls, type_, id_, phase=None):
+        key = (cls, type_, id_, phase)
+        try:
+            return registry[key]
+        except KeyError:
+            pass
+        except TypeError:
+            key = None
+        if isinstance(id_, tuple):
+            name = "-".join([type_] + map(str, id_))
+        else:
+            name = "{}-{}".format(type_, id_)
+        if phase is not None:
+            name = "{}-{}".format(name, phase)
+        binding = super(Binding, cls).__new__(cls, name)
+        binding.type = type_
+        binding.id = id_
+        binding.phase = phase
+        if key is None:
+            return binding
+        if len(registry) >= MAX_REGISTERED:
+            registry.clear()
+        return registry.setdefault(key, binding)
+
+    def __getnewargs__(self):
+        return (self.type, self.id, self.phase)
+
+    @property
+    def key(self):
+        return (self.type, self.id, self.phase)
+
+    def to(self, phase):
+        """Return the binding of the same resource in another phase."""
+        return Binding(self.type, self.id, phase)
+
+
+class Store(dict):
+    """Store of a migration indexed by types and phases of bindings
+
+    IDs of resources are indexed by the type and the phase of bindings
+    as they are added, so :func:`find` doesn't scan the whole store.
+    Keys which are not bindings are kept as in a plain dict.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(Store, self).__init__()
+        self.index = collections.defaultdict(dict)
+        self.update(*args, **kwargs)
+
+    def __setitem__(self, key, value):
+        super(Store, self).__setitem__(key, value)
+        if isinstance(key, Binding):
+            self.index[key.type, key.phase][key.id] = None
+
+    def __delitem__(self, key):
+        super(Store, self).__delitem__(key)
+        if isinstance(key, Binding):
+            self.index[key.type, key.phase].pop(key.id, None)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).iteritems():
+            self[key] = value
+
+    def setdefault(self, key, value=None):
+        if key not in self:
+            self[key] = value
+        return self[key]
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        return super(Store, self).pop(key, *default)
+
+    def popitem(self):
+        key, value = super(Store, self).popitem()
+        if isinstance(key, Binding):
+            self.index[key.type, key.phase].pop(key.id, None)
+        return key, value
+
+    def clear(self):
+        super(Store, self).clear()
+        self.index.clear()
+
+    def find(self, type_, phase=None):
+        return list(self.index.get((type_, phase), ()))
+
+
+def find(store, type_, phase=None):
+    """Return IDs of resources of the type registered in the store.
+
+    :param store: a store of a migration, an instance of :class:`Store`
+                  is looked up by its index
+    :param type_: a type of resources
+    :param phase: a phase of bindings
+    """
+    if isinstance(store, Store):
+        return store.find(type_, phase)
+    return [key.id for key in store
+            if isinstance(key, Binding) and key.type == type_ and
+            key.phase == phase]
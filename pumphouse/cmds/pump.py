@@ -16,11 +16,22 @@ import argparse
 import collections
 import logging
 import os
+import sys
+import time
 
 from pumphouse import exceptions
 from pumphouse import utils
 from pumphouse import flows
 from pumphouse import context
+from pumphouse import garbage
+from pumphouse import inventory
+from pumphouse import lanes
+from pumphouse import plan
+from pumphouse import polling
+from pumphouse import scheduling
+from pumphouse import timeouts
+from pumphouse import transfer
+from pumphouse.bindings import Binding
 from pumphouse.tasks import base as tasks_base
 from pumphouse.tasks import evacuation as evacuation_tasks
 from pumphouse.tasks import image as image_tasks
@@ -50,6 +61,29 @@ def load_cloud_driver(is_fake=False):
     return cloud_driver, identity_driver
 
 
+def add_resources_arguments(parser):
+    parser.add_argument("resource",
+                        choices=RESOURCES_MIGRATIONS.keys(),
+                        nargs="?",
+                        default="servers",
+                        help="Specify a type of resources to migrate "
+                             "to the destination cloud.")
+    migrate_filter = parser.add_mutually_exclusive_group(required=True)
+    migrate_filter.add_argument("-i", "--ids",
+                                nargs="*",
+                                help="A list of IDs of resource to migrate to "
+                                     "the destination cloud.")
+    migrate_filter.add_argument("-t", "--tenant",
+                                default=None,
+                                help="Specify ID of a tenant which should be "
+                                     "moved to destination cloud with all "
+                                     "it's resources.")
+    migrate_filter.add_argument("--host",
+                                default=None,
+                                help="Specify hypervisor hostname to filter "
+                                     "servers designated for migration.")
+
+
 def get_parser():
     parser = argparse.ArgumentParser(description="Migration resources through "
                                                  "OpenStack clouds.")
@@ -92,27 +126,26 @@ def get_parser():
                                 type=int,
                                 help="Number of volumes per tenant to create "
                                 "on setup.")
-    migrate_parser.add_argument("resource",
-                                choices=RESOURCES_MIGRATIONS.keys(),
-                                nargs="?",
-                                default="servers",
-                                help="Specify a type of resources to migrate "
-                                     "to the destination cloud.")
-    migrate_filter = migrate_parser.add_mutually_exclusive_group(
-        required=True)
-    migrate_filter.add_argument("-i", "--ids",
-                                nargs="*",
-                                help="A list of IDs of resource to migrate to "
-                                     "the destination cloud.")
-    migrate_filter.add_argument("-t", "--tenant",
+    migrate_parser.add_argument("--wave-servers",
                                 default=None,
-                                help="Specify ID of a tenant which should be "
-                                     "moved to destination cloud with all "
-                                     "it's resources.")
-    migrate_filter.add_argument("--host",
+                                type=int,
+                                help="Migrate resources in waves of at most "
+                                     "this number of servers or other "
+                                     "resources.")
+    migrate_parser.add_argument("--wave-size",
                                 default=None,
-                                help="Specify hypervisor hostname to filter "
-                                     "servers designated for migration.")
+                                type=int,
+                                help="Migrate resources in waves of at most "
+                                     "this number of gigabytes of images "
+                                     "and volumes. Not supported for "
+                                     "identity.")
+    add_resources_arguments(migrate_parser)
+    plan_parser = subparsers.add_parser("plan",
+                                        help="Estimate amount of data and "
+                                             "duration of a migration "
+                                             "without performing it.")
+    plan_parser.set_defaults(action="plan")
+    add_resources_arguments(plan_parser)
     cleanup_parser = subparsers.add_parser("cleanup",
                                            help="Remove resources from a "
                                                 "destination cloud.")
@@ -140,6 +173,14 @@ def get_parser():
                               type=int,
                               help="Number of volumes per tenant to create "
                               "on setup.")
+    resume_parser = subparsers.add_parser("resume",
+                                          help="Continue an interrupted "
+                                               "migration from the point "
+                                               "where it stopped.")
+    resume_parser.set_defaults(action="resume")
+    resume_parser.add_argument("job",
+                               help="The ID of the job which was logged "
+                                    "when the migration started.")
     evacuate_parser = subparsers.add_parser("evacuate",
                                             help="Evacuate instances from "
                                                  "the given host.")
@@ -171,16 +212,35 @@ def migrate_volumes(ctx, flow, ids):
     return flow
 
 
+def unique(ids):
+    result, seen = [], set()
+    for id_ in ids:
+        if id_ not in seen:
+            seen.add(id_)
+            result.append(id_)
+    return result
+
+
 def migrate_images(ctx, flow, ids):
-    for image in ctx.src_cloud.glance.images.list():
-        if image.id in ids:
-            image_flow = image_tasks.migrate_image(
-                ctx, image.id)
-            flow.add(image_flow)
+    ids = unique(ids)
+    found = ctx.inventory.prefetch(ctx.inventory.get_image, ids)
+    for image_id in ids:
+        if image_id not in found:
+            LOG.warning("Image %s is not found, skipped", image_id)
+            continue
+        if Binding("image", image_id) in ctx.store:
+            LOG.info("Image %s is migrated as a part of another image",
+                     image_id)
+            continue
+        image_flow = image_tasks.migrate_image(
+            ctx, image_id)
+        flow.add(image_flow)
     return flow
 
 
 def migrate_identity(ctx, flow, ids):
+    ids = unique(ids)
+    ctx.inventory.prefetch(ctx.inventory.prefetch_identity, ids)
     for tenant_id in ids:
         _, identity_flow = identity_tasks.migrate_identity(
             ctx, tenant_id)
@@ -189,6 +249,8 @@ def migrate_identity(ctx, flow, ids):
 
 
 def migrate_resources(ctx, flow, ids):
+    ids = unique(ids)
+    ctx.inventory.prefetch(ctx.inventory.prefetch_resources, ids)
     for tenant_id in ids:
         resources_flow = resources_tasks.migrate_resources(
             ctx, tenant_id)
@@ -196,6 +258,106 @@ def migrate_resources(ctx, flow, ids):
     return flow
 
 
+def migrate_servers(ctx, flow, servers):
+    flow.add(resources_tasks.migrate_servers(ctx, servers[0].id, servers))
+    return flow
+
+
+SIZED_RESOURCES = ("resources", "images", "volumes")
+
+PREFETCHES = {
+    "images": "get_image",
+    "identity": "prefetch_identity",
+    "resources": "prefetch_resources",
+}
+
+
+def get_prefetch(ctx, resource_type):
+    """Return a callable which prefetches a list of IDs or None."""
+    name = PREFETCHES.get(resource_type)
+    if name is None:
+        return None
+    fetch = getattr(ctx.inventory, name)
+    return lambda ids: ctx.inventory.prefetch(fetch, unique(ids))
+
+
+def get_wave_items(ctx, resource_type, ids):
+    ids = unique(ids)
+    inventory = ctx.inventory
+    if resource_type == "resources":
+        inventory.prefetch(inventory.prefetch_resources, ids)
+        for tenant_id in ids:
+            for server in inventory.list_servers(tenant_id):
+                yield server, plan.get_server_size(inventory, server)
+    elif resource_type == "images":
+        for image_id in inventory.prefetch(inventory.get_image, ids):
+            image = inventory.get_image(image_id)
+            yield image_id, image.get("size") or 0
+    elif resource_type == "volumes":
+        for volume_id in inventory.prefetch(inventory.get_volume, ids):
+            volume = inventory.get_volume(volume_id)
+            yield volume_id, volume.size * plan.GiB
+    else:
+        for id_ in ids:
+            yield id_, 0
+
+
+def migrate_waves(ctx, resource_type, ids, max_items, max_size,
+                  backend=None, book=None):
+    """Migrate resources by waves instead of a single flow.
+
+    :returns: the number of bytes of images and volumes of resources
+    """
+    if resource_type == "resources":
+        build = migrate_servers
+    else:
+        build = RESOURCES_MIGRATIONS[resource_type]
+    items = list(get_wave_items(ctx, resource_type, ids))
+    flows.run_waves(ctx, "migrate-{}".format(resource_type), build, items,
+                    max_items=max_items, max_size=max_size,
+                    backend=backend, book=book)
+    return sum(size for _, size in items)
+
+
+def migrate(ctx, resource_type, ids, wave_servers, wave_size, history,
+            backend=None, book=None):
+    """Migrate resources in a single flow or by waves.
+
+    :param wave_servers: a maximum number of items in a wave or None
+    :param wave_size: a maximum size of a wave in gigabytes or None
+    :param history: a history of migrations to record the run to
+    :param backend: a persistence backend or None
+    :param book: a logbook of the job or None
+
+    Intermediate resources collected in background are deleted before
+    the function returns.
+    """
+    started = time.time()
+    try:
+        if wave_servers or wave_size:
+            max_size = wave_size and wave_size * plan.GiB
+            size = migrate_waves(ctx, resource_type, ids, wave_servers,
+                                 max_size, backend=backend, book=book)
+        else:
+            flow = graph_flow.Flow("migrate-resources")
+            build = RESOURCES_MIGRATIONS[resource_type]
+            if book is not None:
+                flow = flows.keep_items(
+                    ctx, flow, build, ids, backend, book,
+                    prefetch=get_prefetch(ctx, resource_type))
+            else:
+                flow = build(ctx, flow, ids)
+            size = None
+            if history.path is not None:
+                size = plan.make_plan(ctx, flow)["bytes"]
+            priorities = scheduling.get_priorities(ctx, flow)
+            flows.run_flow(flow, ctx.store, backend=backend, book=book,
+                           priorities=priorities)
+        history.record(size, time.time() - started)
+    finally:
+        garbage.collector.finish(clouds=(ctx.src_cloud, ctx.dst_cloud))
+
+
 def get_ids_by_tenant(cloud, resource_type, tenant_id):
 
     '''This function implements migration strategy 'tenant'
@@ -309,6 +471,7 @@ def setup(plugins, events, cloud, target,
     })
     runner.add(setup_workload.create)
     runner.run()
+    inventory.invalidate(cloud)
 
 
 def cleanup(plugins, events, cloud, target):
@@ -318,26 +481,52 @@ def cleanup(plugins, events, cloud, target):
                                            {"id": cloud.name})
     runner.add(cleanup_workload.delete)
     runner.run()
+    inventory.invalidate(cloud)
 
 
 def main():
     args = get_parser().parse_args()
 
     utils.configure_logging(args.config)
+    inventory.configure(args.config.get("INVENTORY"))
+    lanes.configure(args.config.get("LANES"))
+    scheduling.configure(args.config.get("SCHEDULING"))
+    transfer.configure(args.config.get("TRANSFER"))
+    polling.configure(args.config.get("POLLING"))
+    garbage.configure(args.config.get("COLLECTOR"))
+    timeouts.configure(args.config.get("TIMEOUTS"))
+    reset_tasks.configure(args.config.get("IMAGE_CACHE"))
 
     events = Events()
     Cloud, Identity = load_cloud_driver(is_fake=args.fake)
     clouds_config = args.config["CLOUDS"]
     plugins_config = args.config["PLUGINS"]
-    if args.action == "migrate":
+    history = plan.from_config(args.config.get("PLANNING"))
+    backend = flows.get_backend(args.config.get("PERSISTENCE"))
+    if args.action == "resume":
+        if backend is None:
+            raise exceptions.UsageError("Missing PERSISTENCE configuration")
+        book = flows.load_job(backend, args.job)
+        src = init_client(clouds_config["source"],
+                          "source",
+                          Cloud,
+                          Identity)
+        dst = init_client(clouds_config["destination"],
+                          "destination",
+                          Cloud,
+                          Identity)
+        ctx = context.Context(plugins_config, src, dst)
+        job = book.meta
+        migrate(ctx, job["resource"], job["ids"], job.get("wave_servers"),
+                job.get("wave_size"), history, backend=backend, book=book)
+    elif args.action in ("migrate", "plan"):
         flow = graph_flow.Flow("migrate-resources")
-        store = {}
         src_config = clouds_config["source"]
         src = init_client(src_config,
                           "source",
                           Cloud,
                           Identity)
-        if args.setup:
+        if args.action == "migrate" and args.setup:
             workloads = clouds_config["source"].get("workloads", {})
             setup(plugins_config, events, src, "source",
                   args.num_tenants, args.num_servers, args.num_volumes,
@@ -357,13 +546,32 @@ def main():
         else:
             raise exceptions.UsageError("Missing tenant ID")
         ctx = context.Context(plugins_config, src, dst)
+        if args.action == "migrate" and not args.dump:
+            if args.wave_size and args.resource not in SIZED_RESOURCES:
+                raise exceptions.UsageError(
+                    "Waves of {} can't be limited by size"
+                    .format(args.resource))
+            book = None
+            if backend is not None:
+                book = flows.create_job(backend,
+                                        action=args.action,
+                                        resource=args.resource,
+                                        ids=ids,
+                                        wave_servers=args.wave_servers,
+                                        wave_size=args.wave_size)
+                LOG.info("Run 'pumphouse resume %s' to continue the "
+                         "migration if it is interrupted", book.uuid)
+            migrate(ctx, args.resource, ids, args.wave_servers,
+                    args.wave_size, history, backend=backend, book=book)
+            return 0
         resources_flow = migrate_function(ctx, flow, ids)
         if (args.dump):
             with open(args.dump, "w") as f:
                 utils.dump_flow(resources_flow, f, True)
             return 0
-
-        flows.run_flow(resources_flow, ctx.store)
+        migration_plan = plan.make_plan(ctx, resources_flow)
+        plan.dump_plan(migration_plan, history, sys.stdout)
+        return 0
     elif args.action == "cleanup":
         cloud_config = clouds_config[args.target]
         cloud = init_client(cloud_config,
@@ -14,16 +14,25 @@
 
 import logging
 
+from pumphouse import bindings
+from pumphouse import inventory as inventory_
+
 
 LOG = logging.getLogger(__name__)
 
 
 class Context(object):
-    def __init__(self, config, src_cloud, dst_cloud, store=None):
+    def __init__(self, config, src_cloud, dst_cloud, store=None,
+                 inventory=None):
         self.config = config
         self.src_cloud = src_cloud
         self.dst_cloud = dst_cloud
         if store is None:
-            self.store = {}
+            self.store = bindings.Store()
         else:
             self.store = store
+        if inventory is None:
+            self.inventory = inventory_.SourceInventory(src_cloud)
+        else:
+            self.inventory = inventory
+        self.image_index = inventory_.ImageIndex(dst_cloud)
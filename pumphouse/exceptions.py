@@ -68,6 +68,10 @@ class Conflict(Error):
     pass
 
 
+class ChecksumMismatch(Error):
+    pass
+
+
 class ConfigError(Error):
     pass
 
@@ -36,7 +36,8 @@ class AttrDict(dict):
         self.manager = manager
 
     def to_dict(self):
-        return self.copy()
+        return dict((key, value) for key, value in self.iteritems()
+                    if key not in ("manager", "_info"))
 
 
 class TenantAttrDict(AttrDict):
@@ -54,6 +55,7 @@ class Collection(object):
 
 class Resource(object):
     NotFound = Exception
+    attr_dict_class = AttrDict
 
     def __init__(self, cloud, objects):
         self.cloud = cloud
@@ -69,6 +71,9 @@ class Resource(object):
 
     findall = list
 
+    def resource_class(self, manager, info, loaded=False):
+        return self.attr_dict_class(manager, info)
+
     def _update_status(self, obj):
         return obj
 
@@ -482,6 +487,8 @@ class KeystoneResource(Resource):
 
 
 class Tenant(KeystoneResource):
+    attr_dict_class = TenantAttrDict
+
     def create(self, name, **kwargs):
         tenant_uuid = uuid.uuid4()
         tenant = TenantAttrDict(self, {
@@ -12,15 +12,340 @@
 # See the License for the specific language governing permissions and#
 # limitations under the License.
 
+import contextlib
+import json
+import logging
+import os
+import time
+
 import taskflow.engines
+from taskflow import exceptions as taskflow_excs
+from taskflow.patterns import graph_flow
+from taskflow.persistence import backends
+from taskflow.persistence import logbook
+from taskflow import states
 
+from . import bindings
+from . import exceptions
 from . import plugin
+from . import scheduling
+from . import transfer
+from . import utils
+
 
+LOG = logging.getLogger(__name__)
 
 registry = plugin.Registry()
 register = registry.register
 
+NOT_FOUND_EXCS = (
+    exceptions.NotFound,
+    exceptions.nova_excs.NotFound,
+    exceptions.cinder_excs.NotFound,
+    exceptions.glance_excs.NotFound,
+    exceptions.keystone_excs.NotFound,
+)
+
+
+def get_backend(config):
+    """Return a persistence backend configured in the PERSISTENCE section.
+
+    Paths which end with `.db` or `.sqlite` are sqlite files, others are
+    directories.
+
+    :param config: a dict with the `path` to the backend or None
+    :returns: a backend or None if persistence is not configured
+    """
+    if not config or not config.get("path"):
+        return None
+    path = os.path.abspath(config["path"])
+    if path.endswith((".db", ".sqlite")):
+        conf = {"connection": "sqlite:///{}".format(path)}
+    else:
+        conf = {"connection": "dir", "path": path}
+    backend = backends.fetch(conf)
+    with contextlib.closing(backend.get_connection()) as conn:
+        conn.upgrade()
+    return backend
+
+
+def create_job(backend, **meta):
+    """Create a logbook which keeps states of flows of a job.
+
+    :param backend: a persistence backend
+    :param meta: arguments needed to build flows of the job again
+    :returns: a logbook, its `uuid` is the ID of the job
+    """
+    book = logbook.LogBook("pumphouse-{}".format(meta.get("action")))
+    book.meta = meta
+    with contextlib.closing(backend.get_connection()) as conn:
+        conn.save_logbook(book)
+    LOG.info("Job %s is created", book.uuid)
+    return book
+
+
+def load_job(backend, job_id):
+    """Return the logbook of the job created by :func:`create_job`."""
+    with contextlib.closing(backend.get_connection()) as conn:
+        try:
+            return conn.get_logbook(job_id)
+        except taskflow_excs.NotFound:
+            raise exceptions.NotFound("Job {} not found".format(job_id))
+
+
+def run_flow(flow, store, backend=None, book=None, priorities=None):
+    """Run the flow and return values of its store.
+
+    If a backend is given, states and results of tasks are saved in it
+    as they finish. A flow which was run before with the same book and
+    name continues from the point where it was interrupted, finished
+    tasks are not run again.
+
+    :param flow: a flow to run
+    :param store: initial values of the store
+    :param backend: a persistence backend or None
+    :param book: a logbook of the job or None
+    :param priorities: a dict which maps names of tasks to keys of the
+                       order they start in, see
+                       :func:`pumphouse.scheduling.get_priorities`
+
+    The summary of transfers of data made by the flow is logged and
+    sent as the `update` event of the `transfers` type.
+    """
+    flow_detail = None
+    if book is not None:
+        for detail in book:
+            if detail.name == flow.name:
+                LOG.info("Resuming flow %s of job %s", flow.name, book.uuid)
+                flow_detail = detail
+                break
+    kwargs = {}
+    if priorities is not None:
+        kwargs["executor"] = scheduling.scheduler.executor(priorities)
+    engine = taskflow.engines.load(flow, store=store,
+                                   flow_detail=flow_detail, book=book,
+                                   backend=backend, engine_conf='parallel',
+                                   **kwargs)
+    started = time.time()
+    try:
+        engine.run()
+    finally:
+        if priorities is not None:
+            kwargs["executor"].shutdown()
+        transfer.telemetry.report(since=started)
+    return engine.storage.fetch_all()
+
+
+def is_serializable(value):
+    try:
+        json.dumps(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def dump_store(store):
+    """Return serializable values of the store as a list of entries.
+
+    Keys which are bindings are saved with their types, IDs and phases,
+    so they are restored as bindings by :func:`load_store`.
+    """
+    entries = []
+    for name, value in store.iteritems():
+        if not is_serializable(value):
+            continue
+        entry = {"name": name, "value": value}
+        if isinstance(name, bindings.Binding):
+            entry["binding"] = name.key
+        entries.append(entry)
+    return entries
+
+
+def load_store(entries):
+    """Return a dict with the store saved by :func:`dump_store`."""
+    store = {}
+    for entry in entries:
+        name = entry["name"]
+        if entry.get("binding") is not None:
+            type_, id_, phase = entry["binding"]
+            if isinstance(id_, list):
+                id_ = tuple(id_)
+            name = bindings.Binding(type_, id_, phase)
+        store[name] = entry["value"]
+    return store
+
+
+def get_states(book, name):
+    """Return a dict which maps names of tasks of the flow to states."""
+    for detail in book:
+        if detail.name == name:
+            return dict((atom.name, atom.state) for atom in detail)
+    return {}
+
+
+def keep_items(context, flow, build, ids, backend, book, prefetch=None):
+    """Build the flow item by item and keep its plan for the whole job.
+
+    The first run saves IDs of items, names of tasks of each item and the
+    store planned by builders in the book. When the job is resumed, items
+    whose tasks all finished are skipped, so their resources which are
+    already migrated and removed from the source cloud are not looked up
+    again, and items which are gone from the source cloud are skipped.
+    Values of the planned store are restored if builders don't set them.
+    Items to build are prefetched at once before they are built one by
+    one.
+
+    :param context: a migration context
+    :param flow: a flow to add tasks to
+    :param build: a callable which takes the context, a flow and a
+                  list of IDs and adds tasks needed to migrate them
+    :param ids: a list of IDs of items
+    :param backend: a persistence backend
+    :param book: a logbook of the job
+    :param prefetch: a callable which takes a list of IDs and fetches
+                     their resources concurrently or None
+    :returns: the flow
+    """
+    saved = book.meta.setdefault("items", {})
+    if flow.name not in saved:
+        if prefetch is not None:
+            prefetch(ids)
+        tasks = {}
+        for id_ in ids:
+            item_flow = graph_flow.Flow("{}-{}".format(flow.name, id_))
+            build(context, item_flow, [id_])
+            tasks[id_] = [task.name for task in utils.iter_tasks(item_flow)]
+            if len(item_flow):
+                flow.add(item_flow)
+        saved[flow.name] = {
+            "ids": ids,
+            "tasks": tasks,
+            "store": dump_store(context.store),
+        }
+        with contextlib.closing(backend.get_connection()) as conn:
+            conn.save_logbook(book)
+        return flow
+    plan = saved[flow.name]
+    done = get_states(book, flow.name)
+    ids = []
+    for id_ in plan["ids"]:
+        names = plan["tasks"].get(id_, [])
+        if names and all(done.get(name) == states.SUCCESS
+                         for name in names):
+            LOG.info("Item %s of %s is finished, skipped", id_, flow.name)
+        else:
+            ids.append(id_)
+    if prefetch is not None:
+        prefetch(ids)
+    for id_ in ids:
+        item_flow = graph_flow.Flow("{}-{}".format(flow.name, id_))
+        try:
+            build(context, item_flow, [id_])
+        except NOT_FOUND_EXCS:
+            LOG.warning("Item %s of %s is not found, skipped", id_,
+                        flow.name, exc_info=True)
+            continue
+        if len(item_flow):
+            flow.add(item_flow)
+    for name, value in load_store(plan["store"]).iteritems():
+        context.store.setdefault(name, value)
+    return flow
+
+
+def iter_waves(items, max_items=None, max_size=None):
+    """Split items into waves limited by number and total size.
+
+    An item which is bigger than max_size goes into a wave alone.
+
+    :param items: an iterable of (item, size) pairs
+    :param max_items: a maximum number of items in a wave or None
+    :param max_size: a maximum total size of a wave or None
+    :returns: a generator of lists of items
+    """
+    wave, wave_size = [], 0
+    for item, size in items:
+        if wave and ((max_items and len(wave) >= max_items) or
+                     (max_size and wave_size + size > max_size)):
+            yield wave
+            wave, wave_size = [], 0
+        wave.append(item)
+        wave_size += size
+    if wave:
+        yield wave
+
+
+def keep_waves(backend, book, name, waves):
+    """Keep the split of items into waves the same for the whole job.
+
+    The first run saves IDs of items of each wave in the book. When the
+    job is resumed, items are split the same way even if some of them
+    are gone from the source cloud, so each wave continues its own flow.
+    Items which were not known to the first run go into the last wave.
+
+    :param backend: a persistence backend
+    :param book: a logbook of the job
+    :param name: a prefix of names of flows
+    :param waves: an iterable of lists of items
+    :returns: a list of lists of items
+    """
+    waves = list(waves)
+    saved = book.meta.setdefault("waves", {})
+    if name not in saved:
+        saved[name] = [[get_id(item) for item in wave] for wave in waves]
+        with contextlib.closing(backend.get_connection()) as conn:
+            conn.save_logbook(book)
+        return waves
+    items = dict((get_id(item), item) for wave in waves for item in wave)
+    kept = [[items.pop(id_) for id_ in ids if id_ in items]
+            for ids in saved[name]]
+    if items:
+        kept.append([items[id_] for id_ in sorted(items)])
+    return kept
+
+
+def get_id(item):
+    return getattr(item, "id", item)
+
+
+def run_waves(context, name, build, items, max_items=None, max_size=None,
+              backend=None, book=None):
+    """Build and run flows wave by wave.
+
+    Results provided by tasks of each wave are added to the store of
+    the context. Builders of next waves skip tasks of resources and
+    listings which are marked in the store as already added, so their
+    tasks require these results instead. Only the graph of the wave is
+    dropped after it's run.
 
-def run_flow(flow, store):
-    result = taskflow.engines.run(flow, engine_conf='parallel', store=store)
-    return result
+    :param context: a migration context
+    :param name: a prefix of names of flows
+    :param build: a callable which takes the context, a flow and a
+                  list of items and adds tasks needed to migrate them
+    :param items: an iterable of (item, size) pairs
+    :param max_items: a maximum number of items in a wave or None
+    :param max_size: a maximum total size of a wave or None
+    :param backend: a persistence backend or None
+    :param book: a logbook of the job or None
+    """
+    waves = iter_waves(items, max_items=max_items, max_size=max_size)
+    if book is not None:
+        waves = keep_waves(backend, book, name, waves)
+    for number, wave in enumerate(waves):
+        if not wave:
+            LOG.info("Wave %d of %s has no items left, skipped", number, name)
+            continue
+        flow = graph_flow.Flow("{}-wave-{}".format(name, number))
+        build(context, flow, wave)
+        if not len(flow):
+            LOG.info("Wave %d of %s is empty, skipped", number, name)
+            continue
+        LOG.info("Running wave %d of %s with %d items", number, name,
+                 len(wave))
+        priorities = scheduling.get_priorities(context, flow)
+        result = run_flow(flow, context.store, backend=backend, book=book,
+                          priorities=priorities)
+        provided = set(name for task in utils.iter_tasks(flow)
+                       for name in task.provides)
+        context.store.update((name, value)
+                             for name, value in result.iteritems()
+                             if name in provided)
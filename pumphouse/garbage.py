@@ -0,0 +1,347 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import collections
+import json
+import logging
+import os
+import threading
+import time
+
+from pumphouse import exceptions
+from pumphouse import polling
+from pumphouse import timeouts
+
+
+LOG = logging.getLogger(__name__)
+
+GiB = 2 ** 30
+
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_RETRY_INTERVAL = 30
+DEFAULT_TIMEOUT = 600
+DELETE_TIMEOUT = 120
+MAX_ATTEMPTS = 5
+
+# NOTE: Clones of volumes go before snapshots they are created from,
+#       deletions of volumes are waited for, so snapshots are deleted
+#       once their clones are gone. Backups are handed over the newest
+#       first and deleted one by one, cinder doesn't delete a backup
+#       while its incremental backups are being deleted.
+KINDS = collections.OrderedDict([
+    ("image", (
+        lambda cloud: cloud.glance.images,
+        lambda image: image.get("size") or 0,
+        exceptions.glance_excs.NotFound,
+        None,
+        False,
+    )),
+    ("volume", (
+        lambda cloud: cloud.cinder.volumes,
+        lambda volume: volume.size * GiB,
+        exceptions.cinder_excs.NotFound,
+        ("volumes", "error_deleting"),
+        False,
+    )),
+    ("snapshot", (
+        lambda cloud: cloud.cinder.volume_snapshots,
+        lambda snapshot: snapshot.size * GiB,
+        exceptions.cinder_excs.NotFound,
+        None,
+        False,
+    )),
+    ("backup", (
+        lambda cloud: cloud.cinder.backups,
+        lambda backup: backup.size * GiB,
+        exceptions.cinder_excs.NotFound,
+        ("backups", "error"),
+        True,
+    )),
+])
+
+
+class Journal(object):
+    """Intermediate resources which wait for deletion
+
+    Entries are kept in a JSON file, so resources left by an interrupted
+    migration are deleted by the next one with the same clouds. Entries
+    are dropped once resources are deleted or given up on.
+
+    :param path: a path to the file or None to keep nothing
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict(
+            (self.key(e["cloud"], e["kind"], e["id"]), e)
+            for e in self.load())
+
+    def load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except ValueError:
+            LOG.warning("Journal file %s is corrupted, ignored", self.path)
+            return []
+
+    @staticmethod
+    def key(cloud_name, kind, resource_id):
+        return (cloud_name, kind, resource_id)
+
+    def save(self):
+        if self.path is None:
+            return
+        with open(self.path, "w") as f:
+            json.dump(self.entries.values(), f)
+
+    def add(self, cloud_name, kind, resource_id):
+        key = self.key(cloud_name, kind, resource_id)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                return entry
+            entry = self.entries[key] = {
+                "cloud": cloud_name,
+                "kind": kind,
+                "id": resource_id,
+                "state": "pending",
+                "attempts": 0,
+                "retry_at": 0,
+            }
+            self.save()
+            return entry
+
+    def update(self, entry, **kwargs):
+        with self.lock:
+            entry.update(kwargs)
+            if entry["state"] != "pending":
+                self.entries.pop(self.key(entry["cloud"], entry["kind"],
+                                          entry["id"]), None)
+            self.save()
+
+    def pending(self, cloud_names):
+        with self.lock:
+            return [e for e in self.entries.itervalues()
+                    if e["cloud"] in cloud_names]
+
+    def cloud_names(self):
+        with self.lock:
+            return set(e["cloud"] for e in self.entries.itervalues())
+
+
+class Collector(object):
+    """Background deletion of intermediate resources of migrations
+
+    Tasks hand resources over to the collector instead of deleting them
+    and waiting for that, a thread deletes them in batches off the
+    critical path of flows. Failed deletions are retried later.
+
+    :param journal: an instance of :class:`Journal`
+    :param batch_size: a maximum number of resources deleted at once
+    :param retry_interval: a number of seconds between attempts
+    :param timeout: a maximum number of seconds :meth:`finish` waits for
+    """
+
+    def __init__(self, journal=None, batch_size=DEFAULT_BATCH_SIZE,
+                 retry_interval=DEFAULT_RETRY_INTERVAL,
+                 timeout=DEFAULT_TIMEOUT):
+        self.journal = journal or Journal()
+        self.batch_size = batch_size
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self.condition = threading.Condition()
+        self.clouds = {}
+        self.thread = None
+        self.stopped = False
+        self.reclaimed = collections.defaultdict(lambda: {"count": 0,
+                                                          "bytes": 0})
+
+    def add(self, cloud, kind, resource_id):
+        """Schedule deletion of the resource.
+
+        :param cloud: a cloud the resource belongs to
+        :param kind: `image`, `volume`, `snapshot` or `backup`
+        :param resource_id: an ID of the resource
+        """
+        if kind not in KINDS:
+            raise exceptions.NotFound("Unknown kind of resources: {}"
+                                      .format(kind))
+        with self.condition:
+            self.clouds[cloud.name] = cloud
+            self.journal.add(cloud.name, kind, resource_id)
+            LOG.debug("The %s %s is scheduled for deletion", kind,
+                      resource_id)
+            self.start()
+
+    def start(self):
+        if self.thread is None:
+            self.stopped = False
+            self.thread = threading.Thread(target=self.work)
+            self.thread.daemon = True
+            self.thread.start()
+        self.condition.notify()
+
+    def next_batch(self):
+        """Return a batch of resources and a number of seconds to wait."""
+        now = time.time()
+        entries = self.journal.pending(self.clouds)
+        ready = [e for e in entries if e["retry_at"] <= now]
+        if ready:
+            return ready[:self.batch_size], None
+        if entries:
+            return [], min(e["retry_at"] for e in entries) - now
+        return [], self.retry_interval
+
+    def work(self):
+        while True:
+            with self.condition:
+                while True:
+                    batch, delay = self.next_batch()
+                    if batch:
+                        break
+                    if self.stopped and not self.journal.pending(
+                            self.clouds):
+                        self.thread = None
+                        self.condition.notify_all()
+                        return
+                    self.condition.wait(delay)
+            self.collect(batch)
+
+    def collect(self, batch):
+        kinds = list(KINDS)
+        deleting = []
+        for entry in sorted(batch, key=lambda e: kinds.index(e["kind"])):
+            if deleting and deleting[-1][0]["kind"] != entry["kind"]:
+                self.wait(deleting)
+                deleting = []
+            manager, get_size, not_found, _, serial = KINDS[entry["kind"]]
+            manager = manager(self.clouds[entry["cloud"]])
+            size = 0
+            try:
+                size = get_size(manager.get(entry["id"]))
+                manager.delete(entry["id"])
+            except not_found:
+                LOG.debug("The %s %s is already deleted", entry["kind"],
+                          entry["id"])
+            except Exception:
+                self.fail(entry)
+                continue
+            if serial:
+                self.wait([(entry, size)])
+            else:
+                deleting.append((entry, size))
+        self.wait(deleting)
+
+    def wait(self, deleting):
+        """Wait until resources are gone if deletions of their kind are slow.
+
+        :param deleting: a list of entries and sizes of resources
+        """
+        for entry, size in deleting:
+            _, _, not_found, poll, _ = KINDS[entry["kind"]]
+            if poll is not None:
+                cloud = self.clouds[entry["cloud"]]
+                poll_kind, error_value = poll
+                try:
+                    timeouts.wait_for(cloud, "{}-delete".format(entry["kind"]),
+                                      size, DELETE_TIMEOUT, entry["id"],
+                                      polling.watch(cloud, poll_kind),
+                                      error_value=error_value,
+                                      stop_excs=(not_found,))
+                except Exception:
+                    self.fail(entry)
+                    continue
+            LOG.info("The %s %s is deleted, %d bytes reclaimed",
+                     entry["kind"], entry["id"], size)
+            self.journal.update(entry, state="deleted")
+            with self.condition:
+                self.reclaimed[entry["kind"]]["count"] += 1
+                self.reclaimed[entry["kind"]]["bytes"] += size
+
+    def fail(self, entry):
+        attempts = entry["attempts"] + 1
+        if attempts >= MAX_ATTEMPTS:
+            LOG.exception("The %s %s is not deleted after %d attempts",
+                          entry["kind"], entry["id"], attempts)
+            self.journal.update(entry, state="failed", attempts=attempts)
+        else:
+            LOG.warning("The %s %s is not deleted, retry later",
+                        entry["kind"], entry["id"], exc_info=True)
+            self.journal.update(entry, attempts=attempts,
+                                retry_at=time.time() + self.retry_interval)
+
+    def finish(self, timeout=None, clouds=()):
+        """Delete all scheduled resources and report reclaimed space.
+
+        Resources which previous runs left in the journal are deleted
+        only in clouds which are known to the collector, i.e. clouds
+        resources were added in or the given ones.
+
+        :param timeout: a maximum number of seconds to wait for or None
+                        to use the configured one
+        :param clouds: clouds to delete leftovers of previous runs in
+        :returns: a dict which maps kinds of resources to the `count`
+                  of deleted ones and the number of reclaimed `bytes`
+        """
+        with self.condition:
+            names = self.journal.cloud_names()
+            for cloud in clouds:
+                if cloud.name in names:
+                    self.clouds[cloud.name] = cloud
+            if self.journal.pending(self.clouds):
+                self.start()
+            self.stopped = True
+            self.condition.notify()
+            if timeout is None:
+                timeout = self.timeout
+            deadline = time.time() + timeout
+            while self.thread is not None and time.time() < deadline:
+                self.condition.wait(deadline - time.time())
+            if self.thread is not None:
+                LOG.warning("Some intermediate resources are not deleted, "
+                            "they are kept in the journal")
+        return self.report()
+
+    def report(self):
+        with self.condition:
+            reclaimed = dict((kind, dict(counters))
+                             for kind, counters in self.reclaimed.items())
+        for kind, counters in sorted(reclaimed.items()):
+            LOG.info("Deleted %d intermediate %ss, %d bytes reclaimed",
+                     counters["count"], kind, counters["bytes"])
+        return reclaimed
+
+    def configure(self, config):
+        config = config or {}
+        with self.condition:
+            self.journal = Journal(config.get("journal"))
+            self.batch_size = config.get("batch_size", DEFAULT_BATCH_SIZE)
+            self.retry_interval = config.get("retry_interval",
+                                             DEFAULT_RETRY_INTERVAL)
+            self.timeout = config.get("timeout", DEFAULT_TIMEOUT)
+
+
+collector = Collector()
+
+
+def configure(config):
+    """Set the journal and batches of deletions from the COLLECTOR section.
+
+    :param config: a dict with the `journal` path, the `batch_size`, the
+                   `retry_interval` and the `timeout` in seconds or None
+    """
+    collector.configure(config)
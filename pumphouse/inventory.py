@@ -0,0 +1,442 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from concurrent import futures
+
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+
+DEFAULT_TTLS = {
+    "default": 300,
+    "servers": 60,
+}
+
+
+class Snapshot(object):
+    """Listings of clouds shared between migrations
+
+    Results of list calls are kept in memory, so they can be reused by
+    following jobs until they expire. If a path is configured, listings
+    are also kept in a local sqlite database behind the memory, so they
+    survive restarts and are shared with other processes. Only the time
+    of a listing is read from the database on each call, the listing is
+    reloaded when another process has replaced or invalidated it. Each
+    kind of resources has its own time to live in seconds. Listings are
+    identified by the name and the endpoint of the cloud.
+
+    The snapshot is disabled until it is configured and then all calls
+    go directly to the cloud.
+    """
+
+    schema = ("CREATE TABLE IF NOT EXISTS listings ("
+              "cloud TEXT, kind TEXT, updated REAL, data TEXT, "
+              "PRIMARY KEY (cloud, kind))")
+    select_query = ("SELECT updated, data FROM listings "
+                    "WHERE cloud = ? AND kind = ?")
+    updated_query = ("SELECT updated FROM listings "
+                     "WHERE cloud = ? AND kind = ?")
+    replace_query = "INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?)"
+    delete_query = "DELETE FROM listings WHERE cloud = ?"
+
+    def __init__(self, path=None, ttls=None, enabled=True):
+        self.lock = threading.RLock()
+        self.memory = {}
+        self.db = None
+        self.enabled = False
+        if enabled:
+            self.configure(path=path, ttls=ttls)
+
+    def configure(self, path=None, ttls=None):
+        with self.lock:
+            self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+            self.memory.clear()
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+            if path is not None:
+                self.db = sqlite3.connect(path, check_same_thread=False)
+                with self.db:
+                    self.db.execute(self.schema)
+            self.enabled = True
+
+    def ttl(self, kind):
+        return self.ttls.get(kind, self.ttls["default"])
+
+    def cloud_key(self, cloud):
+        return "{}@{}".format(cloud.name, cloud.namespace.auth_url)
+
+    def get(self, cloud, kind, loader):
+        """Return a listing of resources of the kind.
+
+        :param cloud: a cloud which resources are listed
+        :param kind: a string with the kind of resources
+        :param loader: a callable which returns a JSON serializable
+                       listing from the cloud
+        :returns: a copy of the cached listing or a fresh one
+        """
+        if not self.enabled:
+            return loader()
+        key = (self.cloud_key(cloud), kind)
+        with self.lock:
+            entry = self.lookup(key)
+        if entry is not None:
+            updated, data = entry
+            if time.time() - updated < self.ttl(kind):
+                LOG.debug("Listing of %s of %s is taken from snapshot",
+                          kind, key[0])
+                return json.loads(data)
+        listing = loader()
+        self.put(key, listing)
+        return listing
+
+    def lookup(self, key):
+        entry = self.memory.get(key)
+        if self.db is None:
+            return entry
+        row = self.db.execute(self.updated_query, key).fetchone()
+        if row is None:
+            self.memory.pop(key, None)
+            return None
+        if entry is None or entry[0] != row[0]:
+            entry = self.memory[key] = tuple(
+                self.db.execute(self.select_query, key).fetchone())
+        return entry
+
+    def put(self, key, listing):
+        try:
+            data = json.dumps(listing)
+        except (TypeError, ValueError):
+            LOG.warning("Listing %s can't be stored in snapshot", key,
+                        exc_info=True)
+            return
+        entry = (time.time(), data)
+        with self.lock:
+            self.memory[key] = entry
+            if self.db is not None:
+                with self.db:
+                    self.db.execute(self.replace_query, key + entry)
+
+    def invalidate(self, cloud, *kinds):
+        """Forget listings of the cloud.
+
+        :param cloud: a cloud which resources were changed
+        :param kinds: kinds of changed resources, all listings of the
+                      cloud are forgotten if nothing is given
+        """
+        if not self.enabled:
+            return
+        cloud_key = self.cloud_key(cloud)
+        with self.lock:
+            for key in self.memory.keys():
+                if key[0] == cloud_key and (not kinds or key[1] in kinds):
+                    del self.memory[key]
+            if self.db is not None:
+                query, params = self.delete_query, (cloud_key,)
+                if kinds:
+                    query += " AND kind IN ({})".format(
+                        ", ".join("?" * len(kinds)))
+                    params += kinds
+                with self.db:
+                    self.db.execute(query, params)
+
+
+snapshot = Snapshot(enabled=False)
+listing = snapshot.get
+invalidate = snapshot.invalidate
+
+
+def configure(config):
+    """Enable the shared snapshot if it is present in the config.
+
+    :param config: a dict with the `path` of the database and `ttl`
+                   values for kinds of resources or None
+    """
+    if config is not None:
+        snapshot.configure(path=config.get("path"), ttls=config.get("ttl"))
+
+
+class ImageIndex(object):
+    """Images of a cloud indexed by their contents
+
+    Images are listed once on the first lookup and keyed by their
+    checksum, size and name, so copies of images which were migrated
+    before are found without a list query per image. Only active
+    images are indexed, images created by the migration are added to
+    the index after their data is uploaded.
+
+    :param cloud: a destination cloud
+    :type cloud: :class:`pumphouse.cloud.Cloud`
+    """
+
+    def __init__(self, cloud):
+        self.cloud = cloud
+        self.lock = threading.Lock()
+        self.images = None
+
+    @staticmethod
+    def key(image):
+        return (image.get("checksum"), image.get("size"), image.get("name"))
+
+    def load(self):
+        images = {}
+        for image in self.cloud.glance.images.list():
+            if image.get("status") == "active":
+                images.setdefault(self.key(image), dict(image))
+        LOG.debug("Indexed %d images of %s", len(images), self.cloud.name)
+        return images
+
+    def find(self, image):
+        """Return a copy of the image or None if there is no copy.
+
+        :param image: a dict with an image of another cloud
+        """
+        with self.lock:
+            if self.images is None:
+                self.images = self.load()
+            return self.images.get(self.key(image))
+
+    def add(self, image):
+        with self.lock:
+            if self.images is not None:
+                self.images.setdefault(self.key(image), dict(image))
+
+    def remove(self, image):
+        with self.lock:
+            if self.images is not None:
+                copy = self.images.get(self.key(image))
+                if copy is not None and copy["id"] == image["id"]:
+                    del self.images[self.key(image)]
+
+
+class SourceInventory(object):
+    """Indexed view of the source cloud used while flows are built
+
+    Every kind of resource is loaded by a single list call on the first
+    access and indexed by its ID, so builders don't have to issue a get
+    request per server. Resources which are missing in the index (for
+    example, created after the listing) are fetched one by one and
+    added to the index.
+
+    :param cloud: a source cloud
+    :type cloud: :class:`pumphouse.cloud.Cloud`
+    """
+
+    managers = {
+        "servers": ("nova", "servers"),
+        "tenants": ("keystone", "tenants"),
+        "users": ("keystone", "users"),
+        "secgroups": ("nova", "security_groups"),
+        "flavors": ("nova", "flavors"),
+        "networks": ("nova", "networks"),
+        "volumes": ("cinder", "volumes"),
+    }
+
+    def __init__(self, cloud):
+        self.cloud = cloud
+        self.lock = threading.RLock()
+        self.indexes = {}
+        self.images = {}
+        self.roles = {}
+        self.tenants_users = {}
+        self.secgroups_names = None
+
+    def index(self, kind):
+        """Return the index of resources of the kind, load it if needed."""
+        try:
+            return self.indexes[kind]
+        except KeyError:
+            pass
+        with self.lock:
+            if kind not in self.indexes:
+                resources = self.load(kind)
+                index = dict((resource.id, resource)
+                             for resource in resources)
+                LOG.debug("Inventory of %s loaded: %d items",
+                          kind, len(index))
+                self.indexes[kind] = index
+            return self.indexes[kind]
+
+    def load(self, kind):
+        loader = getattr(self, "load_{}".format(kind))
+        if not snapshot.enabled:
+            return loader()
+        # NOTE: The snapshot keeps only raw data of resources, so objects
+        #       are rebuilt with their managers here.
+        service, name = self.managers[kind]
+        manager = getattr(getattr(self.cloud, service), name)
+        infos = listing(self.cloud, kind,
+                        lambda: [resource.to_dict() for resource in loader()])
+        return [manager.resource_class(manager, info, loaded=True)
+                for info in infos]
+
+    def get(self, kind, resource_id, fetch):
+        index = self.index(kind)
+        try:
+            return index[resource_id]
+        except KeyError:
+            resource = index[resource_id] = fetch(resource_id)
+            return resource
+
+    def load_servers(self):
+        return self.cloud.nova.servers.list(search_opts={"all_tenants": 1})
+
+    def load_tenants(self):
+        return self.cloud.keystone.tenants.list()
+
+    def load_users(self):
+        return self.cloud.keystone.users.list()
+
+    def load_secgroups(self):
+        return self.cloud.nova.security_groups.list(
+            search_opts={"all_tenants": 1})
+
+    def load_flavors(self):
+        return self.cloud.nova.flavors.list(is_public=None)
+
+    def load_networks(self):
+        return self.cloud.nova.networks.list()
+
+    def load_volumes(self):
+        return self.cloud.cinder.volumes.list(search_opts={"all_tenants": 1})
+
+    def get_server(self, server_id):
+        return self.get("servers", server_id, self.cloud.nova.servers.get)
+
+    def list_servers(self, tenant_id):
+        return [server for server in self.index("servers").itervalues()
+                if server.tenant_id == tenant_id]
+
+    def get_tenant(self, tenant_id):
+        return self.get("tenants", tenant_id, self.cloud.keystone.tenants.get)
+
+    def get_user(self, user_id):
+        return self.get("users", user_id, self.cloud.keystone.users.get)
+
+    def list_users(self, tenant_id):
+        """Return users which are members of the tenant."""
+        try:
+            return self.tenants_users[tenant_id]
+        except KeyError:
+            users = self.cloud.keystone.users.list(tenant_id)
+            self.tenants_users[tenant_id] = users
+            return users
+
+    def list_roles(self, user_id, tenant_id):
+        """Return roles assigned to the user in the tenant.
+
+        The v2 identity API doesn't have a way to list all assignments
+        at once, so each pair is requested once and remembered.
+        """
+        key = (user_id, tenant_id)
+        try:
+            return self.roles[key]
+        except KeyError:
+            roles = self.cloud.keystone.users.list_roles(user_id,
+                                                         tenant=tenant_id)
+            self.roles[key] = roles
+            return roles
+
+    def get_secgroup(self, secgroup_id):
+        return self.get("secgroups", secgroup_id,
+                        self.cloud.nova.security_groups.get)
+
+    def list_server_secgroups(self, server):
+        """Return security groups of the server.
+
+        Servers refer to their security groups only by names which are
+        unique within a tenant. If any of them can't be found in the
+        index, the server is asked directly.
+        """
+        with self.lock:
+            if self.secgroups_names is None:
+                self.secgroups_names = dict(
+                    ((secgroup.tenant_id, secgroup.name), secgroup)
+                    for secgroup in self.index("secgroups").itervalues())
+        secgroups = []
+        for secgroup in getattr(server, "security_groups", []):
+            key = (server.tenant_id, secgroup["name"])
+            if key not in self.secgroups_names:
+                return server.list_security_group()
+            secgroups.append(self.secgroups_names[key])
+        return secgroups
+
+    def get_flavor(self, flavor_id):
+        return self.get("flavors", flavor_id, self.cloud.nova.flavors.get)
+
+    def get_network(self, network_id):
+        return self.get("networks", network_id, self.cloud.nova.networks.get)
+
+    def get_volume(self, volume_id):
+        return self.get("volumes", volume_id, self.cloud.cinder.volumes.get)
+
+    def get_image(self, image_id):
+        try:
+            return self.images[image_id]
+        except KeyError:
+            image = self.cloud.glance.images.get(image_id)
+            self.images[image_id] = image
+            return image
+
+    def prefetch(self, fetch, ids, workers=DEFAULT_WORKERS):
+        """Call the fetch function for every ID concurrently.
+
+        Results are remembered by the inventory, so flows can be built
+        one by one in the original order afterwards. Errors are logged
+        and left for the builders to raise.
+
+        :param fetch: a callable which takes an ID
+        :param ids: a list of IDs
+        :param workers: a maximum number of concurrent calls
+        :returns: a list of IDs which were fetched successfully
+        """
+        fetched = []
+        if not ids:
+            return fetched
+        executor = futures.ThreadPoolExecutor(max_workers=workers)
+        try:
+            calls = [(id_, executor.submit(fetch, id_)) for id_ in ids]
+            for id_, call in calls:
+                try:
+                    call.result()
+                except Exception:
+                    LOG.warning("Unable to prefetch %s by %s", id_, fetch,
+                                exc_info=True)
+                else:
+                    fetched.append(id_)
+        finally:
+            executor.shutdown(wait=True)
+        return fetched
+
+    def prefetch_identity(self, tenant_id):
+        """Fetch users of the tenant and their roles in it."""
+        for user in self.list_users(tenant_id):
+            self.list_roles(user.id, tenant_id)
+
+    def prefetch_resources(self, tenant_id):
+        """Fetch everything needed to migrate servers of the tenant."""
+        for server in self.list_servers(tenant_id):
+            self.get_tenant(server.tenant_id)
+            self.get_user(server.user_id)
+            self.list_roles(server.user_id, server.tenant_id)
+            self.list_server_secgroups(server)
+            if server.image:
+                self.get_image(server.image["id"])
@@ -0,0 +1,77 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import logging
+import threading
+
+
+LOG = logging.getLogger(__name__)
+
+
+class Lanes(object):
+    """Limits of concurrent calls to services of clouds
+
+    Each lane has a name like `glance.dst` or `nova.boot` and a number
+    of tasks which can be in it at the same time. Lanes which are not
+    configured don't limit anything.
+    """
+
+    def __init__(self, limits=None):
+        self.lock = threading.Lock()
+        self.semaphores = {}
+        self.configure(limits)
+
+    def configure(self, limits):
+        with self.lock:
+            self.semaphores = dict(
+                (name, threading.BoundedSemaphore(limit))
+                for name, limit in (limits or {}).iteritems())
+
+    def acquire(self, names):
+        """Enter lanes with given names.
+
+        Lanes are entered in the same order by all tasks to avoid
+        deadlocks.
+
+        :param names: an iterable of names of lanes
+        :returns: a list of entered semaphores which should be passed
+                  to :meth:`release`
+        """
+        acquired = []
+        for name in sorted(set(names)):
+            semaphore = self.semaphores.get(name)
+            if semaphore is None:
+                continue
+            if not semaphore.acquire(blocking=False):
+                LOG.debug("Waiting for the %s lane", name)
+                semaphore.acquire()
+            acquired.append(semaphore)
+        return acquired
+
+    def release(self, acquired):
+        for semaphore in reversed(acquired):
+            semaphore.release()
+
+
+lanes = Lanes()
+acquire = lanes.acquire
+release = lanes.release
+
+
+def configure(config):
+    """Set limits of lanes from the LANES section.
+
+    :param config: a dict which maps names of lanes to numbers or None
+    """
+    lanes.configure(config)
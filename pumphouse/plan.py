@@ -0,0 +1,186 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import collections
+import json
+import logging
+import os
+import time
+
+from pumphouse import bindings
+from pumphouse import utils
+
+
+LOG = logging.getLogger(__name__)
+
+GiB = 2 ** 30
+MiB = 2 ** 20
+
+DEFAULT_THROUGHPUT = 10 * MiB
+HISTORY_SIZE = 10
+
+DATA_KINDS = ("images", "volumes", "snapshots")
+
+
+class History(object):
+    """Throughput of previous migrations
+
+    Each run records the number of bytes it moved and the time it took
+    into a JSON file. The throughput is averaged over last runs.
+
+    :param path: a path to the file or None to keep nothing
+    """
+
+    def __init__(self, path=None, default=DEFAULT_THROUGHPUT,
+                 size=HISTORY_SIZE):
+        self.path = path
+        self.default = default
+        self.size = size
+
+    def load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except ValueError:
+            LOG.warning("History file %s is corrupted, ignored", self.path)
+            return []
+
+    def record(self, size, duration):
+        if self.path is None or duration <= 0:
+            return
+        runs = self.load()
+        runs.append({
+            "bytes": size,
+            "seconds": duration,
+            "finished": time.time(),
+        })
+        with open(self.path, "w") as f:
+            json.dump(runs[-self.size:], f)
+
+    def throughput(self):
+        """Return the average number of bytes moved per second."""
+        runs = [run for run in self.load()[-self.size:] if run["bytes"]]
+        size = sum(run["bytes"] for run in runs)
+        duration = sum(run["seconds"] for run in runs)
+        if not size or not duration:
+            return self.default
+        return float(size) / duration
+
+
+def from_config(config):
+    """Return the history configured in the PLANNING section.
+
+    :param config: a dict with the `history` path and the default
+                   `throughput` in bytes per second or None
+    """
+    config = config or {}
+    return History(path=config.get("history"),
+                   default=config.get("throughput", DEFAULT_THROUGHPUT))
+
+
+def iter_data(context, names):
+    """Yield data which is moved by tasks of the built flow.
+
+    Sizes are taken from the source cloud: images by their size,
+    volumes by their size in gigabytes and snapshots of servers by the
+    root disk of their flavors, because they don't exist yet.
+
+    :param context: a context the flow was built with
+    :param names: a set of names of tasks of the flow
+    :returns: a generator of (type, ID, tenant ID, kind, bytes) tuples
+              where the type and the ID are those of bindings of tasks
+              which move the data
+    """
+    for image_id in sorted(bindings.find(context.store, "image")):
+        image = context.inventory.get_image(image_id)
+        tenant_id = image.get("owner") or "public"
+        yield "image", image_id, tenant_id, "images", image.get("size") or 0
+    for volume_id in sorted(bindings.find(context.store, "volume",
+                                          "retrieve")):
+        volume = context.inventory.get_volume(volume_id)
+        tenant_id = getattr(volume, "os-vol-tenant-attr:tenant_id", None)
+        yield "volume", volume_id, tenant_id, "volumes", volume.size * GiB
+    for server_id in sorted(bindings.find(context.store, "server",
+                                          "retrieve")):
+        snapshot_ensure = bindings.Binding("snapshot", server_id, "ensure")
+        if snapshot_ensure not in names:
+            continue
+        server = context.inventory.get_server(server_id)
+        flavor = context.inventory.get_flavor(server.flavor["id"])
+        yield ("snapshot", server_id, server.tenant_id, "snapshots",
+               flavor.disk * GiB)
+
+
+def make_plan(context, flow):
+    """Collect amounts of data and tasks of the built flow.
+
+    :param context: a context the flow was built with
+    :param flow: a flow built for the migration
+    :returns: a dict with `tenants` which maps tenant IDs to numbers of
+              bytes of each kind of data, the number of `tasks` by
+              class names and the `bytes` total
+    """
+    tenants = collections.defaultdict(lambda: dict.fromkeys(DATA_KINDS, 0))
+    tasks = collections.Counter()
+    names = set()
+    for task in utils.iter_tasks(flow):
+        tasks[task.__class__.__name__] += 1
+        names.add(task.name)
+    for _, _, tenant_id, kind, size in iter_data(context, names):
+        tenants[tenant_id][kind] += size
+    return {
+        "tenants": dict(tenants),
+        "tasks": dict(tasks),
+        "bytes": sum(sum(t.itervalues()) for t in tenants.itervalues()),
+    }
+
+
+def get_server_size(inventory, server):
+    """Return the number of bytes of the image and volumes of the server.
+
+    :param inventory: an inventory of the source cloud
+    :param server: a server of the source cloud
+    """
+    size = 0
+    if server.image:
+        size += inventory.get_image(server.image["id"]).get("size") or 0
+    attachments = getattr(server, "os-extended-volumes:volumes_attached", [])
+    for attachment in attachments:
+        size += inventory.get_volume(attachment["id"]).size * GiB
+    return size
+
+
+def estimate(plan, history):
+    """Return the expected duration of the plan in seconds."""
+    return plan["bytes"] / history.throughput()
+
+
+def dump_plan(plan, history, f):
+    def gib(size):
+        return "{:.2f} GiB".format(float(size) / GiB)
+
+    f.write("{:<36} {:>14} {:>14} {:>14}\n".format("Tenant", *DATA_KINDS))
+    for tenant_id, sizes in sorted(plan["tenants"].iteritems()):
+        f.write("{:<36} {:>14} {:>14} {:>14}\n".format(
+            str(tenant_id), *[gib(sizes[kind]) for kind in DATA_KINDS]))
+    f.write("Total data: {}\n".format(gib(plan["bytes"])))
+    f.write("Tasks: {}\n".format(sum(plan["tasks"].itervalues())))
+    for name, count in sorted(plan["tasks"].iteritems()):
+        f.write("  {}: {}\n".format(name, count))
+    throughput = history.throughput()
+    f.write("Throughput: {:.2f} MiB/s\n".format(throughput / MiB))
+    f.write("Estimated duration: {:.0f} s\n".format(
+        estimate(plan, history)))
@@ -0,0 +1,183 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import functools
+import itertools
+import logging
+import threading
+import time
+import weakref
+
+from pumphouse import exceptions
+
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 2
+MAX_BACKOFF = 300
+
+ALL_TENANTS = {"all_tenants": 1}
+
+IMAGE_PAGE_SIZE = 1000
+# NOTE: Only images which are being created are listed, images which
+#       left these states are fetched by their IDs once.
+IMAGE_STATUSES = ("queued", "saving")
+
+options = {
+    "interval": DEFAULT_INTERVAL,
+}
+
+KINDS = {
+    "servers": (
+        lambda cloud: cloud.nova.servers.list(search_opts=ALL_TENANTS),
+        lambda cloud: cloud.nova.servers.get,
+    ),
+    "volumes": (
+        lambda cloud: cloud.cinder.volumes.list(search_opts=ALL_TENANTS),
+        lambda cloud: cloud.cinder.volumes.get,
+    ),
+    "snapshots": (
+        lambda cloud: cloud.cinder.volume_snapshots.list(
+            search_opts=ALL_TENANTS),
+        lambda cloud: cloud.cinder.volume_snapshots.get,
+    ),
+    "backups": (
+        lambda cloud: cloud.cinder.backups.list(),
+        lambda cloud: cloud.cinder.backups.get,
+    ),
+    "images": (
+        lambda cloud: list_images(cloud),
+        lambda cloud: cloud.glance.images.get,
+    ),
+}
+
+
+def list_images(cloud):
+    return itertools.chain.from_iterable(
+        cloud.glance.images.list(page_size=IMAGE_PAGE_SIZE,
+                                 filters={"status": status})
+        for status in IMAGE_STATUSES)
+
+
+class Poller(object):
+    """Statuses of resources of one type shared by waiting tasks
+
+    All resources are listed by one call at most once per interval and
+    every task waiting for a resource takes it from the last listing.
+    A resource missing in the listing, e.g. one deleted, is fetched by
+    the ID, so errors of the get call are raised as usual. If the list
+    call fails, resources are fetched one by one until it is retried,
+    the delay doubles with each failure in a row.
+
+    :param list_resources: a callable which returns all resources
+    :param get_resource: a callable which returns a resource by the ID
+    :param interval: a minimum number of seconds between list calls or
+                     None to use the configured one
+    """
+
+    def __init__(self, list_resources, get_resource, interval=None):
+        self.list_resources = list_resources
+        self.get_resource = get_resource
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.resources = {}
+        self.fetched = None
+        self.failures = 0
+        self.retry_at = 0
+
+    def refresh(self, since):
+        interval = self.interval
+        if interval is None:
+            interval = options["interval"]
+        now = time.time()
+        if now < self.retry_at:
+            return
+        if (self.fetched is not None and self.fetched >= since and
+                now - self.fetched < interval):
+            return
+        try:
+            resources = dict((resource.id, resource)
+                             for resource in self.list_resources())
+        except Exception:
+            self.failures += 1
+            delay = min(interval * 2 ** self.failures, MAX_BACKOFF)
+            LOG.warning("Resources can't be listed, they are fetched one "
+                        "by one for %d seconds", delay, exc_info=True)
+            self.resources = {}
+            self.fetched = None
+            self.retry_at = now + delay
+        else:
+            self.resources = resources
+            self.fetched = now
+            self.failures = 0
+
+    def get(self, resource_id, since=0):
+        """Return the resource from a listing made after the time.
+
+        :param resource_id: an ID of the resource or the resource
+        :param since: a timestamp
+        """
+        resource_id = getattr(resource_id, "id", resource_id)
+        with self.lock:
+            self.refresh(since)
+            resource = self.resources.get(resource_id)
+        if resource is None:
+            return self.get_resource(resource_id)
+        return resource
+
+    def watch(self):
+        """Return a callable for :func:`pumphouse.utils.wait_for`.
+
+        States of resources listed before the call are not returned, so
+        they don't satisfy waits for the state an action has just left.
+        """
+        return functools.partial(self.get, since=time.time())
+
+
+pollers = weakref.WeakKeyDictionary()
+pollers_lock = threading.Lock()
+
+
+def get_poller(cloud, kind):
+    """Return the poller of resources of the kind in the cloud.
+
+    :param cloud: an instance of :class:`pumphouse.cloud.Cloud`
+    :param kind: `servers`, `volumes`, `snapshots`, `backups` or
+                 `images`
+    """
+    if kind not in KINDS:
+        raise exceptions.NotFound("Unknown kind of resources: {}"
+                                  .format(kind))
+    with pollers_lock:
+        cloud_pollers = pollers.setdefault(cloud, {})
+        if kind not in cloud_pollers:
+            list_resources, get_resource = KINDS[kind]
+            cloud_pollers[kind] = Poller(
+                functools.partial(list_resources, cloud),
+                get_resource(cloud))
+        return cloud_pollers[kind]
+
+
+def watch(cloud, kind):
+    """Return a callable which gets resources of the kind for waits."""
+    return get_poller(cloud, kind).watch()
+
+
+def configure(config):
+    """Set the interval of list calls from the POLLING section.
+
+    :param config: a dict with the `interval` in seconds or None
+    """
+    config = config or {}
+    options["interval"] = config.get("interval", DEFAULT_INTERVAL)
@@ -0,0 +1,193 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import collections
+import heapq
+import itertools
+import logging
+import sys
+import threading
+
+from concurrent import futures
+import networkx
+from taskflow.engines.action_engine import compiler
+from taskflow.utils import threading_utils
+
+from pumphouse import bindings
+from pumphouse import exceptions
+from pumphouse import plan
+
+
+LOG = logging.getLogger(__name__)
+
+TENANT_ORDERS = ("largest", "smallest")
+
+LAST = (float("inf"), 0)
+
+
+class PriorityExecutor(futures.Executor):
+    """Thread pool which starts calls of tasks with the least key first
+
+    Taskflow submits calls with the task as the first argument. Calls
+    of tasks which have no priority start after all others, calls with
+    equal keys start in order of their submission.
+
+    :param max_workers: a number of threads
+    :param priorities: a dict which maps names of tasks to keys
+    """
+
+    def __init__(self, max_workers, priorities):
+        self.max_workers = max_workers
+        self.priorities = priorities
+        self.condition = threading.Condition()
+        self.queue = []
+        self.counter = itertools.count()
+        self.threads = []
+        self.stopped = False
+
+    def get_priority(self, args):
+        name = getattr(args[0], "name", None) if args else None
+        return self.priorities.get(name, LAST)
+
+    def submit(self, fn, *args, **kwargs):
+        future = futures.Future()
+        item = (self.get_priority(args), next(self.counter),
+                future, fn, args, kwargs)
+        with self.condition:
+            if self.stopped:
+                raise RuntimeError("Cannot submit calls after shutdown")
+            heapq.heappush(self.queue, item)
+            if len(self.threads) < self.max_workers:
+                thread = threading.Thread(target=self.work)
+                thread.daemon = True
+                thread.start()
+                self.threads.append(thread)
+            self.condition.notify()
+        return future
+
+    def work(self):
+        while True:
+            with self.condition:
+                while not self.queue and not self.stopped:
+                    self.condition.wait()
+                if not self.queue:
+                    return
+                _, _, future, fn, args, kwargs = heapq.heappop(self.queue)
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                future.set_exception_info(*sys.exc_info()[1:])
+            else:
+                future.set_result(result)
+
+    def shutdown(self, wait=True):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        if wait:
+            for thread in self.threads:
+                thread.join()
+
+
+class Scheduler(object):
+    """Order of tasks of migrations
+
+    Tasks which start the longest chains of data transfers go first,
+    so big images and volumes don't end up deciding when the whole
+    migration finishes. Tenants can be ordered by the amount of their
+    data too, then all tasks of a tenant go before tasks of next ones.
+
+    :param workers: a number of tasks which run at the same time or
+                    None to use the default of taskflow
+    :param tenants: `largest` or `smallest` to order tenants by the
+                    amount of data or None to not order them
+    """
+
+    def __init__(self, workers=None, tenants=None):
+        self.configure({"workers": workers, "tenants": tenants})
+
+    def configure(self, config):
+        config = config or {}
+        tenants = config.get("tenants")
+        if tenants is not None and tenants not in TENANT_ORDERS:
+            raise exceptions.ConfigError(
+                "Unknown order of tenants: {}".format(tenants))
+        self.workers = (config.get("workers") or
+                        threading_utils.get_optimal_thread_count())
+        self.tenants = tenants
+
+    def get_priorities(self, context, flow):
+        """Return keys of tasks of the flow for :class:`PriorityExecutor`.
+
+        The weight of a task is the number of bytes of the resource it
+        migrates plus the biggest weight of tasks which depend on it. The
+        bytes of a resource are counted only by the first task of its
+        chain, so the chain of a volume weighs as much as the volume.
+
+        :param context: a context the flow was built with
+        :param flow: a flow built for the migration
+        :returns: a dict which maps names of tasks to keys
+        """
+        graph = compiler.PatternCompiler().compile(flow).execution_graph
+        names = set(node.name for node in graph.nodes_iter())
+        sizes, owners = {}, {}
+        totals = collections.Counter()
+        for type_, id_, tenant_id, _, size in plan.iter_data(context, names):
+            sizes[type_, id_] = size
+            if tenant_id != "public":
+                owners[type_, id_] = tenant_id
+                totals[tenant_id] += size
+        ranks = {}
+        if self.tenants is not None:
+            ordered = sorted(totals, key=lambda t: (totals[t], t),
+                             reverse=self.tenants == "largest")
+            ranks = dict((tenant_id, rank)
+                         for rank, tenant_id in enumerate(ordered))
+        weights, priorities = {}, {}
+        for node in reversed(networkx.topological_sort(graph)):
+            key = get_key(node.name)
+            successors = graph.successors(node)
+            size = sizes.get(key, 0)
+            if any(get_key(p.name) == key
+                   for p in graph.predecessors(node)):
+                size = 0
+            weights[node] = size + max(
+                [weights[s] for s in successors] or [0])
+            rank = min([ranks.get(owners.get(key), len(ranks))] +
+                       [priorities[s.name][0] for s in successors])
+            priorities[node.name] = (rank, -weights[node])
+        return priorities
+
+    def executor(self, priorities):
+        return PriorityExecutor(self.workers, priorities)
+
+
+def get_key(name):
+    if isinstance(name, bindings.Binding):
+        return (name.type, name.id)
+    return None
+
+
+scheduler = Scheduler()
+get_priorities = scheduler.get_priorities
+
+
+def configure(config):
+    """Set the number of workers and the order of tenants.
+
+    :param config: a dict from the SCHEDULING section or None
+    """
+    scheduler.configure(config)
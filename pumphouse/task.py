@@ -14,14 +14,33 @@
 
 from taskflow import task
 
+from pumphouse import lanes as lanes_
 
-class BaseCloudTask(task.Task):
+
+class LimitedTask(task.Task):
+    """Task which enters concurrency lanes while it is executed
+
+    Names of lanes are listed in the `lanes` attribute, see
+    :mod:`pumphouse.lanes`.
+    """
+
+    lanes = ()
+
+    def pre_execute(self):
+        self._acquired_lanes = lanes_.acquire(self.lanes)
+
+    def post_execute(self):
+        lanes_.release(getattr(self, "_acquired_lanes", []))
+        self._acquired_lanes = []
+
+
+class BaseCloudTask(LimitedTask):
     def __init__(self, cloud, *args, **kwargs):
         super(BaseCloudTask, self).__init__(*args, **kwargs)
         self.cloud = cloud
 
 
-class BaseCloudsTask(task.Task):
+class BaseCloudsTask(LimitedTask):
     def __init__(self, src_cloud, dst_cloud, *args, **kwargs):
         super(BaseCloudsTask, self).__init__(*args, **kwargs)
         self.src_cloud = src_cloud
@@ -17,10 +17,11 @@ import logging
 import pdb
 import traceback
 
-import taskflow.engines
 from taskflow.patterns import graph_flow
 import taskflow.task
 
+from pumphouse import flows
+
 from . import resources
 from . import tasks
 
@@ -127,5 +128,10 @@ class TaskflowRunner(Runner):
             flow.add(self.convert_task(task))
         return flow
 
-    def run(self):
-        taskflow.engines.run(self.create_flow(), engine_conf='parallel')
+    def run(self, backend=None, book=None):
+        """Run tasks, saving their states to the backend if it is given.
+
+        :param backend: a persistence backend or None
+        :param book: a logbook of the job or None
+        """
+        flows.run_flow(self.create_flow(), {}, backend=backend, book=book)
@@ -17,6 +17,7 @@ import logging
 from pumphouse import checks
 from pumphouse import exceptions
 from pumphouse import task
+from pumphouse.bindings import Binding
 
 from taskflow.patterns import linear_flow
 
@@ -53,7 +54,7 @@ def run_checks(context, server_id, commands=None):
     if not commands:
         commands = []
     flow = linear_flow.Flow("check-server-{}".format(server_id))
-    server_ensure = "server-{}-boot".format(server_id)
+    server_ensure = Binding("server", server_id, "boot")
     for num, command in enumerate(commands):
         check_binding = "check-server-{}-{}".format(server_id, num)
         command_binding = "check-command-{}-{}".format(server_id, num)
@@ -18,7 +18,9 @@ from taskflow.patterns import linear_flow
 
 from pumphouse import exceptions
 from pumphouse import events
+from pumphouse import inventory
 from pumphouse import task
+from pumphouse.bindings import Binding
 
 
 LOG = logging.getLogger(__name__)
@@ -62,6 +64,7 @@ class EnsureFlavor(task.BaseCloudTask):
             rxtx_factor=flavor_info["rxtx_factor"],
             is_public=flavor_info["os-flavor-access:is_public"]
         )
+        inventory.invalidate(self.cloud, "flavors")
         self.created_event(flavor)
         return flavor
 
@@ -76,9 +79,9 @@ class EnsureFlavor(task.BaseCloudTask):
 
 
 def migrate_flavor(context, flavor_id):
-    flavor_binding = "flavor-{}".format(flavor_id)
-    flavor_retrieve = "{}-retrieve".format(flavor_binding)
-    flavor_ensure = "{}-ensure".format(flavor_binding)
+    flavor_binding = Binding("flavor", flavor_id)
+    flavor_retrieve = flavor_binding.to("retrieve")
+    flavor_ensure = flavor_binding.to("ensure")
     flow = linear_flow.Flow("migrate-flavor-{}".format(flavor_id)).add(
         RetrieveFlavor(context.src_cloud,
                        name=flavor_binding,
@@ -17,6 +17,7 @@ import logging
 from taskflow.patterns import graph_flow
 
 from pumphouse import task
+from pumphouse.bindings import Binding
 from pumphouse.tasks import role as role_tasks
 from pumphouse.tasks import tenant as tenant_tasks
 from pumphouse.tasks import user as user_tasks
@@ -38,8 +39,9 @@ class RepairUsersPasswords(task.BaseCloudsTask):
 
 
 def migrate_passwords(context, users_ids, tenant_id):
-    users_ensure = ["user-{}-ensure".format(user_id) for user_id in users_ids]
-    passwords_repair = "repair-{}".format(tenant_id)
+    users_ensure = [Binding("user", user_id, "ensure")
+                    for user_id in users_ids]
+    passwords_repair = Binding("repair", tenant_id)
     task = RepairUsersPasswords(context.src_cloud, context.dst_cloud,
                                 name=passwords_repair,
                                 requires=users_ensure)
@@ -51,31 +53,29 @@ def migrate_server_identity(context, server_info):
     flow = graph_flow.Flow("server-identity-{}".format(server_id))
     tenant_id = server_info["tenant_id"]
     user_id = server_info["user_id"]
-    tenant_retrieve = "tenant-{}-retrieve".format(tenant_id)
-    user_retrieve = "user-{}-retrieve".format(user_id)
+    tenant_retrieve = Binding("tenant", tenant_id, "retrieve")
+    user_retrieve = Binding("user", user_id, "retrieve")
     if tenant_retrieve not in context.store:
         tenant_flow = tenant_tasks.migrate_tenant(context, tenant_id)
         flow.add(tenant_flow)
     if user_retrieve not in context.store:
-        user = context.src_cloud.keystone.users.get(user_id)
+        user = context.inventory.get_user(user_id)
         user_tenant_id = getattr(user, "tenantId", None)
         user_flow = user_tasks.migrate_user(context, user_id,
                                             tenant_id=user_tenant_id)
         flow.add(user_flow)
-    roles = context.src_cloud.keystone.users.list_roles(user_id,
-                                                        tenant=tenant_id)
+    roles = context.inventory.list_roles(user_id, tenant_id)
     for role in roles:
         role_id = role.id
-        role_retrieve = "role-{}-retrieve".format(role_id)
+        role_retrieve = Binding("role", role_id, "retrieve")
         if role_retrieve not in context.store:
             role_flow = role_tasks.migrate_role(context, role_id)
             flow.add(role_flow)
 
         if role.name.startswith("_"):
             continue
-        user_role_ensure = "user-role-{}-{}-{}-ensure".format(user_id,
-                                                              role_id,
-                                                              tenant_id)
+        user_role_ensure = Binding("user-role",
+                                   (user_id, role_id, tenant_id), "ensure")
         if user_role_ensure in context.store:
             continue
         membership_flow = user_tasks.migrate_membership(context, user_id,
@@ -86,15 +86,15 @@ def migrate_server_identity(context, server_info):
 
 def migrate_identity(context, tenant_id):
     flow = graph_flow.Flow("identity-{}".format(tenant_id))
-    tenant_retrieve = "tenant-{}-retrieve".format(tenant_id)
+    tenant_retrieve = Binding("tenant", tenant_id, "retrieve")
     if tenant_retrieve not in context.store:
         tenant_flow = tenant_tasks.migrate_tenant(context, tenant_id)
         flow.add(tenant_flow)
     users_ids, roles_ids = set(), set()
     # XXX(akscram): Due to the bug #1308218 users duplication can be here.
-    users = context.src_cloud.keystone.users.list(tenant_id)
+    users = context.inventory.list_users(tenant_id)
     for user in users:
-        user_retrieve = "user-{}-retrieve".format(user.id)
+        user_retrieve = Binding("user", user.id, "retrieve")
         if (user.id == context.src_cloud.keystone.auth_ref.user_id or
                 user.id in users_ids or
                 user_retrieve in context.store):
@@ -104,17 +104,16 @@ def migrate_identity(context, tenant_id):
                                             tenant_id=user_tenant_id)
         flow.add(user_flow)
         users_ids.add(user.id)
-        user_roles = context.src_cloud.keystone.users.list_roles(
-            user.id, tenant=tenant_id)
+        user_roles = context.inventory.list_roles(user.id, tenant_id)
         for role in user_roles:
             # NOTE(akscram): Actually all roles which started with
             #                underscore are hidden.
             if role.name.startswith("_"):
                 continue
             roles_ids.add(role.id)
-            user_role_ensure = "user-role-{}-{}-{}-ensure".format(user.id,
-                                                                  role.id,
-                                                                  tenant_id)
+            user_role_ensure = Binding("user-role",
+                                       (user.id, role.id, tenant_id),
+                                       "ensure")
             if user_role_ensure in context.store:
                 continue
             membership_flow = user_tasks.migrate_membership(context,
@@ -123,7 +122,7 @@ def migrate_identity(context, tenant_id):
                                                             tenant_id)
             flow.add(membership_flow)
     for role_id in roles_ids:
-        role_retrieve = "role-{}-retrieve".format(role_id)
+        role_retrieve = Binding("role", role_id, "retrieve")
         if role_retrieve not in context.store:
             role_flow = role_tasks.migrate_role(context, role_id)
             flow.add(role_flow)
@@ -20,6 +20,8 @@ from taskflow.patterns import graph_flow
 from pumphouse import task
 from pumphouse import events
 from pumphouse import exceptions
+from pumphouse import transfer
+from pumphouse.bindings import Binding
 from pumphouse.tasks import utils as task_utils
 
 
@@ -29,19 +31,49 @@ LOG = logging.getLogger(__name__)
 class LogReporter(task_utils.UploadReporter):
     def report(self, absolute):
         cloud_name, src_image, dst_image = self.context
-        LOG.info("Image %r uploaded on %3.2f%%",
-                 dst_image["id"], absolute * 100)
+        stats = self.stats()
+        LOG.info("Image %r uploaded on %3.2f%%, %.0f B/s",
+                 dst_image["id"], absolute * 100, stats["current"])
         events.emit("update", {
             "id": dst_image["id"],
             "type": "image",
             "cloud": cloud_name,
             "action": None,
             "progress": round(absolute * 100),
+            "transfer": stats,
             "data": dict(dst_image),
         }, namespace="/events")
 
 
 class EnsureImage(task.BaseCloudsTask):
+    """Ensures the copy of the image exists in the destination cloud
+
+    :param image_index: an instance of
+                        :class:`pumphouse.inventory.ImageIndex` of the
+                        destination cloud, if it is None, copies are
+                        looked up by a list query
+    """
+
+    lanes = ("glance.src", "glance.dst")
+
+    def __init__(self, src_cloud, dst_cloud, image_index=None,
+                 *args, **kwargs):
+        super(EnsureImage, self).__init__(src_cloud, dst_cloud,
+                                          *args, **kwargs)
+        self.image_index = image_index
+
+    def find_image(self, image_info):
+        if self.image_index is not None:
+            return self.image_index.find(image_info)
+        images = self.dst_cloud.glance.images.list(filters={
+            # FIXME(akscram): Not all images have the checksum property.
+            "checksum": image_info["checksum"],
+            "name": image_info["name"],
+        })
+        # XXX(akscram): More then one images can be here. Now we
+        #               just ignore this fact.
+        return next(iter(images), None)
+
     def execute(self, image_id, user_info, kernel_info, ramdisk_info):
         if user_info:
             tenant = self.dst_cloud.keystone.tenants.get(user_info["tenantId"])
@@ -51,16 +83,8 @@ class EnsureImage(task.BaseCloudsTask):
         else:
             dst_cloud = self.dst_cloud
         image_info = self.src_cloud.glance.images.get(image_id)
-        images = self.dst_cloud.glance.images.list(filters={
-            # FIXME(akscram): Not all images have the checksum property.
-            "checksum": image_info["checksum"],
-            "name": image_info["name"],
-        })
-        try:
-            # XXX(akscram): More then one images can be here. Now we
-            #               just ignore this fact.
-            image = next(iter(images))
-        except StopIteration:
+        image = self.find_image(image_info)
+        if image is None:
             parameters = {
                 "disk_format": image_info["disk_format"],
                 "container_format": image_info["container_format"],
@@ -79,16 +103,50 @@ class EnsureImage(task.BaseCloudsTask):
             image = dst_cloud.glance.images.create(**parameters)
             self.created_event(image)
 
-            data = self.src_cloud.glance.images.data(image_info["id"])
-            img_data = task_utils.FileProxy(data, image_info["size"],
-                                            LogReporter((dst_cloud.name,
-                                                         image_info,
-                                                         image)))
-            dst_cloud.glance.images.upload(image["id"], img_data)
-            image = dst_cloud.glance.images.get(image["id"])
+            data = transfer.get_image_data(self.src_cloud, image_info)
+            img_data = transfer.Relay(data, image_info["size"],
+                                      LogReporter((dst_cloud.name,
+                                                   image_info,
+                                                   image)))
+            try:
+                dst_cloud.glance.images.upload(image["id"], img_data)
+                image = dst_cloud.glance.images.get(image["id"])
+                checksums = self.verify(image_info, image,
+                                        img_data.checksums())
+            finally:
+                img_data.close()
+            if self.image_index is not None:
+                self.image_index.add(image)
             self.uploaded_event(image)
+            image = dict(image, checksums=checksums)
         return dict(image)
 
+    def verify(self, image_info, image, checksums):
+        """Compare checksums of uploaded data with ones of both images.
+
+        Images without checksums are skipped. If data doesn't match, the
+        image is deleted from the destination cloud.
+
+        :returns: a dict with checksums and names of verified clouds
+        """
+        verified = []
+        for cloud, checksum in (("source", image_info.get("checksum")),
+                                ("destination", image.get("checksum"))):
+            if not checksum:
+                continue
+            if checksum != checksums["md5"]:
+                LOG.error("Checksum of image %s in the %s cloud is %s, "
+                          "uploaded data has %s", image["id"], cloud,
+                          checksum, checksums["md5"])
+                self.dst_cloud.glance.images.delete(image["id"])
+                raise exceptions.ChecksumMismatch(
+                    "Data of image {} doesn't match the {} cloud"
+                    .format(image["id"], cloud))
+            verified.append(cloud)
+        LOG.info("Checksums of image %s are verified with %s clouds: %s",
+                 image["id"], ", ".join(verified) or "no", checksums)
+        return dict(checksums, verified=verified)
+
     def created_event(self, image):
         LOG.info("Image created: %s", image["id"])
         events.emit("create", {
@@ -142,11 +200,12 @@ class DeleteImage(task.BaseCloudTask):
 
 
 def migrate_image_task(context, task_class, image_id, user_id, *rebind):
-    image_binding = "image-{}".format(image_id)
-    image_ensure = "image-{}-ensure".format(image_id)
-    user_ensure = "user-{}-ensure".format(user_id)
+    image_binding = Binding("image", image_id)
+    image_ensure = Binding("image", image_id, "ensure")
+    user_ensure = Binding("user", user_id, "ensure")
     rebind = itertools.chain((image_binding, user_ensure), *rebind)
     task = task_class(context.src_cloud, context.dst_cloud,
+                      image_index=context.image_index,
                       name=image_ensure,
                       provides=image_ensure,
                       rebind=list(rebind))
@@ -154,40 +213,53 @@ def migrate_image_task(context, task_class, image_id, user_id, *rebind):
     return task
 
 
+def migrate_component(context, flow, image_id, user_id):
+    """Add the task of a kernel or a ramdisk image to the flow.
+
+    Kernels and ramdisks are shared by many AMI images, so the task is
+    added only once per plan and all images depend on it.
+
+    :returns: the name of the result of the task
+    """
+    image_binding = Binding("image", image_id)
+    if image_binding not in context.store:
+        flow.add(migrate_image_task(context, EnsureSingleImage,
+                                    image_id, user_id))
+    return Binding("image", image_id, "ensure")
+
+
 # XXX(akscram): We should to simplify this function. The cascade of
 #               if-statements looks ugly.
 def migrate_image(context, image_id):
-    image = context.src_cloud.glance.images.get(image_id)
+    image = context.inventory.get_image(image_id)
     user_id = None
     if image["visibility"] == "private":
         user_id = image.get("owner")
     else:
         user_id = "public"
-        user_ensure = "user-{}-ensure".format(user_id)
+        user_ensure = Binding("user", user_id, "ensure")
         context.store[user_ensure] = None
     if image["container_format"] == "ami" and (hasattr(image, "kernel_id") or
                                                hasattr(image, "ramdisk_id")):
         flow = graph_flow.Flow("migrate-image-{}".format(image_id))
         if hasattr(image, "kernel_id") and hasattr(image, "ramdisk_id"):
-            kernel = migrate_image_task(context, EnsureSingleImage,
-                                        image["kernel_id"], user_id)
-            ramdisk = migrate_image_task(context, EnsureSingleImage,
-                                         image["ramdisk_id"], user_id)
+            kernel = migrate_component(context, flow, image["kernel_id"],
+                                       user_id)
+            ramdisk = migrate_component(context, flow, image["ramdisk_id"],
+                                        user_id)
             image = migrate_image_task(context, EnsureImage, image_id, user_id,
-                                       kernel.provides, ramdisk.provides)
-            flow.add(kernel, ramdisk, image)
+                                       [kernel, ramdisk])
         elif hasattr(image, "kernel_id"):
-            kernel = migrate_image_task(context, EnsureSingleImage,
-                                        image["kernel_id"], user_id)
+            kernel = migrate_component(context, flow, image["kernel_id"],
+                                       user_id)
             image = migrate_image_task(context, EnsureImageWithKernel,
-                                       image_id, user_id, kernel.provides)
-            flow.add(kernel, image)
+                                       image_id, user_id, [kernel])
         else:
-            ramdisk = migrate_image_task(context, EnsureSingleImage,
-                                         image["ramdisk_id"], user_id)
+            ramdisk = migrate_component(context, flow, image["ramdisk_id"],
+                                        user_id)
             image = migrate_image_task(context, EnsureImageWithRamdisk,
-                                       image_id, user_id, ramdisk.provides)
-            flow.add(ramdisk, image)
+                                       image_id, user_id, [ramdisk])
+        flow.add(image)
     else:
         flow = migrate_image_task(context, EnsureSingleImage,
                                   image_id, user_id)
@@ -12,10 +12,11 @@
 # See the License for the specific language governing permissions and#
 # limitations under the License.
 
-import inspect
 import logging
 
+from pumphouse import inventory
 from pumphouse import task
+from pumphouse.bindings import Binding
 from taskflow.patterns import graph_flow
 
 LOG = logging.getLogger(__name__)
@@ -98,7 +99,9 @@ def create_security_group(neutron, security_group_info):
 class RetrieveNeutronNetworks(task.BaseCloudTask):
 
     def execute(self):
-        return self.cloud.neutron.list_networks()['networks']
+        return inventory.listing(
+            self.cloud, "neutron-networks",
+            lambda: self.cloud.neutron.list_networks()['networks'])
 
 
 class RetrieveNetworkById(task.BaseCloudTask):
@@ -113,19 +116,25 @@ class RetrieveNetworkById(task.BaseCloudTask):
 class RetrieveAllPorts(task.BaseCloudTask):
 
     def execute(self):
-        return self.cloud.neutron.list_ports()['ports']
+        return inventory.listing(
+            self.cloud, "neutron-ports",
+            lambda: self.cloud.neutron.list_ports()['ports'])
 
 
 class RetrieveAllSubnets(task.BaseCloudTask):
 
     def execute(self):
-        return get_subnet_by(self.cloud.neutron, {})
+        return inventory.listing(
+            self.cloud, "neutron-subnets",
+            lambda: get_subnet_by(self.cloud.neutron, {}))
 
 
 class RetrieveAllRouters(task.BaseCloudTask):
 
     def execute(self):
-        return get_router_by(self.cloud.neutron, {})
+        return inventory.listing(
+            self.cloud, "neutron-routers",
+            lambda: get_router_by(self.cloud.neutron, {}))
 
 
 class RetrieveSubnetById(task.BaseCloudTask):
@@ -160,6 +169,7 @@ class EnsureRouter(task.BaseCloudTask):
         router = self.cloud.neutron.create_router(
             {'router': router_info}
         )['router']
+        inventory.invalidate(self.cloud, "neutron-routers")
         return router
 
 
@@ -182,6 +192,7 @@ class EnsureSubnet(task.BaseCloudTask):
             'name': subnet_info['name'],
             'network_id': network_info['id']
         })
+        inventory.invalidate(self.cloud, "neutron-subnets")
 
         LOG.info("Subnet %s created: %s" % (subnet['id'], str(subnet)))
 
@@ -202,6 +213,7 @@ class EnsureNetwork(task.BaseCloudTask):
         network = create_network(self.cloud.neutron, {
             'name': net_info['name']
         })
+        inventory.invalidate(self.cloud, "neutron-networks")
 
         LOG.info("Network %s created: %s" % (network['id'], str(network)))
 
@@ -238,6 +250,7 @@ class EnsurePort(task.BaseCloudTask):
         port_info['network_id'] = network_info['id']
 
         port = create_port(self.cloud.neutron, port_info)
+        inventory.invalidate(self.cloud, "neutron-ports")
 
         return port
 
@@ -245,7 +258,9 @@ class EnsurePort(task.BaseCloudTask):
 class RetrieveFloatingIps(task.BaseCloudTask):
 
     def execute(self):
-        return get_floatingIp_by(self.cloud.neutron, {})
+        return inventory.listing(
+            self.cloud, "neutron-floatingips",
+            lambda: get_floatingIp_by(self.cloud.neutron, {}))
 
 
 class RetrieveFloatingIpById(task.BaseCloudTask):
@@ -277,6 +292,7 @@ class EnsureFloatingIp(task.BaseCloudTask):
         floating_ip = self.cloud.neutron.create_floatingip(
             {'floatingip': floating_info}
         )
+        inventory.invalidate(self.cloud, "neutron-floatingips")
 
         return floating_info
 
@@ -284,7 +300,9 @@ class EnsureFloatingIp(task.BaseCloudTask):
 class RetrieveSecurityGroups(task.BaseCloudTask):
 
     def execute(self):
-        return get_securityGroups_by(self.cloud.neutron, {})
+        return inventory.listing(
+            self.cloud, "neutron-secgroups",
+            lambda: get_securityGroups_by(self.cloud.neutron, {}))
 
 
 class RetrieveSecurityGroupById(task.BaseCloudTask):
@@ -322,27 +340,23 @@ class EnsureSecurityGroup(task.BaseCloudTask):
             del rule['id'], rule['tenant_id']
             rule['security_group_id'] = security_group['id']
             create_securityGroup_rule(self.cloud.neutron, rule)
+        inventory.invalidate(self.cloud, "neutron-secgroups")
 
         if security_group['id'] not in port_info['security_groups']:
             port_info['security_groups'].append(security_group['id'])
             self.cloud.neutron.update_port(port_info['id'], {
                 'port': {'security_groups': port_info['security_groups']}
             })
+            inventory.invalidate(self.cloud, "neutron-ports")
 
         return security_group
 
 
 def migrate_floatingip(context, floatingip_id):
 
-    floatingip_binding = floatingip_id
-
-    floatingip_retrieve = "floatingip-{}-retrieve".format(
-        floatingip_binding)
-    floatingip_ensure = "floatingip-{}-ensure".format(
-        floatingip_binding)
-
-    (retrieve, ensure) = generate_binding(
-        floatingip_binding, inspect.stack()[0][3])
+    floatingip_binding = Binding("neutron-floatingip", floatingip_id)
+    floatingip_retrieve = floatingip_binding.to("retrieve")
+    floatingip_ensure = floatingip_binding.to("ensure")
 
     if (floatingip_binding in context.store):
         return None, floatingip_retrieve
@@ -350,7 +364,7 @@ def migrate_floatingip(context, floatingip_id):
     context.store[floatingip_binding] = floatingip_id
 
     f = graph_flow.Flow(
-        "neutron-floatingip-migration-{}".format(floatingip_binding))
+        "neutron-floatingip-migration-{}".format(floatingip_id))
 
     all_src_floatingips_binding = "srcNeutronAllFloatingIps"
     all_dst_floatingips_binding = "dstNeutronAllFloatingIps"
@@ -392,19 +406,16 @@ def migrate_floatingip(context, floatingip_id):
 
 def migrate_network(context, network_id):
 
-    network_binding = network_id
-
-    network_retrieve = "network-{}-retrieve".format(
-        network_binding)
-    network_ensure = "network-{}-ensure".format(
-        network_binding)
+    network_binding = Binding("neutron-network", network_id)
+    network_retrieve = network_binding.to("retrieve")
+    network_ensure = network_binding.to("ensure")
 
     if (network_binding in context.store):
         return None, network_retrieve
 
     context.store[network_binding] = network_id
 
-    f = graph_flow.Flow("neutron-network-migration-{}".format(network_binding))
+    f = graph_flow.Flow("neutron-network-migration-{}".format(network_id))
 
     all_src_networks_binding = "srcNeutronAllNetworks"
     all_dst_networks_binding = "dstNeutronAllNetworks"
@@ -445,13 +456,9 @@ def migrate_network(context, network_id):
 
 
 def migrate_securityGroup(context, securityGroup_id, port_binding):
-    securityGroup_binding = securityGroup_id
-
-    securityGroup_retrieve = "\
-        securityGroup-{}-retrieve".format(securityGroup_binding)
-    securityGroup_ensure = "\
-        securityGroup-{}-ensure".format(
-        securityGroup_binding)
+    securityGroup_binding = Binding("neutron-secgroup", securityGroup_id)
+    securityGroup_retrieve = securityGroup_binding.to("retrieve")
+    securityGroup_ensure = securityGroup_binding.to("ensure")
 
     if (securityGroup_binding in context.store):
         return None, securityGroup_ensure
@@ -506,11 +513,9 @@ def migrate_securityGroup(context, securityGroup_id, port_binding):
 
 def migrate_subnet(context, subnet_id, network_info):
 
-    subnet_binding = subnet_id
-
-    subnet_retrieve = "subnet-{}-retrieve".format(
-        subnet_binding)
-    subnet_ensure = "subnet-{}-ensure".format(subnet_binding)
+    subnet_binding = Binding("neutron-subnet", subnet_id)
+    subnet_retrieve = subnet_binding.to("retrieve")
+    subnet_ensure = subnet_binding.to("ensure")
 
     if (subnet_binding in context.store):
         return None, subnet_ensure
@@ -564,10 +569,9 @@ def migrate_subnet(context, subnet_id, network_info):
 
 def migrate_router(context, router_id):
 
-    router_binding = router_id
-
-    (router_retrieve, router_ensure) = generate_binding(
-        router_binding, inspect.stack()[0][3])
+    router_binding = Binding("neutron-router", router_id)
+    router_retrieve = router_binding.to("retrieve")
+    router_ensure = router_binding.to("ensure")
 
     if (router_binding in context.store):
         return None, router_ensure
@@ -620,14 +624,16 @@ def migrate_router(context, router_id):
 
 def migrate_port(context, port_id):
 
-    port_binding = port_id
+    port_binding = Binding("neutron-port", port_id)
+    port_retrieve = port_binding.to("retrieve")
+    port_ensure = port_binding.to("ensure")
 
     if (port_binding in context.store):
-        return None
+        return None, port_ensure
 
     context.store[port_binding] = port_id
 
-    f = graph_flow.Flow("neutron-port-migration-{}".format(port_binding))
+    f = graph_flow.Flow("neutron-port-migration-{}".format(port_id))
 
     port_info = get_port_by(context.src_cloud.neutron, {'id': port_id})[0]
 
@@ -650,8 +656,6 @@ def migrate_port(context, port_id):
         ))
         context.store[all_dst_ports_binding] = None
 
-    port_retrieve = "neutron-port-migration-{}-retrieve".format(port_binding)
-    port_ensure = "neutron-port-migration-{}-ensure".format(port_binding)
     network_info = "NullNetworkInfo"
     subnet_info = "NullSubnet"
     device_info = "NullDevice"
@@ -725,15 +729,6 @@ def migrate_port(context, port_id):
     return f, port_ensure
 
 
-PREFIX = "neutron-"
-
-
-def generate_binding(uid, label):
-    label.replace("_", "-")
-    return PREFIX + "{}-{}-ensure".format(label, uid), \
-        PREFIX + "{}-{}-retrieve".format(label, uid)
-
-
 def migrate_nic(context, network_name, address, tenant_id):
 
     port_info = context.src_cloud.neutron.list_ports(fixed_ips=['ip_address=%s' % address['addr']])['ports'][0]
@@ -19,6 +19,7 @@ from taskflow.patterns import linear_flow
 from pumphouse import task
 from pumphouse import events
 from pumphouse import exceptions
+from pumphouse.bindings import Binding
 from pumphouse.tasks import utils as task_utils
 
 
@@ -136,9 +137,9 @@ class EnsureFloatingIP(task.BaseCloudTask):
 
 def migrate_floating_ip(context, address):
     """Replicate Floating IP from source cloud to destination cloud"""
-    floating_ip_binding = "floating-ip-{}".format(address)
-    floating_ip_retrieve = "floating-ip-{}-retrieve".format(address)
-    floating_ip_bulk_ensure = "floating-ip-bulk-{}-ensure".format(address)
+    floating_ip_binding = Binding("floating-ip", address)
+    floating_ip_retrieve = Binding("floating-ip", address, "retrieve")
+    floating_ip_bulk_ensure = Binding("floating-ip-bulk", address, "ensure")
     flow = linear_flow.Flow("migrate-floating-ip-{}".format(address))
     flow.add(RetrieveFloatingIP(context.src_cloud,
                                 name=floating_ip_binding,
@@ -155,14 +156,14 @@ def migrate_floating_ip(context, address):
 def associate_floating_ip_server(context, floating_ip_address,
                                  fixed_ip_info, server_id):
     """Associates Floating IP to Nova instance"""
-    floating_ip_bulk_ensure = "floating-ip-bulk-{}-ensure".format(
-        floating_ip_address)
-    floating_ip_sync = "floating-ip-{}-{}-sync".format(server_id,
-                                                       floating_ip_address)
+    floating_ip_bulk_ensure = Binding("floating-ip-bulk",
+                                      floating_ip_address, "ensure")
+    floating_ip_sync = Binding("floating-ip",
+                               (server_id, floating_ip_address), "sync")
     fixed_ip_address = fixed_ip_info["addr"]
-    fixed_ip_nic = "fixed-ip-{}-nic".format(fixed_ip_address)
-    server_boot = "server-{}-boot".format(server_id)
-    floating_ip_ensure = "floating-ip-{}-ensure".format(floating_ip_address)
+    fixed_ip_nic = Binding("fixed-ip", fixed_ip_address, "nic")
+    server_boot = Binding("server", server_id, "boot")
+    floating_ip_ensure = Binding("floating-ip", floating_ip_address, "ensure")
     flow = linear_flow.Flow("associate-floating-ip-{}-server-{}"
                             .format(floating_ip_address, server_id))
     flow.add(task_utils.SyncPoint(name=floating_ip_sync,
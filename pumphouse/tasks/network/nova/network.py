@@ -18,7 +18,9 @@ import netaddr
 from taskflow.patterns import graph_flow
 
 from pumphouse import exceptions
+from pumphouse import inventory
 from pumphouse import task
+from pumphouse.bindings import Binding
 from . import floating_ip as fip_tasks
 
 LOG = logging.getLogger(__name__)
@@ -27,10 +29,12 @@ LOG = logging.getLogger(__name__)
 class RetrieveAllNetworks(task.BaseCloudTask):
     def execute(self):
         # FIXME(yorik-sar): Who the hell needs nova-network with such API?!
-        networks = self.cloud.nova.networks.list()
+        networks = inventory.listing(
+            self.cloud, "networks",
+            lambda: [net.to_dict() for net in self.cloud.nova.networks.list()])
         return {
-            "by-label": dict((net.label, net.to_dict()) for net in networks),
-            "by-id": dict((net.id, net.to_dict()) for net in networks),
+            "by-label": dict((net["label"], net) for net in networks),
+            "by-id": dict((net["id"], net) for net in networks),
         }
 
 
@@ -73,6 +77,7 @@ class EnsureNetwork(task.BaseCloudTask):
                 network_info['cidr'] = str(list(s.iter_cidrs())[0])
             network_info['project_id'] = tenant_info['id']
             network = self.cloud.nova.networks.create(**network_info)
+            inventory.invalidate(self.cloud, "networks")
         except exceptions.nova_excs.Conflict:
             LOG.exception("Conflicts: %s", network_info)
             raise
@@ -92,15 +97,15 @@ class EnsureNic(task.BaseCloudTask):
 def migrate_nic(context, network_label, address, tenant_id):
     if address["OS-EXT-IPS:type"] == 'floating':
         floating_ip = address["addr"]
-        floating_ip_retrieve = "floating-ip-{}-retrieve".format(floating_ip)
+        floating_ip_retrieve = Binding("floating-ip", floating_ip, "retrieve")
         if floating_ip_retrieve in context.store:
             return None, None
         floating_ip_flow = fip_tasks.migrate_floating_ip(context, floating_ip)
         return floating_ip_flow, None
     elif address["OS-EXT-IPS:type"] == 'fixed':
         fixed_ip = address["addr"]
-        fixed_ip_retrieve = "fixed-ip-{}-retrieve".format(fixed_ip)
-        fixed_ip_nic = "fixed-ip-{}-nic".format(fixed_ip)
+        fixed_ip_retrieve = Binding("fixed-ip", fixed_ip, "retrieve")
+        fixed_ip_nic = Binding("fixed-ip", fixed_ip, "nic")
         if fixed_ip_retrieve in context.store:
             return None, fixed_ip_nic
         flow = graph_flow.Flow("migrate-{}-fixed-ip".format(fixed_ip))
@@ -125,12 +130,12 @@ def migrate_network(context, network_id=None, network_label=None,
     all_src_networks_retrieve = "networks-src-retrieve"
     all_dst_networks_retrieve = "networks-dst-retrieve"
     if by_id:
-        network_binding = "network-{}".format(network_id)
+        network_binding = Binding("network", network_id)
     else:
-        network_binding = "network-{}".format(network_label)
-    network_retrieve = "{}-retrieve".format(network_binding)
-    network_ensure = "{}-ensure".format(network_binding)
-    tenant_ensure = "tenant-{}-ensure".format(tenant_id)
+        network_binding = Binding("network", network_label)
+    network_retrieve = network_binding.to("retrieve")
+    network_ensure = network_binding.to("ensure")
+    tenant_ensure = Binding("tenant", tenant_id, "ensure")
     if network_binding in context.store:
         return None, network_ensure
     flow = graph_flow.Flow("migrate-{}".format(network_binding))
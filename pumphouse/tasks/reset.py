@@ -14,11 +14,19 @@
 
 from __future__ import division
 
+import atexit
 import collections
+import contextlib
 import functools
+import hashlib
 import itertools
 import logging
+import mmap
+import os
 import random
+import shutil
+import stat
+import threading
 import time
 import tempfile
 import urllib
@@ -28,7 +36,10 @@ from neutronclient.common import exceptions as neutron_excs
 from novaclient import exceptions as nova_excs
 
 from pumphouse import events
+from pumphouse import exceptions
+from pumphouse import polling
 from pumphouse.tasks import base
+from pumphouse import transfer
 from pumphouse import utils
 
 LOG = logging.getLogger(__name__)
@@ -36,6 +47,10 @@ LOG = logging.getLogger(__name__)
 TEST_IMAGE_URL = ("http://download.cirros-cloud.net/0.3.2/"
                   "cirros-0.3.2-x86_64-disk.img")
 TEST_RESOURCE_PREFIX = "pumphouse-"
+IMAGE_BLOCK_SIZE = (max((1 << 20) // mmap.ALLOCATIONGRANULARITY, 1) *
+                    mmap.ALLOCATIONGRANULARITY)
+DEFAULT_CACHE_BUDGET = 5 * 2 ** 30
+DEFAULT_CACHE_MAX_AGE = 24 * 60 * 60
 
 
 def is_prefixed(string):
@@ -276,40 +291,181 @@ class FileReadProgress(object):
         return res
 
 
+class ImageCache(object):
+    """Directory of images of workloads keyed by their URLs
+
+    An image is downloaded once and shared by resets of both clouds,
+    which run at the same time, and by next resets. Images older than
+    the maximum age are downloaded again, the least recently downloaded
+    ones are removed while the cache is over the budget.
+
+    :param path: a path to the directory or None to use a private
+                 temporary one which is removed at exit
+    :param budget: a maximum disk space taken by images in bytes
+    :param max_age: a number of seconds a downloaded image is used for
+    """
+
+    def __init__(self, path=None, budget=DEFAULT_CACHE_BUDGET,
+                 max_age=DEFAULT_CACHE_MAX_AGE):
+        self.path = path
+        self.budget = budget
+        self.max_age = max_age
+        self.prepared = False
+        self.lock = threading.Lock()
+        self.locks = {}
+
+    def prepare(self):
+        """Create the directory or check that only its owner can write it."""
+        if self.path is None:
+            self.path = tempfile.mkdtemp(prefix="pumphouse-images-")
+            atexit.register(shutil.rmtree, self.path, True)
+        elif not os.path.lexists(self.path):
+            os.makedirs(self.path, 0o700)
+        else:
+            st = os.lstat(self.path)
+            if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or \
+                    st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+                raise exceptions.ConfigError(
+                    "Directory {} of the image cache must be writable only "
+                    "by its owner".format(self.path))
+        self.prepared = True
+
+    def get_lock(self, url):
+        with self.lock:
+            if not self.prepared:
+                self.prepare()
+            return self.locks.setdefault(url, threading.Lock())
+
+    def get_path(self, url):
+        return os.path.join(self.path, hashlib.sha1(url).hexdigest())
+
+    def lookup(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if time.time() - st.st_mtime > self.max_age:
+            return None
+        return st.st_size
+
+    def fetch(self, url, resource):
+        """Return a path and a size of the cached image.
+
+        :param url: a URL of the image
+        :param resource: an instance of :class:`CachedImage` to report
+                         the progress of the download to
+        """
+        with self.get_lock(url):
+            path = self.get_path(url)
+            size = self.lookup(path)
+            if size is not None:
+                LOG.info("Image %s is read from cache", url)
+                return path, size
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix=".")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    size = download(url, f, resource)
+                os.rename(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        self.evict(path)
+        return path, size
+
+    def evict(self, keep):
+        """Remove the oldest images while the cache is too big.
+
+        :param keep: a path to the image which is just downloaded
+        """
+        with self.lock:
+            files, total = [], 0
+            for name in os.listdir(self.path):
+                path = os.path.join(self.path, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                size = st.st_blocks * 512
+                total += size
+                if path != keep and not name.startswith("."):
+                    files.append((st.st_mtime, size, path))
+            for _, size, path in sorted(files):
+                if total <= self.budget:
+                    break
+                LOG.info("Image %s is evicted from cache", path)
+                os.remove(path)
+                total -= size
+
+
+def download(url, f, resource):
+    out = transfer.SparseFile(f)
+    img = transfer.GovernedFile(urllib.urlopen(url), "read")
+    # Based on urllib.URLOpener.retrieve
+    try:
+        headers = img.info()
+        size = -1
+        read = 0
+        if "content-length" in headers:
+            size = int(headers["Content-Length"])
+            p_img = FileReadProgress(img, size, resource, "Caching")
+        else:
+            p_img = img
+        while 1:
+            block = p_img.read(IMAGE_BLOCK_SIZE)
+            if block == "":
+                break
+            read += len(block)
+            out.write(block)
+    finally:
+        img.close()
+    if size >= 0 and read < size:
+        raise urllib.ContentTooShortError(
+            "retrieval incomplete: got only %i out of %i bytes" % (
+                read, size), (None, headers))
+    out.flush()
+    return read
+
+
+image_cache = ImageCache()
+
+
+def configure(config):
+    """Set the directory and limits of the cache from the IMAGE_CACHE section.
+
+    :param config: a dict with the `path` to the directory, the `budget`
+                   in bytes and the `max_age` in seconds or None
+    """
+    global image_cache
+    config = config or {}
+    image_cache = ImageCache(config.get("path"),
+                             budget=config.get("budget",
+                                               DEFAULT_CACHE_BUDGET),
+                             max_age=config.get("max_age",
+                                                DEFAULT_CACHE_MAX_AGE))
+
+
+@contextlib.contextmanager
+def open_mapped(path):
+    """Open the file mapped to memory for reading."""
+    with open(path, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            yield f
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            mapped.close()
+
+
 class CachedImage(EventResource):
     data_id_key = "url"
     mute_events = True
 
     @task
     def cache(self):
-        f = tempfile.NamedTemporaryFile(delete=True)
-        img = urllib.urlopen(self.data["url"])
-        # Based on urllib.URLOpener.retrieve
-        try:
-            headers = img.info()
-            bs = 1024 * 8
-            size = -1
-            read = 0
-            if "content-length" in headers:
-                size = int(headers["Content-Length"])
-                p_img = FileReadProgress(img, size, self, "Caching")
-            else:
-                p_img = img
-            while 1:
-                block = p_img.read(bs)
-                if block == "":
-                    break
-                read += len(block)
-                f.write(block)
-        finally:
-            img.close()
-        if size >= 0 and read < size:
-            raise urllib.ContentTooShortError(
-                "retrieval incomplete: got only %i out of %i bytes" % (
-                    read, size), (None, headers))
-
-        f.flush()
-        self.data = {"url": self.data["url"], "file": f, "size": read}
+        path, size = image_cache.fetch(self.data["url"], self)
+        self.data = {"url": self.data["url"], "file": path, "size": size}
 
 
 class Image(EventResource):
@@ -328,8 +484,9 @@ class Image(EventResource):
     @task(requires=[create])
     def upload(self):
         # upload starts here
-        with open(self.cached_image["file"].name, 'rb') as f:
-            f = FileReadProgress(f, self.cached_image["size"], self,
+        with open_mapped(self.cached_image["file"]) as f:
+            f = FileReadProgress(transfer.GovernedFile(f, "write"),
+                                 self.cached_image["size"], self,
                                  "Uploading")
             self.env.cloud.glance.images.upload(self.data["id"], f)
         image = self.env.cloud.glance.images.get(self.data["id"])
@@ -812,7 +969,8 @@ class Volume(EventResource):
             self.data["size"],
             display_name=self.data["display_name"],
         )
-        volume = utils.wait_for(volume.id, self.env.cloud.cinder.volumes.get,
+        volume = utils.wait_for(volume.id,
+                                polling.watch(self.env.cloud, "volumes"),
                                 value="available")
         self.data = dict(volume._info,
                          **make_kwargs(
@@ -826,7 +984,7 @@ class Volume(EventResource):
             self.env.cloud.nova.volumes.create_server_volume(
                 self.data["server"]["id"], self.data["id"], device)
             volume = utils.wait_for(self.data["id"],
-                                    self.env.cloud.cinder.volumes.get,
+                                    polling.watch(self.env.cloud, "volumes"),
                                     value="in-use")
             self.data = volume._info
 
@@ -838,7 +996,7 @@ class Volume(EventResource):
                                                              self.data["id"])
         if self.data["attachments"]:
             volume = utils.wait_for(self.data["id"],
-                                    self.env.cloud.cinder.volumes.get,
+                                    polling.watch(self.env.cloud, "volumes"),
                                     value="available")
             self.data = volume._info
 
@@ -914,10 +1072,11 @@ class Server(EventResource):
         )
 
         def _do_get(id_):
+            get_server = polling.watch(self.env.cloud, "servers")
             last_event_data = None
             yield
             while True:
-                res = self.env.cloud.nova.servers.get(id_)
+                res = get_server(id_)
                 self.data = res.to_dict()
                 event_data = self.event_data()
                 if last_event_data is None:
@@ -942,7 +1101,8 @@ class Server(EventResource):
           includes=[nics.each().delete])
     def delete(self):
         self.env.cloud.nova.servers.delete(self.data["id"])
-        utils.wait_for(self.data["id"], self.env.cloud.nova.servers.get,
+        utils.wait_for(self.data["id"],
+                       polling.watch(self.env.cloud, "servers"),
                        stop_excs=(nova_excs.NotFound,))
         self.post_event("delete")
 
@@ -16,6 +16,7 @@ import logging
 
 from taskflow.patterns import graph_flow, unordered_flow
 
+from pumphouse.bindings import Binding
 from pumphouse.tasks import server_resources
 
 
@@ -23,13 +24,16 @@ LOG = logging.getLogger(__name__)
 
 
 def migrate_resources(context, tenant_id):
-    servers = context.src_cloud.nova.servers.list(
-        search_opts={'all_tenants': 1, 'tenant_id': tenant_id})
-    flow = graph_flow.Flow("migrate-resources-{}".format(tenant_id))
-    servers_flow = unordered_flow.Flow("migrate-servers-{}".format(tenant_id))
+    servers = context.inventory.list_servers(tenant_id)
+    return migrate_servers(context, tenant_id, servers)
+
+
+def migrate_servers(context, name, servers):
+    flow = graph_flow.Flow("migrate-resources-{}".format(name))
+    servers_flow = unordered_flow.Flow("migrate-servers-{}".format(name))
     migrate_server = server_resources.migrate_server
     for server in servers:
-        server_binding = "server-{}".format(server.id)
+        server_binding = Binding("server", server.id)
         if server_binding not in context.store:
             resources, server_flow = migrate_server(context, server.id)
             flow.add(*resources)
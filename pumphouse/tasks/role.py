@@ -19,6 +19,7 @@ from taskflow.patterns import linear_flow
 from pumphouse import exceptions
 from pumphouse import events
 from pumphouse import task
+from pumphouse.bindings import Binding
 
 
 LOG = logging.getLogger(__name__)
@@ -52,9 +53,9 @@ class EnsureRole(task.BaseCloudTask):
 
 
 def migrate_role(context, role_id):
-    role_binding = "role-{}".format(role_id)
-    role_retrieve = "{}-retrieve".format(role_binding)
-    role_ensure = "{}-ensure".format(role_binding)
+    role_binding = Binding("role", role_id)
+    role_retrieve = role_binding.to("retrieve")
+    role_ensure = role_binding.to("ensure")
     flow = linear_flow.Flow("migrate-role-{}".format(role_id)).add(
         RetrieveRole(context.src_cloud,
                      name=role_binding,
@@ -19,6 +19,8 @@ from taskflow.patterns import linear_flow
 from pumphouse import task
 from pumphouse import events
 from pumphouse import exceptions
+from pumphouse import inventory
+from pumphouse.bindings import Binding
 
 
 LOG = logging.getLogger(__name__)
@@ -44,6 +46,7 @@ class EnsureSecGroup(task.BaseCloudTask):
             secgroup = cloud.nova.security_groups.create(
                 secgroup_info["name"], secgroup_info["description"])
             LOG.info("Created: %s", secgroup.to_dict())
+            inventory.invalidate(self.cloud, "secgroups")
             self.created_event(secgroup.to_dict())
         else:
             LOG.warn("Already exists: %s", secgroup.to_dict())
@@ -83,13 +86,13 @@ class EnsureSecGroup(task.BaseCloudTask):
 
 
 def migrate_secgroup(context, secgroup_id, tenant_id, user_id):
-    secgroup_binding = "secgroup-{}".format(secgroup_id)
-    secgroup_retrieve = "{}-retrieve".format(secgroup_binding)
-    secgroup_ensure = "{}-ensure".format(secgroup_binding)
-    tenant_binding = "tenant-{}".format(tenant_id)
-    tenant_ensure = "{}-ensure".format(tenant_binding)
-    user_binding = "user-{}".format(user_id)
-    user_ensure = "{}-ensure".format(user_binding)
+    secgroup_binding = Binding("secgroup", secgroup_id)
+    secgroup_retrieve = secgroup_binding.to("retrieve")
+    secgroup_ensure = secgroup_binding.to("ensure")
+    tenant_binding = Binding("tenant", tenant_id)
+    tenant_ensure = tenant_binding.to("ensure")
+    user_binding = Binding("user", user_id)
+    user_ensure = user_binding.to("ensure")
     flow = linear_flow.Flow("migrate-secgroup-{}".format(secgroup_id))
     flow.add(RetrieveSecGroup(context.src_cloud,
                               name=secgroup_binding,
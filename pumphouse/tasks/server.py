@@ -18,6 +18,8 @@ from taskflow.patterns import linear_flow, unordered_flow
 
 from pumphouse import events
 from pumphouse import flows
+from pumphouse import inventory
+from pumphouse import polling
 from pumphouse import task
 from pumphouse import exceptions
 # from pumphouse.tasks import floating_ip as fip_tasks
@@ -27,6 +29,7 @@ from pumphouse.tasks import snapshot as snapshot_tasks
 from pumphouse.tasks import volume as volume_tasks
 from pumphouse.tasks import utils as task_utils
 from pumphouse import utils
+from pumphouse.bindings import Binding
 
 
 LOG = logging.getLogger(__name__)
@@ -55,7 +58,8 @@ class EvacuateServer(task.BaseCloudTask):
                                              self.disk_over_commit)
         server = self.cloud.nova.servers.get(server_id)
         self.evacuation_event(server.to_dict())
-        server = utils.wait_for(server.id, self.cloud.nova.servers.get)
+        server = utils.wait_for(server.id,
+                                polling.watch(self.cloud, "servers"))
         migrated_server_info = server.to_dict()
         self.evacuation_event(migrated_server_info)
         return migrated_server_info
@@ -116,7 +120,8 @@ class RetrieveServer(task.BaseCloudTask):
 class SuspendServer(task.BaseCloudTask):
     def execute(self, server_info):
         self.cloud.nova.servers.suspend(server_info["id"])
-        server = utils.wait_for(server_info["id"], self.cloud.nova.servers.get,
+        server = utils.wait_for(server_info["id"],
+                                polling.watch(self.cloud, "servers"),
                                 value="SUSPENDED")
         suspend_server_info = server.to_dict()
         self.suspend_event(suspend_server_info)
@@ -133,7 +138,8 @@ class SuspendServer(task.BaseCloudTask):
 
     def revert(self, server_info, result, flow_failures):
         self.cloud.nova.servers.resume(server_info["id"])
-        server = utils.wait_for(server_info["id"], self.cloud.nova.servers.get,
+        server = utils.wait_for(server_info["id"],
+                                polling.watch(self.cloud, "servers"),
                                 value="ACTIVE")
         resume_server_info = server.to_dict()
         self.resume_event(resume_server_info)
@@ -150,6 +156,8 @@ class SuspendServer(task.BaseCloudTask):
 
 
 class BootServerFromImage(task.BaseCloudTask):
+    lanes = ("nova.boot",)
+
     def execute(self, server_info, image_info, flavor_info, user_info,
                 tenant_info, server_nics, server_dm):
         restrict_cloud = self.cloud.restrict(
@@ -159,13 +167,15 @@ class BootServerFromImage(task.BaseCloudTask):
         server = restrict_cloud.nova.servers.create(
             server_info["name"], image_info["id"], flavor_info["id"],
             block_device_mapping=dict(server_dm), nics=server_nics)
-        server = utils.wait_for(server, self.cloud.nova.servers.get,
+        inventory.invalidate(self.cloud, "servers")
+        server = utils.wait_for(server,
+                                polling.watch(self.cloud, "servers"),
                                 value="ACTIVE")
         spawn_server_info = server.to_dict()
         for volume_id in dict(server_dm).values():
             volume = self.cloud.cinder.volumes.get(volume_id)
             volume = utils.wait_for(volume.id,
-                                    self.cloud.cinder.volumes.get,
+                                    polling.watch(self.cloud, "volumes"),
                                     value="in-use")
             self.attach_event(volume.id,
                               server.id)
@@ -203,6 +213,7 @@ class BootServerFromImage(task.BaseCloudTask):
 class TerminateServer(task.BaseCloudTask):
     def execute(self, server_info):
         self.cloud.nova.servers.delete(server_info["id"])
+        inventory.invalidate(self.cloud, "servers")
         self.terminate_event(server_info)
 
     def detach_event(self, volume_id):
@@ -229,31 +240,34 @@ class TerminateServer(task.BaseCloudTask):
 
 
 def reprovision_server(context, server, server_nics):
-    flavor_ensure = "flavor-{}-ensure".format(server.flavor["id"])
-    user_ensure = "user-{}-ensure".format(server.user_id)
-    tenant_ensure = "tenant-{}-ensure".format(server.tenant_id)
+    flavor_ensure = Binding("flavor", server.flavor["id"], "ensure")
+    user_ensure = Binding("user", server.user_id, "ensure")
+    tenant_ensure = Binding("tenant", server.tenant_id, "ensure")
 
     server_id = server.id
-    server_start_event = "server-{}-start-event".format(server_id)
-    server_finish_event = "server-{}-finish-event".format(server_id)
-    server_binding = "server-{}".format(server_id)
-    server_retrieve = "server-{}-retrieve".format(server_id)
-    server_suspend = "server-{}-suspend".format(server_id)
-    server_terminate = "server-{}-terminate".format(server_id)
-    server_boot = "server-{}-boot".format(server_id)
-    server_sync = "server-{}-sync".format(server_id)
-    server_dm = "{}-device-mapping".format(server_binding)
+    server_start_event = Binding("server", server_id, "start-event")
+    server_finish_event = Binding("server", server_id, "finish-event")
+    server_binding = Binding("server", server_id)
+    server_retrieve = Binding("server", server_id, "retrieve")
+    server_suspend = Binding("server", server_id, "suspend")
+    server_terminate = Binding("server", server_id, "terminate")
+    server_boot = Binding("server", server_id, "boot")
+    server_sync = Binding("server", server_id, "sync")
+    server_dm = server_binding.to("device-mapping")
 
     pre_suspend_tasks, pre_suspend_sync, pre_boot_tasks, image_ensure = \
         provision_server(context, server)
 
-    migrate_server_volumes = volume_tasks.migrate_server_volumes(
-        context,
-        server_id,
-        getattr(server,
-                "os-extended-volumes:volumes_attached"),
-        server.user_id,
-        server.tenant_id)
+    precopy_tasks, precopy_sync, migrate_server_volumes = \
+        volume_tasks.migrate_server_volumes(
+            context,
+            server_id,
+            getattr(server,
+                    "os-extended-volumes:volumes_attached"),
+            server.user_id,
+            server.tenant_id)
+    pre_suspend_tasks = pre_suspend_tasks + precopy_tasks
+    pre_suspend_sync = pre_suspend_sync + precopy_sync
     pre_boot_tasks = pre_boot_tasks + [migrate_server_volumes]
 
     flow = linear_flow.Flow("migrate-server-{}".format(server_id))
@@ -300,8 +314,8 @@ def reprovision_server(context, server, server_nics):
 @provision_server.add("image")
 def rebuild_by_image(context, server):
     image_id = server.image["id"]
-    image_binding = "image-{}".format(image_id)
-    image_ensure = "image-{}-ensure".format(image_id)
+    image_binding = Binding("image", image_id)
+    image_ensure = Binding("image", image_id, "ensure")
 
     pre_suspend = []
     if image_binding not in context.store:
@@ -314,7 +328,7 @@ def rebuild_by_image(context, server):
 @provision_server.add("snapshot")
 def rebuild_by_snapshot(context, server):
     server_id = server.id
-    snapshot_ensure = "snapshot-{}-ensure".format(server_id)
+    snapshot_ensure = Binding("snapshot", server_id, "ensure")
 
     snapshot_flow = snapshot_tasks.migrate_snapshot(context, server)
 
@@ -328,7 +342,7 @@ def restore_floating_ips(context, server_info):
         fixed_ip = addresses[label][0]
         for floating_ip in [addr["addr"] for addr in addresses[label]
                             if addr['OS-EXT-IPS:type'] == 'floating']:
-            fip_retrieve = "floating-ip-{}-retrieve".format(floating_ip)
+            fip_retrieve = Binding("floating-ip", floating_ip, "retrieve")
             if fip_retrieve in context.store:
                 fip_flow = fip_tasks.associate_floating_ip_server(
                     context,
@@ -341,10 +355,10 @@ def restore_floating_ips(context, server_info):
 
 
 def evacuate_server(context, flow, hostname, requires=None):
-    server_retrieve = "server-{}-retrieve".format(hostname)
-    server_binding = "server-{}".format(hostname)
-    server_evacuate = "server-{}-evacuate".format(hostname)
-    server_evacuated = "server-{}-evacuated".format(hostname)
+    server_retrieve = Binding("server", hostname, "retrieve")
+    server_binding = Binding("server", hostname)
+    server_evacuate = Binding("server", hostname, "evacuate")
+    server_evacuated = Binding("server", hostname, "evacuated")
     flow.add(EvacuateServer(context.src_cloud,
                             name=server_evacuate,
                             provides=server_evacuated,
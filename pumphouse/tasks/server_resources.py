@@ -15,6 +15,7 @@
 import logging
 
 from pumphouse import flows
+from pumphouse.bindings import Binding
 from pumphouse.tasks import server as server_tasks
 from pumphouse.tasks import flavor as flavor_tasks
 from pumphouse.tasks import secgroup as secgroup_tasks
@@ -30,23 +31,23 @@ post_hooks = flows.register("post_server")
 
 
 def migrate_server(context, server_id):
-    server = context.src_cloud.nova.servers.get(server_id)
+    server = context.inventory.get_server(server_id)
     server_id = server.id
     flavor_id = server.flavor["id"]
-    flavor_retrieve = "flavor-{}-retrieve".format(flavor_id)
+    flavor_retrieve = Binding("flavor", flavor_id, "retrieve")
     resources = []
     identity_flow = identity_tasks.migrate_server_identity(
         context, server.to_dict())
     resources.append(identity_flow)
-    tenant = context.src_cloud.keystone.tenants.get(server.tenant_id)
-    server_secgroups = server.list_security_group()
+    tenant = context.inventory.get_tenant(server.tenant_id)
+    server_secgroups = context.inventory.list_server_secgroups(server)
     for secgroup in server_secgroups:
-        secgroup_retrieve = "secgroup-{}-retrieve".format(secgroup.id)
+        secgroup_retrieve = Binding("secgroup", secgroup.id, "retrieve")
         if secgroup_retrieve not in context.store:
             secgroup_flow = secgroup_tasks.migrate_secgroup(
                 context, secgroup.id, tenant.id, server.user_id)
             resources.append(secgroup_flow)
-    server_nics = "server-{}-nics".format(server_id)
+    server_nics = Binding("server", server_id, "nics")
     nics = []
     for network_name, addresses in server.addresses.iteritems():
         for address in addresses:
@@ -16,18 +16,23 @@ import logging
 
 from taskflow.patterns import linear_flow
 
+from pumphouse import polling
 from pumphouse import task
-from pumphouse import utils
+from pumphouse import timeouts
 from pumphouse import events
+from pumphouse.bindings import Binding
 from pumphouse.tasks import image as image_tasks
 
 
 LOG = logging.getLogger(__name__)
 
+GiB = 2 ** 30
+
 
 class SnapshotServer(task.BaseCloudTask):
+    lanes = ("nova.snapshot",)
 
-    def execute(self, server_info):
+    def execute(self, server_info, timeout):
         server_id = server_info["id"]
         snapshot_name = "{}-snapshot-{}".format(server_info["name"], server_id)
         try:
@@ -38,13 +43,23 @@ class SnapshotServer(task.BaseCloudTask):
             raise
         else:
             snapshot = self.cloud.glance.images.get(snapshot_id)
-            snapshot = utils.wait_for(snapshot.id,
-                                      self.cloud.glance.images.get,
-                                      value="active")
+            snapshot = timeouts.wait_for(self.cloud, "server-snapshot",
+                                         self.get_size(server_info),
+                                         timeout,
+                                         snapshot.id,
+                                         polling.watch(self.cloud, "images"),
+                                         value="active")
             LOG.info("Created: %s", snapshot)
             self.created_event(snapshot)
             return snapshot.id
 
+    def get_size(self, server_info):
+        """Return the size of the root disk of the server or None."""
+        flavor = server_info.get("flavor")
+        if not flavor:
+            return None
+        return self.cloud.nova.flavors.get(flavor["id"]).disk * GiB
+
     def created_event(self, snapshot):
         events.emit("create", {
             "id": snapshot["id"],
@@ -57,18 +72,21 @@ class SnapshotServer(task.BaseCloudTask):
 
 def migrate_snapshot(context, server):
     server_id = server.id
-    server_binding = "server-{}".format(server_id)
-    snapshot_binding = "snapshot-{}".format(server_id)
-    snapshot_ensure = "snapshot-{}-ensure".format(server_id)
-    user_ensure = "user-{}-ensure".format(server.user_id)
+    server_binding = Binding("server", server_id)
+    snapshot_binding = Binding("snapshot", server_id)
+    snapshot_ensure = Binding("snapshot", server_id, "ensure")
+    user_ensure = Binding("user", server.user_id, "ensure")
     flow = linear_flow.Flow("migrate-ephemeral-storage-server-{}"
                             .format(server_id))
+    timeout = context.config.get("snapshot_tasks_timeout", 60)
     flow.add(SnapshotServer(context.src_cloud,
                             name=snapshot_binding,
                             provides=snapshot_binding,
-                            rebind=[server_binding]))
+                            rebind=[server_binding],
+                            inject={"timeout": int(timeout)}))
     flow.add(image_tasks.EnsureSingleImage(context.src_cloud,
                                            context.dst_cloud,
+                                           image_index=context.image_index,
                                            name=snapshot_ensure,
                                            provides=snapshot_ensure,
                                            rebind=[snapshot_binding,
@@ -18,7 +18,9 @@ from taskflow.patterns import linear_flow
 
 from pumphouse import events
 from pumphouse import exceptions
+from pumphouse import inventory
 from pumphouse import task
+from pumphouse.bindings import Binding
 
 
 LOG = logging.getLogger(__name__)
@@ -41,6 +43,7 @@ class EnsureTenant(task.BaseCloudTask):
                 enabled=tenant_info["enabled"],
             )
             LOG.info("Created tenant: %s", tenant)
+            inventory.invalidate(self.cloud, "tenants")
             self.created_event(tenant)
         return tenant.to_dict()
 
@@ -55,9 +58,9 @@ class EnsureTenant(task.BaseCloudTask):
 
 
 def migrate_tenant(context, tenant_id):
-    tenant_binding = "tenant-{}".format(tenant_id)
-    tenant_retrieve = "{}-retrieve".format(tenant_binding)
-    tenant_ensure = "{}-ensure".format(tenant_binding)
+    tenant_binding = Binding("tenant", tenant_id)
+    tenant_retrieve = tenant_binding.to("retrieve")
+    tenant_ensure = tenant_binding.to("ensure")
     flow = linear_flow.Flow("migrate-tenant-{}".format(tenant_id)).add(
         RetrieveTenant(context.src_cloud,
                        name=tenant_binding,
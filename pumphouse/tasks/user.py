@@ -18,7 +18,9 @@ from taskflow.patterns import linear_flow
 
 from pumphouse import exceptions
 from pumphouse import events
+from pumphouse import inventory
 from pumphouse import task
+from pumphouse.bindings import Binding
 
 
 LOG = logging.getLogger(__name__)
@@ -49,6 +51,7 @@ class EnsureUser(task.BaseCloudTask):
                 tenant_id=tenant_info["id"] if tenant_info else None,
                 enabled=user_info["enabled"],
             )
+            inventory.invalidate(self.cloud, "users")
             self.created_event(user)
         return user.to_dict()
 
@@ -85,11 +88,11 @@ class EnsureUserRole(task.BaseCloudTask):
 
 
 def migrate_membership(context, user_id, role_id, tenant_id):
-    user_ensure = "user-{}-ensure".format(user_id)
-    role_ensure = "role-{}-ensure".format(role_id)
-    tenant_ensure = "tenant-{}-ensure".format(tenant_id)
-    user_role_ensure = "user-role-{}-{}-{}-ensure".format(user_id, role_id,
-                                                          tenant_id)
+    user_ensure = Binding("user", user_id, "ensure")
+    role_ensure = Binding("role", role_id, "ensure")
+    tenant_ensure = Binding("tenant", tenant_id, "ensure")
+    user_role_ensure = Binding("user-role", (user_id, role_id, tenant_id),
+                               "ensure")
     task = EnsureUserRole(context.dst_cloud,
                           name=user_role_ensure,
                           provides=user_role_ensure,
@@ -100,16 +103,16 @@ def migrate_membership(context, user_id, role_id, tenant_id):
 
 
 def migrate_user(context, user_id, tenant_id=None):
-    user_binding = "user-{}".format(user_id)
-    user_retrieve = "{}-retrieve".format(user_binding)
-    user_ensure = "{}-ensure".format(user_binding)
+    user_binding = Binding("user", user_id)
+    user_retrieve = user_binding.to("retrieve")
+    user_ensure = user_binding.to("ensure")
     flow = linear_flow.Flow("migrate-user-{}".format(user_id))
     flow.add(RetrieveUser(context.src_cloud,
                           name=user_binding,
                           provides=user_binding,
                           rebind=[user_retrieve]))
     if tenant_id is not None:
-        tenant_ensure = "tenant-{}-ensure".format(tenant_id)
+        tenant_ensure = Binding("tenant", tenant_id, "ensure")
         flow.add(EnsureUser(context.dst_cloud,
                             name=user_ensure,
                             provides=user_ensure,
@@ -12,13 +12,22 @@
 # See the License for the specific language governing permissions and#
 # limitations under the License.
 
+from __future__ import division
+
 import logging
+import threading
+import time
+import weakref
 
 from taskflow import task
 
+from pumphouse import transfer
+
 
 LOG = logging.getLogger(__name__)
 
+WATCH_INTERVAL = 1
+
 
 class SyncPoint(task.Task):
     def execute(self, **requires):
@@ -32,7 +41,60 @@ class Gather(task.Task):
         return kwargs.values()
 
 
+class Watchdog(object):
+    """Thread which checks running transfers for stalls
+
+    Reporters are kept by weak references, so reporters of abandoned
+    transfers don't stay watched. The thread stops when there is
+    nothing to watch.
+
+    :param interval: a number of seconds between checks
+    """
+
+    def __init__(self, interval=WATCH_INTERVAL):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.reporters = weakref.WeakSet()
+        self.thread = None
+
+    def add(self, reporter):
+        with self.lock:
+            self.reporters.add(reporter)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.watch)
+                self.thread.daemon = True
+                self.thread.start()
+
+    def remove(self, reporter):
+        with self.lock:
+            self.reporters.discard(reporter)
+
+    def watch(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                reporters = list(self.reporters)
+                if not reporters:
+                    self.thread = None
+                    return
+            for reporter in reporters:
+                reporter.check()
+            del reporters
+
+
+watchdog = Watchdog()
+
+
 class UploadReporter(object):
+    """Progress and throughput of a transfer of data
+
+    The progress is reported on each step of the period of the size.
+    Times of the first byte and pauses between chunks longer than the
+    stall timeout are tracked, statistics of the transfer are recorded
+    in :data:`pumphouse.transfer.telemetry` when it finishes. The
+    :data:`watchdog` warns about a stall while it lasts.
+    """
+
     def __init__(self, context, size=0, period=0.1):
         self.context = context
         self.size = size
@@ -40,38 +102,88 @@ class UploadReporter(object):
         self.step_size = self.size * self.period
         self.last_step = 0
         self.uploaded = 0.0
+        self.started = self.updated = time.time()
+        self.first_byte = None
+        self.stalls = 0
+        self.stalled = 0.0
+        self.sample = (self.started, 0.0)
+        self.rate = 0.0
+        self.finished = None
+        self.stalling = False
+        watchdog.add(self)
+
+    def check(self):
+        """Warn once if the transfer got no data for the stall timeout."""
+        idle = time.time() - self.updated
+        if self.finished is None and not self.stalling and \
+                idle > transfer.options["stall_timeout"]:
+            self.stalling = True
+            LOG.warning("Transfer %s got no data for %.1f seconds",
+                        self.context, idle)
 
     def set_size(self, size):
         self.size = size
         self.step_size = self.size * self.period
 
     def update(self, chunk):
+        now = time.time()
+        if self.first_byte is None:
+            self.first_byte = now
+        elif now - self.updated > transfer.options["stall_timeout"]:
+            self.stalls += 1
+            self.stalled += now - self.updated
+            LOG.warning("Transfer %s stalled for %.1f seconds",
+                        self.context, now - self.updated)
+        self.updated = now
+        self.stalling = False
+        self.uploaded += chunk
         if not self.size:
             return
-        self.uploaded += chunk
         steps = int((self.uploaded - self.last_step) / self.step_size)
         if steps > 0:
             self.last_step += steps * self.step_size
+            last_time, last_bytes = self.sample
+            if now > last_time:
+                self.rate = (self.uploaded - last_bytes) / (now - last_time)
+            self.sample = (now, self.uploaded)
             self.report(self.uploaded / self.size)
 
+    def finish(self):
+        if self.finished is None:
+            self.finished = time.time()
+            watchdog.remove(self)
+            transfer.telemetry.record(self.stats())
+
+    def abort(self):
+        """Stop watching the transfer which failed or was cancelled."""
+        if self.finished is None:
+            self.finished = time.time()
+            watchdog.remove(self)
+
+    def stats(self):
+        """Return a dict with statistics of the transfer.
+
+        Throughputs are in bytes per second, times are in seconds.
+        """
+        end = self.finished or time.time()
+        elapsed = end - self.started
+        average = self.uploaded / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.size and average:
+            eta = max(self.size - self.uploaded, 0) / average
+        return {
+            "size": self.size,
+            "bytes": self.uploaded,
+            "started": self.started,
+            "elapsed": elapsed,
+            "ttfb": (self.first_byte - self.started
+                     if self.first_byte is not None else None),
+            "current": self.rate,
+            "average": average,
+            "eta": eta,
+            "stalls": self.stalls,
+            "stalled": self.stalled,
+        }
+
     def report(self, absolute):
         raise NotImplementedError()
-
-
-class FileProxy(object):
-    def __init__(self, data, size, reporter):
-        self.resp = data
-        self.reporter = reporter
-        self.reporter.set_size(size)
-
-    def close(self):
-        self.resp.close()
-
-    def isclosed(self):
-        return self.resp.isclosed()
-
-    def read(self, amt=None):
-        data = self.resp.next()
-        if data:
-            self.reporter.update(len(data))
-        return data
@@ -19,14 +19,25 @@ from taskflow.task import Task
 
 from pumphouse import task
 from pumphouse import events
+from pumphouse import flows
+from pumphouse import garbage
+from pumphouse import polling
+from pumphouse import timeouts
+from pumphouse import transfer
 from pumphouse import utils
 from pumphouse import exceptions
+from pumphouse.bindings import Binding
 from pumphouse.tasks import utils as utils_tasks
 from pumphouse.tasks import image as image_tasks
 
 
 LOG = logging.getLogger(__name__)
 
+GiB = 2 ** 30
+DEFAULT_BACKUP_CHAIN = 10
+
+volume_transport = flows.register("volume_transport", default="glance")
+
 
 class RetrieveVolume(task.BaseCloudTask):
 
@@ -36,6 +47,7 @@ class RetrieveVolume(task.BaseCloudTask):
 
 
 class CreateVolumeSnapshot(task.BaseCloudTask):
+    lanes = ("cinder.src",)
 
     def execute(self, volume_info, timeout):
         volume_id = volume_info["id"]
@@ -49,17 +61,19 @@ class CreateVolumeSnapshot(task.BaseCloudTask):
             LOG.exception("Can't create snapshot from volume: %s",
                           str(volume_info))
 
-        snapshot = utils.wait_for(
+        snapshot = timeouts.wait_for(
+            self.cloud, "volume-snapshot", volume_info["size"] * GiB,
+            timeout,
             snapshot.id,
-            self.cloud.cinder.volume_snapshots.get,
+            polling.watch(self.cloud, "snapshots"),
             value='available',
-            timeout=timeout,
             error_value='error')
 
         return snapshot._info
 
 
 class UploadVolume(task.BaseCloudTask):
+    lanes = ("cinder.src",)
 
     def execute(self, volume_info, timeout):
         volume_id = volume_info["id"]
@@ -79,10 +93,11 @@ class UploadVolume(task.BaseCloudTask):
         except exceptions.glance_excs.NotFound:
             LOG.exception("Image not found: %s", image_id)
             raise exceptions.NotFound()
-        image = utils.wait_for(image.id,
-                               self.cloud.glance.images.get,
-                               value="active",
-                               timeout=timeout)
+        image = timeouts.wait_for(self.cloud, "volume-upload",
+                                  volume_info["size"] * GiB, timeout,
+                                  image.id,
+                                  polling.watch(self.cloud, "images"),
+                                  value="active")
         self.upload_to_glance_event(dict(image))
         return image.id
 
@@ -111,10 +126,12 @@ class CreateVolumeTask(task.BaseCloudTask):
         }, namespace="/events")
 
 
-class CreateVolumeFromImage(CreateVolumeTask):
-    def execute(self, volume_info, image_info,
-                user_info, tenant_info, timeout):
-        image_id = image_info["id"]
+class CreateVolume(CreateVolumeTask):
+    lanes = ("cinder.dst",)
+    operation = "volume-create"
+
+    def create(self, volume_info, user_info, tenant_info, timeout,
+               **kwargs):
         if user_info:
             restrict_cloud = self.cloud.restrict(
                 username=user_info["name"],
@@ -128,21 +145,90 @@ class CreateVolumeFromImage(CreateVolumeTask):
                 volume_info["size"],
                 display_name=volume_info["display_name"],
                 display_description=volume_info["display_description"],
-                imageRef=image_id)
+                **kwargs)
         except Exception as exc:
             LOG.exception("Cannot create: %s", volume_info)
             raise exc
         else:
-            volume = utils.wait_for(volume.id,
-                                    self.cloud.cinder.volumes.get,
-                                    value="available",
-                                    timeout=timeout,
-                                    check_interval=3)
+            volume = timeouts.wait_for(self.cloud, self.operation,
+                                       volume_info["size"] * GiB, timeout,
+                                       volume.id,
+                                       polling.watch(self.cloud, "volumes"),
+                                       value="available")
             self.create_volume_event(volume._info)
         return volume._info
 
+    def execute(self, volume_info, user_info, tenant_info, timeout):
+        return self.create(volume_info, user_info, tenant_info, timeout)
+
+
+class CreateVolumeFromImage(CreateVolume):
+    operation = "volume-from-image"
+
+    def execute(self, volume_info, image_info,
+                user_info, tenant_info, timeout):
+        return self.create(volume_info, user_info, tenant_info, timeout,
+                           imageRef=image_info["id"])
+
+
+class VolumeReporter(utils_tasks.UploadReporter):
+    def report(self, absolute):
+        cloud_name, volume_info = self.context
+        LOG.info("Volume %r copied on %3.2f%%",
+                 volume_info["id"], absolute * 100)
+        events.emit("update", {
+            "id": volume_info["id"],
+            "type": "volume",
+            "cloud": cloud_name,
+            "action": None,
+            "progress": round(absolute * 100),
+            "transfer": self.stats(),
+        }, namespace="/events")
+
+
+class StreamVolume(task.BaseCloudsTask):
+    """Copies data of a volume into a new volume in one pass
+
+    Volumes of both clouds are accessed as files, see
+    :class:`pumphouse.transfer.VolumeFiles`.
+    """
+
+    def execute(self, volume_info, volume_dst):
+        src_files = transfer.volume_files["source"]
+        dst_files = transfer.volume_files["destination"]
+        reporter = VolumeReporter((self.dst_cloud.name, volume_dst),
+                                  size=volume_info["size"] * GiB)
+        with src_files.open(volume_info["id"]) as src, \
+                dst_files.open(volume_dst["id"], "r+b") as dst:
+            transfer.copy_volume(src, dst, reporter)
+        LOG.info("Data of volume %s is copied to volume %s",
+                 volume_info["id"], volume_dst["id"])
+        return volume_dst
+
+
+class SyncVolume(task.BaseCloudsTask):
+    """Copies changes of a pre-copied volume after its server is suspended
+
+    Only blocks which differ in the destination volume are written, see
+    :func:`pumphouse.transfer.sync_volume`.
+    """
+
+    def execute(self, volume_info, volume_dst):
+        src_files = transfer.volume_files["source"]
+        dst_files = transfer.volume_files["destination"]
+        reporter = VolumeReporter((self.dst_cloud.name, volume_dst),
+                                  size=volume_info["size"] * GiB)
+        with src_files.open(volume_info["id"]) as src, \
+                dst_files.open(volume_dst["id"], "r+b") as dst:
+            written = transfer.sync_volume(src, dst, reporter)
+        LOG.info("Changes of volume %s are copied to volume %s, %d bytes "
+                 "written", volume_info["id"], volume_dst["id"], written)
+        return volume_dst
+
 
 class CreateVolumeClone(CreateVolumeTask):
+    lanes = ("cinder.src",)
+
     def execute(self, volume_info, timeout, **requires):
         try:
             volume = self.cloud.cinder.volumes.create(
@@ -151,13 +237,153 @@ class CreateVolumeClone(CreateVolumeTask):
             LOG.exception("Source volume not found: %s", volume_info)
             raise exc
         else:
-            volume = utils.wait_for(volume.id, self.cloud.cinder.volumes.get,
-                                    value='available', timeout=timeout,
-                                    check_interval=3)
+            volume = timeouts.wait_for(self.cloud, "volume-clone",
+                                       volume_info["size"] * GiB, timeout,
+                                       volume.id,
+                                       polling.watch(self.cloud, "volumes"),
+                                       value='available')
             self.create_volume_event(volume._info)
         return volume._info
 
 
+class VerifyVolume(task.BaseCloudTask):
+    """Checks a pre-copied volume after its server is suspended
+
+    The volume must still have the size and the attachment it had when
+    the pre-copy started, changes of its data are copied after that.
+    """
+
+    def execute(self, volume_info, **requires):
+        volume = self.cloud.cinder.volumes.get(volume_info["id"])
+        server_ids = set(att["server_id"] for att in volume.attachments)
+        expected_ids = set(att["server_id"]
+                           for att in volume_info["attachments"])
+        if volume.size != volume_info["size"] or server_ids != expected_ids:
+            LOG.error("Volume changed during pre-copy: %s", volume._info)
+            raise exceptions.Conflict(
+                "Volume {} changed during pre-copy".format(volume.id))
+        return volume._info
+
+
+def get_backup_name(volume_id):
+    return "pumphouse-volume-{}-backup".format(volume_id)
+
+
+def collect_backups(cloud, backups):
+    """Hand backups over to the garbage collector, the newest first.
+
+    Incremental backups go before backups they are based on, cinder
+    doesn't delete backups which others depend on.
+    """
+    for backup in sorted(backups, key=lambda b: b.created_at, reverse=True):
+        garbage.collector.add(cloud, "backup", backup.id)
+
+
+class CreateVolumeBackup(task.BaseCloudTask):
+    """Backs up the volume, incrementally if it was backed up before
+
+    The volume itself is backed up, not its clone, so its backups make
+    a chain across migrations. Volumes in use are backed up with the
+    `force` flag, they are either pre-copied and backed up again after
+    their servers are suspended, or their servers are already suspended.
+    When the chain is `chain` backups long, a full backup starts a new
+    one and the old chain is handed over to the garbage collector.
+    """
+
+    lanes = ("cinder.src",)
+
+    def create(self, volume_id, **kwargs):
+        resp, body = self.cloud.cinder.client.post(
+            "/backups", body={"backup": dict(kwargs, volume_id=volume_id)})
+        return body["backup"]["id"]
+
+    def execute(self, volume_info, timeout, chain=DEFAULT_BACKUP_CHAIN,
+                **requires):
+        volume_id = volume_info["id"]
+        name = get_backup_name(volume_id)
+        options = {"name": name}
+        if volume_info["status"] == "in-use":
+            options["force"] = True
+        previous = [b for b in self.cloud.cinder.backups.list()
+                    if b.volume_id == volume_id and b.name == name]
+        backup_id = None
+        operation = "volume-backup"
+        if len(previous) < chain and any(b.status == "available"
+                                         for b in previous):
+            try:
+                backup_id = self.create(volume_id, incremental=True,
+                                        **options)
+            except exceptions.cinder_excs.BadRequest:
+                LOG.warning("Incremental backups are not supported, "
+                            "volume %s is backed up fully", volume_id)
+            else:
+                operation = "volume-incremental-backup"
+        if backup_id is None:
+            backup_id = self.create(volume_id, **options)
+        backup = timeouts.wait_for(self.cloud, operation,
+                                   volume_info["size"] * GiB, timeout,
+                                   backup_id,
+                                   polling.watch(self.cloud, "backups"),
+                                   value="available",
+                                   error_value="error")
+        LOG.info("Created backup: %s", backup._info)
+        if operation == "volume-backup":
+            collect_backups(self.cloud, previous)
+        return backup._info
+
+
+class ExportVolumeBackup(task.BaseCloudTask):
+    lanes = ("cinder.src",)
+
+    def execute(self, backup_info):
+        resp, body = self.cloud.cinder.client.get(
+            "/backups/{}/export_record".format(backup_info["id"]))
+        return body["backup-record"]
+
+
+class ImportVolumeBackup(task.BaseCloudTask):
+    """Imports the record of a backup from the shared store
+
+    Records of backups a chain is made of are kept, restores of
+    incremental backups need them. When a full backup is imported, the
+    records of the old chain are handed over to the garbage collector.
+    """
+
+    lanes = ("cinder.dst",)
+
+    def execute(self, backup_record, timeout):
+        resp, body = self.cloud.cinder.client.post(
+            "/backups/import_record", body={"backup-record": backup_record})
+        backup = timeouts.wait_for(self.cloud, "volume-backup-import", None,
+                                   timeout, body["backup"]["id"],
+                                   polling.watch(self.cloud, "backups"),
+                                   value="available",
+                                   error_value="error")
+        LOG.info("Imported backup: %s", backup._info)
+        if backup._info.get("is_incremental") is False:
+            collect_backups(self.cloud,
+                            [b for b in self.cloud.cinder.backups.list()
+                             if b.name == backup.name and b.id != backup.id])
+        return backup._info
+
+
+class RestoreVolumeBackup(task.BaseCloudTask):
+    lanes = ("cinder.dst",)
+
+    def execute(self, backup_info, volume_dst, timeout):
+        self.cloud.cinder.restores.restore(backup_info["id"],
+                                           volume_dst["id"])
+        volume = timeouts.wait_for(self.cloud, "volume-restore",
+                                   volume_dst["size"] * GiB, timeout,
+                                   volume_dst["id"],
+                                   polling.watch(self.cloud, "volumes"),
+                                   value="available",
+                                   error_value="error_restoring")
+        LOG.info("Restored volume %s from backup %s",
+                 volume.id, backup_info["id"])
+        return volume._info
+
+
 class DeleteVolume(task.BaseCloudTask):
 
     def do_delete(self, volume_info):
@@ -168,7 +394,8 @@ class DeleteVolume(task.BaseCloudTask):
             LOG.exception("Cannot delete: %s", str(volume._info))
             raise exc
         else:
-            volume = utils.wait_for(volume.id, self.cloud.cinder.volumes.get,
+            volume = utils.wait_for(volume.id,
+                                    polling.watch(self.cloud, "volumes"),
                                     stop_excs=(
                                         exceptions.cinder_excs.NotFound,))
             LOG.info("Deleted: %s", str(volume_info))
@@ -199,6 +426,31 @@ class DeleteSourceVolume(DeleteVolume):
             pass
 
 
+class CollectResource(task.BaseCloudTask):
+    """Hands an intermediate resource over to the garbage collector
+
+    The resource is deleted in background, so the flow doesn't wait for
+    that.
+
+    :param kind: `image`, `volume`, `snapshot` or `backup`
+    :param image_index: an instance of
+                        :class:`pumphouse.inventory.ImageIndex` to
+                        forget the image in or None
+    """
+
+    def __init__(self, cloud, kind, image_index=None, *args, **kwargs):
+        super(CollectResource, self).__init__(cloud, *args, **kwargs)
+        self.kind = kind
+        self.image_index = image_index
+
+    def execute(self, resource_info, **requires):
+        if isinstance(resource_info, dict):
+            if self.image_index is not None:
+                self.image_index.remove(resource_info)
+            resource_info = resource_info["id"]
+        garbage.collector.add(self.cloud, self.kind, resource_info)
+
+
 class BlockDeviceMapping(Task):
     def execute(self, volume_src, volume_dst, server_id):
         dev_mapping = volume_dst["id"]
@@ -209,35 +461,30 @@ class BlockDeviceMapping(Task):
         return (str(dev_name), str(dev_mapping))
 
 
-def migrate_detached_volume(context, volume_id, user_id, tenant_id):
-    volume_binding = "volume-{}".format(volume_id)
-    volume_retrieve = "{}-retrieve".format(volume_binding)
-    volume_upload = "{}-upload".format(volume_binding)
-    image_ensure = "{}-image-ensure".format(volume_binding)
-    tenant_ensure = "tenant-{}-ensure".format(tenant_id)
-    if user_id:
-        user_ensure = "user-{}-ensure".format(user_id)
-    else:
-        user_ensure = "user-none-ensure"
-        context.store[user_ensure] = None
-    volume_ensure = "{}-ensure".format(volume_binding)
-    timeout = context.config.get("volume_tasks_timeout", 120)
+@volume_transport.add("glance")
+def transport_by_image(context, flow, volume_binding, source_binding,
+                       user_ensure, tenant_ensure, timeout):
+    """Copy the volume through images of both clouds
 
-    flow = graph_flow.Flow("migrate-{}".format(volume_binding))
-    flow.add(RetrieveVolume(context.src_cloud,
-                            name=volume_binding,
-                            provides=volume_binding,
-                            rebind=[volume_retrieve]))
+    Data is uploaded to an image in the source cloud, then copied to
+    the destination cloud and a new volume is created from it there.
+    """
+    volume_image = volume_binding.to("image")
+    image_ensure = volume_binding.to("image-ensure")
+    volume_ensure = volume_binding.to("ensure")
+    image_delete = volume_binding.to("image-delete")
+    image_ensure_delete = volume_binding.to("image-ensure-delete")
     flow.add(UploadVolume(context.src_cloud,
-                          name=volume_upload,
-                          provides=volume_upload,
-                          rebind=[volume_binding],
-                          inject={"timeout": int(timeout)})),
+                          name=volume_image,
+                          provides=volume_image,
+                          rebind=[source_binding],
+                          inject={"timeout": int(timeout)}))
     flow.add(image_tasks.EnsureSingleImage(context.src_cloud,
                                            context.dst_cloud,
+                                           image_index=context.image_index,
                                            name=image_ensure,
                                            provides=image_ensure,
-                                           rebind=[volume_upload,
+                                           rebind=[volume_image,
                                                    user_ensure]))
     flow.add(CreateVolumeFromImage(context.dst_cloud,
                                    name=volume_ensure,
@@ -246,64 +493,208 @@ def migrate_detached_volume(context, volume_id, user_id, tenant_id):
                                            image_ensure,
                                            user_ensure,
                                            tenant_ensure],
-                                   inject={"timeout": int(timeout)})),
+                                   inject={"timeout": int(timeout)}))
+    flow.add(CollectResource(context.src_cloud, "image",
+                             name=image_delete,
+                             rebind=[volume_image],
+                             requires=[volume_ensure]),
+             CollectResource(context.dst_cloud, "image",
+                             image_index=context.image_index,
+                             name=image_ensure_delete,
+                             rebind=[image_ensure],
+                             requires=[volume_ensure]))
+
+
+@volume_transport.add("stream")
+def transport_by_stream(context, flow, volume_binding, source_binding,
+                        user_ensure, tenant_ensure, timeout):
+    """Copy data of the volume directly into a new volume
+
+    Volumes of both clouds must be available as files, see the
+    `volumes` parameter of the TRANSFER section.
+    """
+    if set(transfer.volume_files) != set(["source", "destination"]):
+        raise exceptions.ConfigError(
+            "Files of volumes of both clouds are required by the stream "
+            "transport")
+    volume_create = volume_binding.to("create")
+    volume_ensure = volume_binding.to("ensure")
+    flow.add(CreateVolume(context.dst_cloud,
+                          name=volume_create,
+                          provides=volume_create,
+                          rebind=[volume_binding,
+                                  user_ensure,
+                                  tenant_ensure],
+                          inject={"timeout": int(timeout)}))
+    flow.add(StreamVolume(context.src_cloud,
+                          context.dst_cloud,
+                          name=volume_ensure,
+                          provides=volume_ensure,
+                          rebind=[source_binding,
+                                  volume_create]))
+
+
+def restore_by_backup(context, flow, volume_binding, source_binding,
+                      volume_dst, volume_restore, timeout, prefix="backup"):
+    """Add tasks which restore a backup of the source volume
+
+    The volume itself is backed up, so the source binding is only
+    waited for, e.g. the suspension of the server of an attached volume.
+
+    :param volume_dst: a binding of the destination volume to restore to
+    :param volume_restore: a binding the restored volume is provided by
+    :param prefix: a phase of bindings of the backup and its record
+    """
+    volume_backup = volume_binding.to(prefix)
+    backup_export = volume_binding.to(prefix + "-export")
+    backup_import = volume_binding.to(prefix + "-import")
+    chain = context.config.get("volume_backup_chain", DEFAULT_BACKUP_CHAIN)
+    flow.add(CreateVolumeBackup(context.src_cloud,
+                                name=volume_backup,
+                                provides=volume_backup,
+                                rebind=[volume_binding],
+                                requires=[source_binding],
+                                inject={"timeout": int(timeout),
+                                        "chain": int(chain)}))
+    flow.add(ExportVolumeBackup(context.src_cloud,
+                                name=backup_export,
+                                provides=backup_export,
+                                rebind=[volume_backup]))
+    flow.add(ImportVolumeBackup(context.dst_cloud,
+                                name=backup_import,
+                                provides=backup_import,
+                                rebind=[backup_export],
+                                inject={"timeout": int(timeout)}))
+    flow.add(RestoreVolumeBackup(context.dst_cloud,
+                                 name=volume_restore,
+                                 provides=volume_restore,
+                                 rebind=[backup_import, volume_dst],
+                                 inject={"timeout": int(timeout)}))
+
+
+@volume_transport.add("backup")
+def transport_by_backup(context, flow, volume_binding, source_binding,
+                        user_ensure, tenant_ensure, timeout):
+    """Copy the volume through the backup store shared by both clouds
+
+    The backup of the volume is exported from the source cloud and
+    imported to the destination cloud, then it is restored to a new
+    volume. Backups are kept as bases for incremental backups of next
+    migrations of the volume, see :class:`CreateVolumeBackup`.
+    """
+    volume_create = volume_binding.to("create")
+    volume_ensure = volume_binding.to("ensure")
+    flow.add(CreateVolume(context.dst_cloud,
+                          name=volume_create,
+                          provides=volume_create,
+                          rebind=[volume_binding,
+                                  user_ensure,
+                                  tenant_ensure],
+                          inject={"timeout": int(timeout)}))
+    restore_by_backup(context, flow, volume_binding, source_binding,
+                      volume_create, volume_ensure, timeout)
+
+
+def has_backup_service(cloud):
+    return any(service.state == "up" and service.status == "enabled"
+               for service in cloud.cinder.services.list(
+                   binary="cinder-backup"))
+
+
+def can_backup(context):
+    if not context.config.get("volume_backup_shared", False):
+        return False
+    return all(has_backup_service(cloud)
+               for cloud in (context.src_cloud, context.dst_cloud))
+
+
+@volume_transport.add("auto")
+def transport_by_capabilities(context, *args):
+    """Copy the volume by the best transport supported by both clouds
+
+    Backups are used if both clouds run the backup service and the
+    `volume_backup_shared` parameter confirms they share its store,
+    which can't be detected through the API. Volumes are copied through
+    images otherwise.
+    """
+    if can_backup(context):
+        transport_by_backup(context, *args)
+    else:
+        transport_by_image(context, *args)
+
+
+def get_transport(context):
+    """Return the transport volumes are copied by in the context."""
+    transport = volume_transport.select_from_config(context.config)
+    if transport is transport_by_capabilities:
+        if can_backup(context):
+            return transport_by_backup
+        return transport_by_image
+    return transport
+
+
+def migrate_detached_volume(context, volume_id, user_id, tenant_id):
+    volume_binding = Binding("volume", volume_id)
+    volume_retrieve = volume_binding.to("retrieve")
+    tenant_ensure = Binding("tenant", tenant_id, "ensure")
+    if user_id:
+        user_ensure = Binding("user", user_id, "ensure")
+    else:
+        user_ensure = "user-none-ensure"
+        context.store[user_ensure] = None
+    timeout = context.config.get("volume_tasks_timeout", 120)
+
+    flow = graph_flow.Flow("migrate-{}".format(volume_binding))
+    flow.add(RetrieveVolume(context.src_cloud,
+                            name=volume_binding,
+                            provides=volume_binding,
+                            rebind=[volume_retrieve]))
+    volume_transport(context, flow, volume_binding, volume_binding,
+                     user_ensure, tenant_ensure, timeout)
     context.store[volume_retrieve] = volume_id
     return flow
 
 
 def migrate_attached_volume(context, server_id, volume_id,
                             user_id, tenant_id):
-    volume_binding = "volume-{}".format(volume_id)
-    volume_retrieve = "{}-retrieve".format(volume_binding)
-    volume_clone = "{}-clone".format(volume_binding)
-    volume_image = "{}-image".format(volume_binding)
-    volume_ensure = "{}-ensure".format(volume_binding)
-    volume_delete = "{}-delete".format(volume_binding)
-    volume_mapping = "{}-mapping".format(volume_binding)
-    image_ensure = "{}-image-ensure".format(volume_binding)
-    server_binding = "server-{}".format(server_id)
-    server_retrieve = "{}-retrieve".format(server_binding)
-    server_suspend = "{}-suspend".format(server_binding)
-    volume_sync = "{}-sync".format(volume_binding)
-    user_ensure = "user-{}-ensure".format(user_id)
-    tenant_ensure = "tenant-{}-ensure".format(tenant_id)
+    volume_binding = Binding("volume", volume_id)
+    volume_retrieve = volume_binding.to("retrieve")
+    volume_clone = volume_binding.to("clone")
+    volume_ensure = volume_binding.to("ensure")
+    volume_delete = volume_binding.to("delete")
+    volume_mapping = volume_binding.to("mapping")
+    server_binding = Binding("server", server_id)
+    server_retrieve = server_binding.to("retrieve")
+    server_suspend = server_binding.to("suspend")
+    user_ensure = Binding("user", user_id, "ensure")
+    tenant_ensure = Binding("tenant", tenant_id, "ensure")
     timeout = context.config.get("volume_tasks_timeout", 120)
 
+    transport = get_transport(context)
     flow = graph_flow.Flow("migrate-{}".format(volume_binding))
     flow.add(RetrieveVolume(context.src_cloud,
                             name=volume_binding,
                             provides=volume_binding,
-                            rebind=[volume_retrieve]),
-             CreateVolumeClone(context.src_cloud,
-                               name=volume_clone,
-                               provides=volume_clone,
-                               rebind=[volume_binding],
-                               requires=[server_suspend],
-                               inject={"timeout": int(timeout)}),
-             UploadVolume(context.src_cloud,
-                          name=volume_image,
-                          provides=volume_image,
-                          rebind=[volume_clone],
-                          inject={"timeout": int(timeout)}),
-             image_tasks.EnsureSingleImage(context.src_cloud,
-                                           context.dst_cloud,
-                                           name=image_ensure,
-                                           provides=image_ensure,
-                                           rebind=[volume_image,
-                                                   user_ensure]),
-             CreateVolumeFromImage(context.dst_cloud,
-                                   name=volume_ensure,
-                                   provides=volume_ensure,
-                                   rebind=[volume_binding,
-                                           image_ensure,
-                                           user_ensure,
-                                           tenant_ensure],
-                                   inject={"timeout": int(timeout)}),
-             DeleteVolume(context.src_cloud,
-                          name=volume_delete,
-                          rebind=[volume_clone],
-                          requires=[volume_ensure]),
-             BlockDeviceMapping(name=volume_mapping,
+                            rebind=[volume_retrieve]))
+    if transport is transport_by_backup:
+        # NOTE: Backups of volumes in use are forced, so the volume itself
+        #       is backed up once its server is suspended, without a clone.
+        transport(context, flow, volume_binding, server_suspend,
+                  user_ensure, tenant_ensure, timeout)
+    else:
+        flow.add(CreateVolumeClone(context.src_cloud,
+                                   name=volume_clone,
+                                   provides=volume_clone,
+                                   rebind=[volume_binding],
+                                   requires=[server_suspend],
+                                   inject={"timeout": int(timeout)}))
+        transport(context, flow, volume_binding, volume_clone,
+                  user_ensure, tenant_ensure, timeout)
+        flow.add(CollectResource(context.src_cloud, "volume",
+                                 name=volume_delete,
+                                 rebind=[volume_clone],
+                                 requires=[volume_ensure]))
+    flow.add(BlockDeviceMapping(name=volume_mapping,
                                 provides=volume_mapping,
                                 rebind=[volume_binding,
                                         volume_ensure,
@@ -312,25 +703,109 @@ def migrate_attached_volume(context, server_id, volume_id,
     return flow
 
 
+def precopy_attached_volume(context, server_id, volume_id,
+                            user_id, tenant_id):
+    """Copy data of the volume while its server is still running
+
+    The volume is copied to the destination cloud by the `stream` or the
+    `backup` transport before the server is suspended. After that it is
+    checked and its changes are copied to the same destination volume.
+    The stream transport writes only blocks which differ. The backup
+    transport backs the volume up incrementally, so only changed blocks
+    are stored, but cinder restores the backup by writing the whole
+    volume, see :func:`restore_by_backup`.
+
+    :returns: a flow which should finish before the server is suspended
+              and a flow to run after that
+    """
+    volume_binding = Binding("volume", volume_id)
+    volume_retrieve = volume_binding.to("retrieve")
+    volume_ensure = volume_binding.to("ensure")
+    volume_verify = volume_binding.to("verify")
+    volume_sync = volume_binding.to("sync")
+    volume_mapping = volume_binding.to("mapping")
+    server_binding = Binding("server", server_id)
+    server_retrieve = server_binding.to("retrieve")
+    server_suspend = server_binding.to("suspend")
+    user_ensure = Binding("user", user_id, "ensure")
+    tenant_ensure = Binding("tenant", tenant_id, "ensure")
+    timeout = context.config.get("volume_tasks_timeout", 120)
+
+    transport = get_transport(context)
+    precopy_flow = graph_flow.Flow("precopy-{}".format(volume_binding))
+    precopy_flow.add(RetrieveVolume(context.src_cloud,
+                                    name=volume_binding,
+                                    provides=volume_binding,
+                                    rebind=[volume_retrieve]))
+    transport(context, precopy_flow, volume_binding, volume_binding,
+              user_ensure, tenant_ensure, timeout)
+    flow = graph_flow.Flow("migrate-{}".format(volume_binding))
+    flow.add(VerifyVolume(context.src_cloud,
+                          name=volume_verify,
+                          provides=volume_verify,
+                          rebind=[volume_binding],
+                          requires=[server_suspend, volume_ensure]))
+    if transport is transport_by_backup:
+        restore_by_backup(context, flow, volume_binding, volume_verify,
+                          volume_ensure, volume_sync, timeout,
+                          prefix="sync-backup")
+    else:
+        flow.add(SyncVolume(context.src_cloud,
+                            context.dst_cloud,
+                            name=volume_sync,
+                            provides=volume_sync,
+                            rebind=[volume_verify, volume_ensure]))
+    flow.add(BlockDeviceMapping(name=volume_mapping,
+                                provides=volume_mapping,
+                                rebind=[volume_binding,
+                                        volume_sync,
+                                        server_retrieve]))
+    context.store[volume_retrieve] = volume_id
+    return precopy_flow, flow
+
+
 def migrate_server_volumes(context, server_id, attachments,
                            user_id, tenant_id):
+    """Migrate volumes attached to the server
+
+    If the `volume_precopy` parameter is set, data of volumes is copied
+    before the server is suspended, see :func:`precopy_attached_volume`.
+    Only the `stream` and `backup` transports copy changes of volumes.
+
+    :returns: a list of flows to run before the server is suspended, a
+              list of bindings they provide and a flow to run after
+              the server is suspended
+    """
+    precopy = context.config.get("volume_precopy", False)
+    if precopy and attachments and get_transport(context) not in (
+            transport_by_stream, transport_by_backup):
+        raise exceptions.ConfigError(
+            "Pre-copy of volumes requires the stream or backup transport")
+    precopy_flows, precopy_sync = [], []
     server_block_devices = []
     flow = graph_flow.Flow("migrate-server-{}-volumes".format(server_id))
     for attachment in attachments:
         volume_id = attachment["id"]
-        volume_retrieve = "volume-{}-retrieve".format(volume_id)
+        volume_retrieve = Binding("volume", volume_id, "retrieve")
         if volume_retrieve not in context.store:
-            server_block_devices.append("volume-{}-mapping".format(volume_id))
-            volume_flow = migrate_attached_volume(context,
-                                                  server_id,
-                                                  volume_id,
-                                                  user_id,
-                                                  tenant_id)
+            server_block_devices.append(
+                Binding("volume", volume_id, "mapping"))
+            if precopy:
+                precopy_flow, volume_flow = precopy_attached_volume(
+                    context, server_id, volume_id, user_id, tenant_id)
+                precopy_flows.append(precopy_flow)
+                precopy_sync.append(Binding("volume", volume_id, "ensure"))
+            else:
+                volume_flow = migrate_attached_volume(context,
+                                                      server_id,
+                                                      volume_id,
+                                                      user_id,
+                                                      tenant_id)
             flow.add(volume_flow)
 
-    server_device_mapping = "server-{}-device-mapping".format(server_id)
+    server_device_mapping = Binding("server", server_id, "device-mapping")
     flow.add(utils_tasks.Gather(name=server_device_mapping,
                                 provides=server_device_mapping,
                                 requires=server_block_devices))
 
-    return flow
+    return precopy_flows, precopy_sync, flow
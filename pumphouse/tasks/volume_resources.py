@@ -15,6 +15,7 @@
 import logging
 
 from pumphouse import exceptions
+from pumphouse.bindings import Binding
 from pumphouse.tasks import volume as volume_tasks
 from pumphouse.tasks import tenant as tenant_tasks
 from pumphouse.tasks import user as user_tasks
@@ -27,7 +28,7 @@ def migrate_volume(context, volume_id):
     volume = context.src_cloud.cinder.volumes.get(volume_id)
     volume_id = volume.id
     tenant_id = volume._info["os-vol-tenant-attr:tenant_id"]
-    tenant_retrieve = "tenant-{}-retrieve".format(tenant_id)
+    tenant_retrieve = Binding("tenant", tenant_id, "retrieve")
     try:
         users = context.src_cloud.keystone.tenants.list_users(
             tenant_id)
@@ -42,7 +43,7 @@ def migrate_volume(context, volume_id):
             user_id = None
         else:
             user_id = user.id
-    user_retrieve = "user-{}-retrieve".format(user_id)
+    user_retrieve = Binding("user", user_id, "retrieve")
     resources = []
 
     if tenant_retrieve not in context.store:
@@ -0,0 +1,158 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+from __future__ import division
+
+import json
+import logging
+import os
+import threading
+import time
+
+from pumphouse import utils
+
+
+LOG = logging.getLogger(__name__)
+
+# NOTE: A pessimistic rate, so large resources don't time out before
+#       their operations are observed.
+DEFAULT_RATE = 10 * 2 ** 20
+DEFAULT_FACTOR = 2
+DEFAULT_MIN_INTERVAL = 1
+DEFAULT_MAX_INTERVAL = 30
+HISTORY_SIZE = 10
+CHECKS = 20
+
+options = {
+    "factor": DEFAULT_FACTOR,
+    "min_interval": DEFAULT_MIN_INTERVAL,
+    "max_interval": DEFAULT_MAX_INTERVAL,
+}
+
+
+class Rates(object):
+    """Observed rates of operations with data of resources
+
+    The number of bytes and the time of each finished operation are
+    recorded per cloud and type of the operation. The rate is averaged
+    over last operations and kept in a JSON file between runs.
+
+    :param path: a path to the file or None to keep nothing
+    :param default: a number of bytes per second used before the first
+                    operation of the type is observed
+    """
+
+    def __init__(self, path=None, default=DEFAULT_RATE, size=HISTORY_SIZE):
+        self.path = path
+        self.default = default
+        self.size = size
+        self.lock = threading.Lock()
+        self.operations = self.load()
+
+    def load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except ValueError:
+            LOG.warning("Rates file %s is corrupted, ignored", self.path)
+            return {}
+
+    @staticmethod
+    def key(cloud_name, operation):
+        return "{}:{}".format(cloud_name, operation)
+
+    def record(self, cloud_name, operation, size, duration):
+        if not size or duration <= 0:
+            return
+        with self.lock:
+            runs = self.operations.setdefault(self.key(cloud_name, operation),
+                                              [])
+            runs.append({"bytes": size, "seconds": duration})
+            del runs[:-self.size]
+            if self.path is not None:
+                with open(self.path, "w") as f:
+                    json.dump(self.operations, f)
+
+    def rate(self, cloud_name, operation):
+        """Return the average number of bytes processed per second."""
+        with self.lock:
+            runs = self.operations.get(self.key(cloud_name, operation), [])
+            size = sum(run["bytes"] for run in runs)
+            duration = sum(run["seconds"] for run in runs)
+        if not size or not duration:
+            return self.default
+        return size / duration
+
+
+rates = Rates()
+
+
+def estimate(cloud, operation, size, minimum):
+    """Return the timeout and the interval of checks for the operation.
+
+    The timeout is the expected time of the operation multiplied by the
+    configured `factor`, the interval is a fraction of the expected time
+    limited by the configured bounds.
+
+    :param cloud: a cloud the operation is done in
+    :param operation: a type of the operation, e.g. `volume-upload`
+    :param size: a number of bytes the operation processes or None
+    :param minimum: the timeout of operations with small or unknown
+                    resources in seconds
+    """
+    if not size:
+        return minimum, options["min_interval"]
+    expected = size / rates.rate(cloud.name, operation)
+    timeout = max(minimum, expected * options["factor"])
+    interval = min(max(expected / CHECKS, options["min_interval"]),
+                   options["max_interval"])
+    LOG.debug("Operation %s of %d bytes in %s is expected to take %.1f "
+              "seconds, timeout is %.1f", operation, size, cloud.name,
+              expected, timeout)
+    return timeout, interval
+
+
+def wait_for(cloud, operation, size, minimum, resource, update_resource,
+             **kwargs):
+    """Wait for the resource with the timeout estimated by its size.
+
+    The time the resource took is recorded to the rates of the operation,
+    see :func:`pumphouse.utils.wait_for` for other parameters.
+    """
+    timeout, interval = estimate(cloud, operation, size, minimum)
+    started = time.time()
+    result = utils.wait_for(resource, update_resource, timeout=timeout,
+                            check_interval=interval, **kwargs)
+    rates.record(cloud.name, operation, size, time.time() - started)
+    return result
+
+
+def configure(config):
+    """Set rates and bounds of timeouts from the TIMEOUTS section.
+
+    :param config: a dict with the `history` path, the default `rate` in
+                   bytes per second, the `factor` and the `min_interval`
+                   and `max_interval` in seconds or None
+    """
+    global rates
+    config = config or {}
+    rates = Rates(path=config.get("history"),
+                  default=config.get("rate", DEFAULT_RATE))
+    options["factor"] = config.get("factor", DEFAULT_FACTOR)
+    options["min_interval"] = config.get("min_interval",
+                                         DEFAULT_MIN_INTERVAL)
+    options["max_interval"] = config.get("max_interval",
+                                         DEFAULT_MAX_INTERVAL)
@@ -0,0 +1,798 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import collections
+import datetime
+import hashlib
+import httplib
+import logging
+import os
+import Queue
+import sys
+import threading
+import time
+import types
+
+import six
+
+from pumphouse import events
+from pumphouse import exceptions
+
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 2 ** 20
+DEFAULT_BUFFERS = 8
+DEFAULT_SPOOL_BUDGET = 20 * 2 ** 30
+DEFAULT_RETRIES = 3
+DEFAULT_REPORT_PERIOD = 10
+DEFAULT_STALL_TIMEOUT = 30
+MAX_RECORDS = 10000
+
+DIRECTIONS = ("read", "write")
+
+PUT_TIMEOUT = 1
+
+options = {
+    "chunk_size": DEFAULT_CHUNK_SIZE,
+    "buffers": DEFAULT_BUFFERS,
+    "retries": DEFAULT_RETRIES,
+    "sparse": True,
+    "stall_timeout": DEFAULT_STALL_TIMEOUT,
+}
+
+RETRY_ERRORS = (IOError, httplib.HTTPException,
+                exceptions.glance_excs.CommunicationError)
+
+EOF = object()
+
+spool = None
+
+volume_files = {}
+
+
+class Relay(object):
+    """File-like object which reads a stream of data ahead
+
+    A reader thread pulls chunks from the source stream and puts them
+    into a bounded queue of buffers, while the consumer of the relay,
+    e.g. an upload to glance, reads them from the other end. So the
+    source is read while previous chunks are written. When all buffers
+    are full the reader waits for the consumer. MD5 and SHA-256 of the
+    data are computed as the consumer reads it.
+
+    :param data: an iterator over chunks of data
+    :param size: the total size of the data
+    :param reporter: an instance of
+                     :class:`pumphouse.tasks.utils.UploadReporter`
+    :param chunk_size: a size of buffers in bytes
+    :param buffers: a number of buffers
+    """
+
+    def __init__(self, data, size, reporter, chunk_size=None, buffers=None):
+        self.data = data
+        self.reporter = reporter
+        self.reporter.set_size(size)
+        self.chunk_size = chunk_size or options["chunk_size"]
+        self.chunks = Queue.Queue(buffers or options["buffers"])
+        self.chunk = ""
+        self.offset = 0
+        self.eof = False
+        self.stopped = threading.Event()
+        self.thread = None
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256()
+
+    def iter_data(self):
+        iterator = iter(self.data) if hasattr(self.data, "__iter__") \
+            else self.data
+        try:
+            while True:
+                try:
+                    chunk = iterator.next()
+                except StopIteration:
+                    return
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            if isinstance(iterator, types.GeneratorType):
+                iterator.close()
+
+    def put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.chunks.put(item, timeout=PUT_TIMEOUT)
+            except Queue.Full:
+                continue
+            else:
+                return True
+        return False
+
+    def fill(self):
+        iterator = self.iter_data()
+        pieces, size = [], 0
+        try:
+            for piece in iterator:
+                pieces.append(piece)
+                size += len(piece)
+                while size >= self.chunk_size:
+                    data = "".join(pieces)
+                    if not self.put(data[:self.chunk_size]):
+                        return
+                    rest = data[self.chunk_size:]
+                    pieces, size = [rest], len(rest)
+            if size:
+                self.put("".join(pieces))
+        except Exception:
+            LOG.exception("Error reading data to relay")
+            self.reporter.abort()
+            self.put(sys.exc_info())
+        finally:
+            iterator.close()
+            if not self.put(EOF):
+                self.reporter.abort()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.fill)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def next_chunk(self):
+        item = self.chunks.get()
+        if item is EOF:
+            self.eof = True
+            self.reporter.finish()
+            return False
+        if isinstance(item, tuple):
+            self.eof = True
+            six.reraise(*item)
+        self.chunk, self.offset = item, 0
+        return True
+
+    def read(self, amt=None):
+        """Read at most amt bytes or the rest of the current chunk.
+
+        :returns: a string which is empty when data is over
+        """
+        if self.thread is None:
+            self.start()
+        parts = []
+        while amt is None or amt > 0:
+            if self.offset >= len(self.chunk):
+                if self.eof or not self.next_chunk():
+                    break
+            if amt is None:
+                part = self.chunk[self.offset:]
+            else:
+                part = self.chunk[self.offset:self.offset + amt]
+                amt -= len(part)
+            self.offset += len(part)
+            parts.append(part)
+            if amt is None:
+                break
+        data = "".join(parts)
+        if data:
+            self.md5.update(data)
+            self.sha256.update(data)
+            governor.write(len(data))
+            self.reporter.update(len(data))
+        return data
+
+    def checksums(self):
+        """Return a dict with checksums of data read from the relay."""
+        return {
+            "md5": self.md5.hexdigest(),
+            "sha256": self.sha256.hexdigest(),
+        }
+
+    def close(self):
+        self.stopped.set()
+        self.reporter.abort()
+        # NOTE: Generators are closed by the reader thread, they can't
+        #       be closed while it runs them.
+        if isinstance(self.data, types.GeneratorType):
+            return
+        close = getattr(self.data, "close", None)
+        if close is not None:
+            close()
+
+    def isclosed(self):
+        isclosed = getattr(self.data, "isclosed", None)
+        if isclosed is None:
+            return self.stopped.is_set()
+        return isclosed()
+
+
+class TokenBucket(object):
+    """Limit of the rate of bytes
+
+    Callers take tokens for each chunk of data and sleep while the
+    bucket is in debt, so chunks bigger than the bucket are allowed
+    but slow down following ones.
+
+    :param rate: a number of bytes per second or None for no limit
+    :param burst: a number of seconds of the rate the bucket can hold
+    """
+
+    def __init__(self, rate=None, burst=1):
+        self.lock = threading.Lock()
+        self.burst = burst
+        self.rate = None
+        self.tokens = 0.0
+        self.updated = time.time()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        with self.lock:
+            if rate != self.rate:
+                self.rate = rate
+                self.tokens = rate * self.burst if rate else 0.0
+                self.updated = time.time()
+
+    def consume(self, amount):
+        with self.lock:
+            if not self.rate:
+                return
+            now = time.time()
+            capacity = self.rate * self.burst
+            self.tokens = min(capacity,
+                              self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            delay = -self.tokens / self.rate
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Governor(object):
+    """Process-wide limits of bandwidth of transfers of data
+
+    Reads from clouds and other sources and writes to clouds take
+    tokens from separate buckets. Rates can be changed by profiles
+    for periods of the day, e.g. to leave the network to the source
+    cloud during working hours. Measured rates are reported with the
+    `update` event of the `bandwidth` type.
+
+    :param config: a dict with `read` and `write` rates in bytes per
+                   second, the `burst` in seconds, the report `period`
+                   in seconds and the list of `profiles`
+    """
+
+    def __init__(self, config=None):
+        self.lock = threading.Lock()
+        self.buckets = dict((direction, TokenBucket())
+                            for direction in DIRECTIONS)
+        self.configure(config)
+
+    def configure(self, config):
+        config = config or {}
+        profiles = []
+        for profile in config.get("profiles", []):
+            try:
+                start = parse_time(profile["start"])
+                end = parse_time(profile["end"])
+            except (KeyError, ValueError):
+                raise exceptions.ConfigError(
+                    "Wrong bandwidth profile: {}".format(profile))
+            profiles.append((start, end, profile))
+        with self.lock:
+            self.defaults = config
+            self.profiles = profiles
+            self.period = config.get("period", DEFAULT_REPORT_PERIOD)
+            self.counters = dict.fromkeys(DIRECTIONS, 0)
+            self.reported = time.time()
+        for bucket in self.buckets.itervalues():
+            bucket.burst = config.get("burst", 1)
+        self.update_rates()
+
+    def get_limits(self, now=None):
+        """Return a dict with limits of directions at the time of day."""
+        now = (now or datetime.datetime.now()).time()
+        config = self.defaults
+        for start, end, profile in self.profiles:
+            if start <= end:
+                active = start <= now < end
+            else:
+                active = now >= start or now < end
+            if active:
+                config = profile
+                break
+        return dict((direction, config.get(direction))
+                    for direction in DIRECTIONS)
+
+    def update_rates(self):
+        limits = self.get_limits()
+        for direction, bucket in self.buckets.iteritems():
+            bucket.set_rate(limits[direction])
+        return limits
+
+    def consume(self, direction, amount):
+        self.buckets[direction].consume(amount)
+        with self.lock:
+            self.counters[direction] += amount
+            now = time.time()
+            elapsed = now - self.reported
+            if elapsed < self.period:
+                return
+            rates = dict((d, c / elapsed)
+                         for d, c in self.counters.iteritems())
+            self.counters = dict.fromkeys(DIRECTIONS, 0)
+            self.reported = now
+        self.report(rates, self.update_rates())
+
+    def read(self, amount):
+        self.consume("read", amount)
+
+    def write(self, amount):
+        self.consume("write", amount)
+
+    def report(self, rates, limits):
+        LOG.info("Bandwidth: read %d B/s, write %d B/s",
+                 rates["read"], rates["write"])
+        events.emit("update", {
+            "id": "bandwidth",
+            "type": "bandwidth",
+            "cloud": None,
+            "action": None,
+            "data": {
+                "read": rates["read"],
+                "write": rates["write"],
+                "read_limit": limits["read"],
+                "write_limit": limits["write"],
+            },
+        }, namespace="/events")
+
+
+class Telemetry(object):
+    """Statistics of finished transfers of data
+
+    Each record is a dict returned by
+    :meth:`pumphouse.tasks.utils.UploadReporter.stats`. Only the last
+    records are kept, so a long running service doesn't accumulate
+    them.
+
+    :param size: a maximum number of records
+    """
+
+    def __init__(self, size=MAX_RECORDS):
+        self.lock = threading.Lock()
+        self.records = collections.deque(maxlen=size)
+
+    def record(self, stats):
+        with self.lock:
+            self.records.append(stats)
+
+    def summary(self, since=None):
+        """Return aggregated statistics of transfers started since the time.
+
+        :param since: a timestamp or None for all transfers
+        :returns: a dict or None if there were no transfers
+        """
+        with self.lock:
+            records = [r for r in self.records
+                       if since is None or r["started"] >= since]
+        if not records:
+            return None
+        total = sum(r["bytes"] for r in records)
+        start = min(r["started"] for r in records)
+        end = max(r["started"] + r["elapsed"] for r in records)
+        ttfbs = [r["ttfb"] for r in records if r["ttfb"] is not None]
+        return {
+            "transfers": len(records),
+            "bytes": total,
+            "elapsed": end - start,
+            "throughput": total / (end - start) if end > start else 0.0,
+            "average": sum(r["average"] for r in records) / len(records),
+            "ttfb": max(ttfbs) if ttfbs else None,
+            "stalls": sum(r["stalls"] for r in records),
+        }
+
+    def report(self, since=None):
+        summary = self.summary(since)
+        if summary is None:
+            return None
+        LOG.info("Transferred %(bytes)d bytes in %(transfers)d transfers "
+                 "for %(elapsed).1f seconds, aggregate throughput "
+                 "%(throughput).0f B/s, average %(average).0f B/s, "
+                 "%(stalls)d stalls", summary)
+        events.emit("update", {
+            "id": "transfers",
+            "type": "transfers",
+            "cloud": None,
+            "action": None,
+            "data": summary,
+        }, namespace="/events")
+        return summary
+
+
+class GovernedFile(object):
+    """File-like object which reads data within the bandwidth limits
+
+    :param f: a file-like object
+    :param direction: `read` or `write` for the budget to draw from
+    """
+
+    def __init__(self, f, direction):
+        self.f = f
+        self.direction = direction
+
+    def read(self, *args):
+        data = self.f.read(*args)
+        if data:
+            governor.consume(self.direction, len(data))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+
+class SparseFile(object):
+    """File-like object which leaves holes in place of blocks of zeros
+
+    Data of raw images and images made of volumes is mostly zeros, so
+    its copies on the local disk take only the space of other blocks.
+
+    :param f: a file object opened for writing
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.skipped = 0
+
+    def write(self, data):
+        if options["sparse"] and is_zero(data):
+            self.f.seek(len(data), os.SEEK_CUR)
+            self.skipped += len(data)
+        else:
+            self.f.write(data)
+
+    def flush(self):
+        self.f.truncate(self.f.tell())
+        self.f.flush()
+
+
+class VolumeFiles(object):
+    """Volumes of a cloud which are stored as files
+
+    Drivers of cinder like NFS keep volumes as files in a directory.
+    If it is mounted on the host of pumphouse, data of volumes is
+    streamed between clouds directly. A plain directory serves as a
+    local stand-in of a cloud for tests.
+
+    :param path: a path to the directory
+    :param template: a format of names of files with the ID of volumes
+    """
+
+    def __init__(self, path, template="volume-{}"):
+        self.path = path
+        self.template = template
+
+    def get_path(self, volume_id):
+        return os.path.join(self.path, self.template.format(volume_id))
+
+    def open(self, volume_id, mode="rb"):
+        return open(self.get_path(volume_id), mode)
+
+
+def copy_volume(src, dst, reporter):
+    """Copy data of the volume from the source file to the destination one.
+
+    New volumes are filled with zeros, so blocks of zeros are skipped.
+
+    :param src: a file object of the source volume
+    :param dst: a file object of the destination volume
+    :param reporter: an instance of
+                     :class:`pumphouse.tasks.utils.UploadReporter`
+    """
+    sparse = SparseFile(dst)
+    try:
+        while True:
+            chunk = src.read(options["chunk_size"])
+            if not chunk:
+                break
+            governor.read(len(chunk))
+            sparse.write(chunk)
+            governor.write(len(chunk))
+            reporter.update(len(chunk))
+        sparse.flush()
+    except Exception:
+        reporter.abort()
+        raise
+    reporter.finish()
+
+
+def sync_volume(src, dst, reporter):
+    """Copy blocks of the source volume which differ in the destination one.
+
+    Both volumes are read, only changed blocks are written, so a volume
+    copied before is brought up to date by writes of its changes.
+
+    :param src: a file object of the source volume
+    :param dst: a file object of the destination volume opened for
+                reading and writing
+    :param reporter: an instance of
+                     :class:`pumphouse.tasks.utils.UploadReporter`
+    :returns: the number of written bytes
+    """
+    written = 0
+    try:
+        while True:
+            chunk = src.read(options["chunk_size"])
+            if not chunk:
+                break
+            governor.read(len(chunk))
+            offset = dst.tell()
+            if dst.read(len(chunk)) != chunk:
+                dst.seek(offset)
+                dst.write(chunk)
+                dst.seek(offset + len(chunk))
+                governor.write(len(chunk))
+                written += len(chunk)
+            reporter.update(len(chunk))
+        dst.flush()
+    except Exception:
+        reporter.abort()
+        raise
+    reporter.finish()
+    return written
+
+
+class Spool(object):
+    """Directory of data of images keyed by their checksums
+
+    Data of an image is saved into the spool while it is transferred
+    for the first time, next transfers of images with the same checksum
+    read it from the local disk. If the transfer fails, the partial
+    data is kept and the next transfer continues to fetch it from the
+    point where it stopped. When the total size of files is over the
+    budget, least recently used ones are removed.
+
+    :param path: a path to the directory
+    :param budget: a maximum total size of files in bytes
+    """
+
+    def __init__(self, path, budget):
+        self.path = path
+        self.budget = budget
+        self.lock = threading.Lock()
+        self.locks = {}
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def get_lock(self, checksum):
+        with self.lock:
+            return self.locks.setdefault(checksum, threading.Lock())
+
+    def get_path(self, checksum):
+        return os.path.join(self.path, checksum)
+
+    def lookup(self, checksum):
+        path = self.get_path(checksum)
+        try:
+            os.utime(path, None)
+        except OSError:
+            return None
+        return path
+
+    def iter_data(self, checksum, fetch):
+        """Iterate over data of an image, saving it if it isn't saved.
+
+        Transfers of images with the same checksum wait for each other,
+        so the data is fetched only once. The lock of the checksum is
+        released when data is saved or the iterator is closed.
+
+        :param checksum: an MD5 checksum of the image
+        :param fetch: a callable which takes an offset and returns an
+                      iterator over data of the image in the source
+                      cloud starting at the offset
+        """
+        lock = self.get_lock(checksum)
+        lock.acquire()
+        try:
+            path = self.lookup(checksum)
+            if path is None:
+                data = self.save(checksum, fetch)
+                try:
+                    for chunk in data:
+                        yield chunk
+                finally:
+                    data.close()
+                return
+        finally:
+            lock.release()
+        LOG.info("Data of image %s is read from spool", checksum)
+        for chunk in iter_file(path, options["chunk_size"]):
+            yield chunk
+
+    def save(self, checksum, fetch):
+        partial_path = os.path.join(self.path, ".{}.part".format(checksum))
+        md5 = hashlib.md5()
+        offset = 0
+        if os.path.exists(partial_path):
+            LOG.info("Data of image %s is resumed from spool", checksum)
+            for chunk in iter_file(partial_path, options["chunk_size"]):
+                md5.update(chunk)
+                offset += len(chunk)
+                yield chunk
+        with open(partial_path, "r+b" if offset else "wb") as f:
+            f.seek(offset)
+            sparse = SparseFile(f)
+            try:
+                for chunk in fetch(offset):
+                    sparse.write(chunk)
+                    md5.update(chunk)
+                    yield chunk
+            finally:
+                sparse.flush()
+        if sparse.skipped:
+            LOG.debug("Image %s has %d bytes of zeros left as holes in "
+                      "spool", checksum, sparse.skipped)
+        if md5.hexdigest() != checksum:
+            LOG.warning("Checksum of image %s doesn't match, data is not "
+                        "saved to spool", checksum)
+            os.remove(partial_path)
+            return
+        os.rename(partial_path, self.get_path(checksum))
+        LOG.info("Data of image %s is saved to spool", checksum)
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used files while the spool is too big.
+
+        Files are counted by blocks they take on the disk, so holes of
+        sparse files don't count. Partial data of images which are being
+        transferred is kept.
+        """
+        with self.lock:
+            busy = set(checksum for checksum, lock in self.locks.iteritems()
+                       if lock.locked())
+            files = []
+            for name in os.listdir(self.path):
+                stat = os.stat(os.path.join(self.path, name))
+                files.append((stat.st_mtime, stat.st_blocks * 512, name))
+            total = sum(size for _, size, _ in files)
+            for _, size, name in sorted(files):
+                if total <= self.budget:
+                    break
+                if name.startswith(".") and name[1:-5] in busy:
+                    continue
+                LOG.info("Data of image %s is evicted from spool", name)
+                os.remove(os.path.join(self.path, name))
+                total -= size
+
+
+def iter_file(path, chunk_size):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def is_zero(data):
+    return data.count("\0") == len(data)
+
+
+def parse_time(value):
+    return datetime.datetime.strptime(value, "%H:%M").time()
+
+
+def skip(data, offset):
+    for chunk in data:
+        if offset >= len(chunk):
+            offset -= len(chunk)
+            continue
+        yield chunk[offset:]
+        offset = 0
+
+
+def open_image(cloud, image_id, offset=0):
+    """Return an iterator over data of the image starting at the offset.
+
+    If glance doesn't support Range requests, it returns all data and
+    the first offset bytes are skipped.
+    """
+    if not offset:
+        return cloud.glance.images.data(image_id)
+    url = "/v2/images/{}/file".format(image_id)
+    resp, body = cloud.glance.images.http_client.get(
+        url, headers={"Range": "bytes={}-".format(offset)})
+    if resp.status_code == httplib.PARTIAL_CONTENT:
+        return body
+    LOG.warning("Range requests are not supported, first %d bytes of "
+                "image %s are skipped", offset, image_id)
+    return skip(body, offset)
+
+
+def iter_image(cloud, image_info, offset=0, retries=None):
+    """Iterate over data of the image, resuming it after failures.
+
+    :param cloud: a source cloud
+    :param image_info: a dict with the image
+    :param offset: a number of bytes to start from
+    :param retries: a maximum number of resumes or None to use the
+                    configured one
+    """
+    image_id, size = image_info["id"], image_info.get("size")
+    if retries is None:
+        retries = options["retries"]
+    attempt = 0
+    while True:
+        try:
+            for chunk in open_image(cloud, image_id, offset):
+                offset += len(chunk)
+                governor.read(len(chunk))
+                yield chunk
+            return
+        except RETRY_ERRORS:
+            if attempt >= retries or (size and offset >= size):
+                raise
+            attempt += 1
+            LOG.warning("Download of image %s failed at %d bytes, resume "
+                        "it (%d of %d)", image_id, offset, attempt, retries,
+                        exc_info=True)
+
+
+def get_image_data(cloud, image_info):
+    """Return an iterator over data of the image in the cloud.
+
+    If the spool is configured, the data is read through it.
+
+    :param cloud: a source cloud
+    :param image_info: a dict with the image
+    """
+    def fetch(offset=0):
+        return iter_image(cloud, image_info, offset)
+
+    checksum, size = image_info.get("checksum"), image_info.get("size")
+    if spool is None or not checksum or not size or size > spool.budget:
+        return fetch()
+    return spool.iter_data(checksum, fetch)
+
+
+governor = Governor()
+telemetry = Telemetry()
+
+
+def configure(config):
+    """Set sizes of buffers, the spool and limits from the TRANSFER section.
+
+    :param config: a dict with `chunk_size` in bytes, the number of
+                   `buffers`, the number of `retries`, the `sparse`
+                   flag, the `stall_timeout` in seconds, the `spool`
+                   dict with its `path` and the `budget` in bytes, the
+                   `bandwidth` dict of :class:`Governor` and the
+                   `volumes` dict which maps `source` and `destination`
+                   to parameters of :class:`VolumeFiles` or None
+    """
+    global spool
+    config = config or {}
+    options["chunk_size"] = config.get("chunk_size", DEFAULT_CHUNK_SIZE)
+    options["buffers"] = config.get("buffers", DEFAULT_BUFFERS)
+    options["retries"] = config.get("retries", DEFAULT_RETRIES)
+    options["sparse"] = config.get("sparse", True)
+    options["stall_timeout"] = config.get("stall_timeout",
+                                          DEFAULT_STALL_TIMEOUT)
+    governor.configure(config.get("bandwidth"))
+    spool_config = config.get("spool")
+    if spool_config:
+        spool = Spool(spool_config["path"],
+                      spool_config.get("budget", DEFAULT_SPOOL_BUDGET))
+    else:
+        spool = None
+    volume_files.clear()
+    for cloud, files_config in (config.get("volumes") or {}).iteritems():
+        volume_files[cloud] = VolumeFiles(**files_config)
@@ -139,6 +139,16 @@ def dump_task(task, f, prev=None):
     return task
 
 
+def iter_tasks(flow):
+    import taskflow.flow
+    for item in flow:
+        if isinstance(item, taskflow.flow.Flow):
+            for task in iter_tasks(item):
+                yield task
+        else:
+            yield item
+
+
 def configure_logging(config):
     log_config = config.get("LOGGING")
     if log_config is None:
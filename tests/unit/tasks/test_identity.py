@@ -2,6 +2,7 @@ import sys
 import unittest
 
 from mock import Mock, patch, call
+from pumphouse import inventory
 from pumphouse import task
 
 sys.modules["flask.ext"] = Mock()
@@ -36,8 +37,11 @@ class TestIdentity(unittest.TestCase):
             self.users_ids[1]: self.user2_info,
         }
         self.src_cloud.identity = self.users_infos
+        self.src_cloud.keystone.users.list.return_value = []
         self.context = Mock(src_cloud=self.src_cloud,
                             dst_cloud=self.dst_cloud,
+                            inventory=inventory.SourceInventory(
+                                self.src_cloud),
                             store={},
                             name="Context")
 
@@ -0,0 +1,121 @@
+import unittest
+
+from mock import Mock, patch
+from taskflow.engines.action_engine import compiler
+from taskflow.patterns import graph_flow
+
+from pumphouse import exceptions
+from pumphouse.tasks import image
+from pumphouse.bindings import Binding
+
+
+class FakeImage(dict):
+    def __init__(self, **kwargs):
+        super(FakeImage, self).__init__(**kwargs)
+        self.__dict__.update(kwargs)
+
+
+class TestEnsureImage(unittest.TestCase):
+    def setUp(self):
+        self.image_info = {
+            "id": "123",
+            "checksum": "c1",
+            "size": 1,
+            "name": "cirros",
+        }
+        self.dst_image = {"id": "456"}
+        self.src_cloud = Mock()
+        self.src_cloud.glance.images.get.return_value = self.image_info
+        self.dst_cloud = Mock()
+        self.image_index = Mock()
+
+    def test_execute_indexed(self):
+        self.image_index.find.return_value = self.dst_image
+        ensure_image = image.EnsureSingleImage(self.src_cloud,
+                                               self.dst_cloud,
+                                               image_index=self.image_index)
+
+        dst_image = ensure_image.execute("123", None)
+        self.assertEqual(self.dst_image, dst_image)
+        self.image_index.find.assert_called_once_with(self.image_info)
+        self.assertFalse(self.dst_cloud.glance.images.list.called)
+        self.assertFalse(self.dst_cloud.glance.images.create.called)
+
+    def test_execute_without_index(self):
+        self.dst_cloud.glance.images.list.return_value = [self.dst_image]
+        ensure_image = image.EnsureSingleImage(self.src_cloud,
+                                               self.dst_cloud)
+
+        dst_image = ensure_image.execute("123", None)
+        self.assertEqual(self.dst_image, dst_image)
+        self.dst_cloud.glance.images.list.assert_called_once_with(filters={
+            "checksum": "c1",
+            "name": "cirros",
+        })
+
+    @patch("pumphouse.tasks.image.events")
+    @patch("pumphouse.tasks.image.transfer")
+    def upload(self, dst_checksum, transfer_mock, events_mock):
+        self.dst_cloud.glance.images.list.return_value = []
+        self.dst_cloud.glance.images.create.return_value = {"id": "456"}
+        self.dst_cloud.glance.images.get.return_value = {
+            "id": "456",
+            "checksum": dst_checksum,
+        }
+        self.relay = relay = transfer_mock.Relay.return_value
+        relay.checksums.return_value = {"md5": "c1", "sha256": "s1"}
+        ensure_image = image.EnsureSingleImage(self.src_cloud,
+                                               self.dst_cloud)
+        for name in ("disk_format", "container_format", "visibility",
+                     "min_ram", "min_disk", "protected"):
+            self.image_info[name] = None
+        return ensure_image.execute("123", None)
+
+    def test_execute_verified(self):
+        dst_image = self.upload("c1")
+        self.assertEqual({"md5": "c1", "sha256": "s1",
+                          "verified": ["source", "destination"]},
+                         dst_image["checksums"])
+        self.relay.close.assert_called_once_with()
+
+    def test_execute_mismatch(self):
+        self.assertRaises(exceptions.ChecksumMismatch, self.upload, "c2")
+        self.dst_cloud.glance.images.delete.assert_called_once_with("456")
+        self.relay.close.assert_called_once_with()
+
+    def test_execute_upload_failed(self):
+        self.dst_cloud.glance.images.upload.side_effect = ValueError
+        self.assertRaises(ValueError, self.upload, "c1")
+        self.relay.close.assert_called_once_with()
+
+
+class TestMigrateImage(unittest.TestCase):
+    def setUp(self):
+        images = dict((image_id, FakeImage(id=image_id, visibility="public",
+                                           container_format="ami",
+                                           kernel_id="k1", ramdisk_id="r1"))
+                      for image_id in ("ami1", "ami2"))
+        self.context = Mock()
+        self.context.store = {}
+        self.context.inventory.get_image.side_effect = images.get
+
+    def test_shared_kernel_and_ramdisk(self):
+        flow = graph_flow.Flow("test").add(
+            image.migrate_image(self.context, "ami1"),
+            image.migrate_image(self.context, "ami2"),
+        )
+        graph = compiler.PatternCompiler().compile(flow).execution_graph
+        tasks = dict((str(node.name), node) for node in graph.nodes_iter())
+        self.assertEqual(["image-ami1-ensure", "image-ami2-ensure",
+                          "image-k1-ensure", "image-r1-ensure"],
+                         sorted(tasks))
+        for image_id in ("ami1", "ami2"):
+            self.assertEqual(
+                set(["image-k1-ensure", "image-r1-ensure"]),
+                set(str(node.name) for node in graph.predecessors(
+                    tasks["image-{}-ensure".format(image_id)])))
+        self.assertIn(Binding("image", "k1"), self.context.store)
+
+
+if __name__ == "__main__":
+    unittest.main()
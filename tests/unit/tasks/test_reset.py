@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from mock import Mock, patch
+
+from pumphouse import exceptions
+from pumphouse.tasks import reset
+
+
+class ImageCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = reset.ImageCache(os.path.join(self.tmpdir, "images"))
+        self.resource = Mock()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    @patch("pumphouse.tasks.reset.download")
+    def test_fetch(self, download_mock):
+        def download(url, f, resource):
+            f.write("data")
+            return 4
+
+        download_mock.side_effect = download
+        first = self.cache.fetch("http://images/cirros.img", self.resource)
+        second = self.cache.fetch("http://images/cirros.img", self.resource)
+        self.assertEqual(first, second)
+        self.assertEqual(4, first[1])
+        self.assertEqual(1, download_mock.call_count)
+        with reset.open_mapped(first[0]) as f:
+            self.assertEqual("da", f.read(2))
+            self.assertEqual("ta", f.read(2))
+            self.assertEqual("", f.read(2))
+
+    def test_block_size(self):
+        self.assertEqual(0, reset.IMAGE_BLOCK_SIZE %
+                         reset.mmap.ALLOCATIONGRANULARITY)
+        self.assertGreaterEqual(reset.IMAGE_BLOCK_SIZE, 1 << 20)
+
+    @patch("pumphouse.tasks.reset.download")
+    def test_fetch_stale(self, download_mock):
+        download_mock.side_effect = self.download
+        path, _ = self.cache.fetch("http://images/cirros.img", self.resource)
+        os.utime(path, (0, 0))
+        self.cache.fetch("http://images/cirros.img", self.resource)
+        self.assertEqual(2, download_mock.call_count)
+
+    @patch("pumphouse.tasks.reset.download")
+    def test_fetch_evict(self, download_mock):
+        download_mock.side_effect = self.download
+        self.cache.budget = 2 ** 16
+        first, _ = self.cache.fetch("http://images/a.img", self.resource)
+        os.utime(first, (time.time() - 10,) * 2)
+        second, _ = self.cache.fetch("http://images/b.img", self.resource)
+        self.assertEqual([os.path.basename(second)],
+                         os.listdir(self.cache.path))
+
+    def test_prepare_private(self):
+        cache = reset.ImageCache()
+        cache.prepare()
+        self.addCleanup(shutil.rmtree, cache.path)
+        self.assertEqual(0o700, os.stat(cache.path).st_mode & 0o777)
+
+    def test_prepare_shared(self):
+        os.chmod(self.tmpdir, 0o777)
+        cache = reset.ImageCache(self.tmpdir)
+        self.assertRaises(exceptions.ConfigError, cache.prepare)
+
+    def download(self, url, f, resource):
+        f.write("*" * 2 ** 16)
+        return 2 ** 16
+
+    @patch("pumphouse.tasks.reset.download")
+    def test_fetch_error(self, download_mock):
+        download_mock.side_effect = IOError("Broken")
+        self.assertRaises(IOError, self.cache.fetch,
+                          "http://images/cirros.img", self.resource)
+        self.assertEqual([], os.listdir(self.cache.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -194,7 +194,8 @@ class TestReprovisionServer(TestServer):
             [mock_image_flow], [image_ensure], [], image_ensure)
         mock_restore_floating_ips.return_value = floating_ips_flow()
         server_volumes_flow = Mock(name="volumes-flow")
-        mock_migrate_server_volumes.return_value = server_volumes_flow()
+        mock_migrate_server_volumes.return_value = (
+            [], [], server_volumes_flow())
         server_retrieve = "server-{}-retrieve".format(self.test_server_id)
         expected_store_dict = {server_retrieve: self.test_server_id}
         add_res, flow = server.reprovision_server(
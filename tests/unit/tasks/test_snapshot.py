@@ -34,6 +34,7 @@ class TestSnapshot(unittest.TestCase):
 
         self.context = Mock()
         self.context.store = {}
+        self.context.config = {}
 
         self.cloud = Mock()
         self.cloud.nova.servers.create_image.return_value = \
@@ -49,7 +50,7 @@ class TestSnapshotServer(TestSnapshot):
         ensure_snapshot = snapshot.SnapshotServer(self.cloud)
         self.assertIsInstance(ensure_snapshot, task.BaseCloudTask)
 
-        snapshot_id = ensure_snapshot.execute(self.test_server_info)
+        snapshot_id = ensure_snapshot.execute(self.test_server_info, 60)
         expected_name = "{}-snapshot-{}".format(self.test_server_name,
                                                 self.test_server_id)
         self.cloud.nova.servers.create_image.assert_called_once_with(
@@ -61,7 +62,15 @@ class TestSnapshotServer(TestSnapshot):
         self.cloud.nova.servers.create_image.side_effect = Exception
 
         with self.assertRaises(Exception):
-            snapshot.SnapshotServer(self.cloud).execute(self.test_server_info)
+            snapshot.SnapshotServer(self.cloud).execute(self.test_server_info,
+                                                        60)
+
+    def test_get_size(self):
+        self.cloud.nova.flavors.get.return_value = Mock(disk=2)
+        server_info = dict(self.test_server_info, flavor={"id": "1"})
+        size = snapshot.SnapshotServer(self.cloud).get_size(server_info)
+        self.assertEqual(2 * 2 ** 30, size)
+        self.cloud.nova.flavors.get.assert_called_once_with("1")
 
 
 class TestMigrateEphemeralStorage(TestSnapshot):
@@ -26,6 +26,73 @@ class UploadReporterTestCase(unittest.TestCase):
         self.reporter.update(1024)
         self.assertEqual([], self.reports)
 
+    @mock.patch("pumphouse.tasks.utils.transfer")
+    @mock.patch("pumphouse.tasks.utils.time")
+    def test_stats(self, time_mock, transfer_mock):
+        transfer_mock.options = {"stall_timeout": 30}
+        time_mock.time.return_value = 100.0
+        reporter = MemorizedUploadReporter(self.reports, size=1000)
+        for now in (102.0, 104.0, 150.0):
+            time_mock.time.return_value = now
+            reporter.update(100)
+        reporter.finish()
+        stats = reporter.stats()
+        self.assertEqual(2.0, stats["ttfb"])
+        self.assertEqual(1, stats["stalls"])
+        self.assertEqual(46.0, stats["stalled"])
+        self.assertEqual(6.0, stats["average"])
+        self.assertEqual(700 / 6.0, stats["eta"])
+        transfer_mock.telemetry.record.assert_called_once_with(stats)
+
+    @mock.patch("pumphouse.tasks.utils.LOG")
+    @mock.patch("pumphouse.tasks.utils.transfer")
+    @mock.patch("pumphouse.tasks.utils.time")
+    def test_check(self, time_mock, transfer_mock, log_mock):
+        transfer_mock.options = {"stall_timeout": 30}
+        time_mock.time.return_value = 100.0
+        reporter = MemorizedUploadReporter(self.reports, size=1000)
+        time_mock.time.return_value = 120.0
+        reporter.check()
+        self.assertFalse(reporter.stalling)
+        time_mock.time.return_value = 140.0
+        reporter.check()
+        reporter.check()
+        self.assertTrue(reporter.stalling)
+        self.assertEqual(1, log_mock.warning.call_count)
+        reporter.update(100)
+        self.assertFalse(reporter.stalling)
+
+    @mock.patch("pumphouse.tasks.utils.transfer")
+    def test_abort(self, transfer_mock):
+        self.assertIn(self.reporter, utils.watchdog.reporters)
+        self.reporter.abort()
+        self.assertNotIn(self.reporter, utils.watchdog.reporters)
+        self.reporter.finish()
+        self.assertFalse(transfer_mock.telemetry.record.called)
+
+
+class WatchdogTestCase(unittest.TestCase):
+    @mock.patch("pumphouse.tasks.utils.threading")
+    def test_add(self, threading_mock):
+        watchdog = utils.Watchdog()
+        reporter = mock.Mock()
+        watchdog.add(reporter)
+        watchdog.add(mock.Mock())
+        self.assertEqual(1, threading_mock.Thread.call_count)
+        watchdog.remove(reporter)
+        self.assertEqual(0, len(watchdog.reporters))
+
+    @mock.patch("pumphouse.tasks.utils.time")
+    def test_watch(self, time_mock):
+        watchdog = utils.Watchdog()
+        reporter = mock.Mock()
+        watchdog.reporters.add(reporter)
+        time_mock.sleep.side_effect = lambda _: (
+            watchdog.remove(reporter) if reporter.check.called else None)
+        watchdog.watch()
+        reporter.check.assert_called_once_with()
+        self.assertIsNone(watchdog.thread)
+
 
 class SyncPointTestCase(unittest.TestCase):
     def setUp(self):
@@ -36,34 +103,3 @@ class SyncPointTestCase(unittest.TestCase):
     def test_sync_point(self, mock_debug):
         self.point.execute(fake="fake")
         mock_debug.assert_called_once_with(mock.ANY, mock.ANY, mock.ANY)
-
-
-class FileProxyTestCase(unittest.TestCase):
-    def setUp(self):
-        self.data = mock.Mock()
-        self.resp = self.data
-        self.size = "1024"
-        self.data.next.side_effect = ["*" * 512] + ["*" * 512] + [None]
-        self.reporter = mock.Mock()
-        self.fproxy = utils.FileProxy(self.data, self.size, self.reporter)
-
-    def test_read(self):
-        chunk_one = self.fproxy.read(512)
-        chunk_two = self.fproxy.read(512)
-        chunk_none = self.fproxy.read(512)
-        chunk_data = "*" * 512
-        self.assertEqual(chunk_data, chunk_one)
-        self.assertEqual(chunk_data, chunk_two)
-        self.assertIsNone(chunk_none)
-        chunk_calls = [mock.call(512), mock.call(512)]
-        self.reporter.update.assert_calls(chunk_calls)
-        self.data.next.assert_calls(chunk_calls + [mock.call(512)])
-
-    def test_close(self):
-        self.fproxy.close()
-        self.resp.close.assert_called_once_with()
-
-    def test_isclosed(self):
-        self.resp.isclosed.return_value = True
-        isclosed = self.fproxy.isclosed()
-        self.assertTrue(isclosed)
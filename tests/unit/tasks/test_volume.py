@@ -12,10 +12,14 @@
 # See the License for the specific language governing permissions and#
 # limitations under the License.
 
+import os
+import shutil
+import tempfile
 import unittest
 from mock import Mock, MagicMock, patch, call
 
 from pumphouse import task
+from pumphouse import transfer
 from pumphouse.tasks import volume
 
 from pumphouse import exceptions
@@ -182,6 +186,134 @@ class TestCreateVolumeFromImage(TestVolume):
                                   self.timeout)
 
 
+class TestStreamVolume(TestVolume):
+    def setUp(self):
+        super(TestStreamVolume, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.files = {}
+        for cloud in ("source", "destination"):
+            path = os.path.join(self.tmpdir, cloud)
+            os.mkdir(path)
+            self.files[cloud] = transfer.VolumeFiles(path)
+        with self.files["source"].open("123", "wb") as f:
+            f.write("data" + "\0" * 4)
+        with self.files["destination"].open("789", "wb") as f:
+            f.write("\0" * 8)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    @patch("pumphouse.tasks.volume.events")
+    def test_execute(self, events_mock):
+        stream_volume = volume.StreamVolume(self.src_cloud, self.dst_cloud)
+        with patch.dict(transfer.volume_files, self.files):
+            volume_dst = stream_volume.execute(self.volume_info,
+                                               {"id": "789"})
+        self.assertEqual({"id": "789"}, volume_dst)
+        with self.files["destination"].open("789") as f:
+            self.assertEqual("data" + "\0" * 4, f.read())
+
+    @patch("pumphouse.tasks.volume.events")
+    def test_sync(self, events_mock):
+        sync_volume = volume.SyncVolume(self.src_cloud, self.dst_cloud)
+        with patch.dict(transfer.volume_files, self.files):
+            volume_dst = sync_volume.execute(self.volume_info,
+                                             {"id": "789"})
+        self.assertEqual({"id": "789"}, volume_dst)
+        with self.files["destination"].open("789") as f:
+            self.assertEqual("data" + "\0" * 4, f.read())
+
+
+class TestVolumeBackup(TestVolume):
+    def setUp(self):
+        super(TestVolumeBackup, self).setUp()
+        self.backup = Mock(id="678", status="available",
+                           volume_id=self.test_volume_id, created_at="1")
+        self.backup.name = "pumphouse-volume-123-backup"
+        self.backup._info = {"id": "678"}
+        self.cloud.cinder.backups.list.return_value = []
+        self.cloud.cinder.backups.get.return_value = self.backup
+        self.cloud.cinder.client.post.return_value = (
+            self.resp, {"backup": {"id": "678"}})
+        time_patcher = patch("pumphouse.utils.time")
+        self.time = time_patcher.start()
+        self.addCleanup(time_patcher.stop)
+        self.time.time.return_value = 0
+
+    def test_create_full(self):
+        self.cloud.cinder.backups.list.return_value = []
+        create_backup = volume.CreateVolumeBackup(self.cloud)
+        backup_info = create_backup.execute(self.volume_info, self.timeout)
+        self.cloud.cinder.client.post.assert_called_once_with(
+            "/backups", body={"backup": {
+                "volume_id": "123",
+                "name": "pumphouse-volume-123-backup",
+            }})
+        self.assertEqual({"id": "678"}, backup_info)
+
+    @patch("pumphouse.tasks.volume.garbage")
+    def test_create_new_chain(self, garbage_mock):
+        self.cloud.cinder.backups.list.return_value = [self.backup]
+        create_backup = volume.CreateVolumeBackup(self.cloud)
+        create_backup.execute(self.volume_info, self.timeout, chain=1)
+        body = self.cloud.cinder.client.post.call_args[1]["body"]
+        self.assertNotIn("incremental", body["backup"])
+        garbage_mock.collector.add.assert_called_once_with(
+            self.cloud, "backup", "678")
+
+    def test_create_of_volume(self):
+        create_backup = volume.CreateVolumeBackup(self.cloud)
+        create_backup.execute(self.volume_info, self.timeout,
+                              **{"server-456-suspend": {"id": "456"}})
+        body = self.cloud.cinder.client.post.call_args[1]["body"]
+        self.assertEqual("123", body["backup"]["volume_id"])
+
+    def test_create_in_use(self):
+        self.cloud.cinder.backups.list.return_value = []
+        self.volume_info["status"] = "in-use"
+        create_backup = volume.CreateVolumeBackup(self.cloud)
+        create_backup.execute(self.volume_info, self.timeout)
+        body = self.cloud.cinder.client.post.call_args[1]["body"]
+        self.assertTrue(body["backup"]["force"])
+
+    def test_create_incremental(self):
+        self.cloud.cinder.backups.list.return_value = [self.backup]
+        create_backup = volume.CreateVolumeBackup(self.cloud)
+        create_backup.execute(self.volume_info, self.timeout)
+        body = self.cloud.cinder.client.post.call_args[1]["body"]
+        self.assertTrue(body["backup"]["incremental"])
+        self.assertNotIn("force", body["backup"])
+
+    def test_import(self):
+        import_backup = volume.ImportVolumeBackup(self.cloud)
+        backup_info = import_backup.execute({"backup_url": "url"},
+                                            self.timeout)
+        self.cloud.cinder.client.post.assert_called_once_with(
+            "/backups/import_record",
+            body={"backup-record": {"backup_url": "url"}})
+        self.assertEqual({"id": "678"}, backup_info)
+
+    @patch("pumphouse.tasks.volume.garbage")
+    def test_import_new_chain(self, garbage_mock):
+        old_backup = Mock(id="567", created_at="0")
+        old_backup.name = self.backup.name
+        self.cloud.cinder.backups.list.return_value = [old_backup,
+                                                       self.backup]
+        self.backup._info["is_incremental"] = False
+        import_backup = volume.ImportVolumeBackup(self.cloud)
+        import_backup.execute({"backup_url": "url"}, self.timeout)
+        garbage_mock.collector.add.assert_called_once_with(
+            self.cloud, "backup", "567")
+
+    def test_restore(self):
+        restore_backup = volume.RestoreVolumeBackup(self.cloud)
+        volume_info = restore_backup.execute({"id": "678"},
+                                             self.volume_info, self.timeout)
+        self.cloud.cinder.restores.restore.assert_called_once_with("678",
+                                                                   "123")
+        self.assertEqual(self.volume_info, volume_info)
+
+
 class TestCreateVolumeSnapshot(TestVolume):
     def test_execute(self):
         create_volume = volume.CreateVolumeSnapshot(self.cloud)
@@ -208,11 +340,50 @@ class TestCreateVolumeClone(TestVolume):
         self.assertEqual(volume_info, self.volume_info)
 
 
+class TestVerifyVolume(TestVolume):
+    def setUp(self):
+        super(TestVerifyVolume, self).setUp()
+        self.volume.size = self.volume_info["size"]
+        self.volume.attachments = self.volume_info["attachments"]
+
+    def test_execute(self):
+        verify_volume = volume.VerifyVolume(self.cloud)
+
+        volume_info = verify_volume.execute(self.volume_info)
+        self.assertEqual(volume_info, self.volume_info)
+
+    def test_execute_resized(self):
+        verify_volume = volume.VerifyVolume(self.cloud)
+        self.volume.size = 2
+
+        with self.assertRaises(exceptions.Conflict):
+            verify_volume.execute(self.volume_info)
+
+
 class TestDeleteVolume(TestVolume):
     def test_do_delete(self):
         delete_volume = volume.DeleteVolume(self.cloud)
 
 
+class TestCollectResource(TestVolume):
+    @patch("pumphouse.garbage.collector")
+    def test_execute(self, collector_mock):
+        image_index = Mock()
+        collect = volume.CollectResource(self.cloud, "image",
+                                         image_index=image_index)
+        collect.execute({"id": "img1"})
+        image_index.remove.assert_called_once_with({"id": "img1"})
+        collector_mock.add.assert_called_once_with(self.cloud, "image",
+                                                   "img1")
+
+    @patch("pumphouse.garbage.collector")
+    def test_execute_id(self, collector_mock):
+        collect = volume.CollectResource(self.cloud, "volume")
+        collect.execute(self.test_volume_id)
+        collector_mock.add.assert_called_once_with(self.cloud, "volume",
+                                                   self.test_volume_id)
+
+
 class TestCreateVolumeTask(TestVolume):
     @patch("pumphouse.events.emit")
     def test_create_volume_event(self, mock_emit):
@@ -245,7 +416,7 @@ class TestMigrateVolume(TestVolume):
         super(TestMigrateVolume, self).setUp()
         self.volume_binding = "volume-{}".format(self.test_volume_id)
         self.volume_retrieve = "{}-retrieve".format(self.volume_binding)
-        self.volume_upload = "{}-upload".format(self.volume_binding)
+        self.volume_upload = "{}-image".format(self.volume_binding)
         self.image_ensure = "{}-image-ensure".format(self.volume_binding)
         self.user_id = "none"
         self.user_ensure = "user-{}-ensure".format(self.user_id)
@@ -254,6 +425,7 @@ class TestMigrateVolume(TestVolume):
 
 
 class TestMigrateDetachedVolume(TestMigrateVolume):
+    @patch.object(volume, "CollectResource")
     @patch("pumphouse.tasks.image.EnsureSingleImage")
     @patch.object(volume, "CreateVolumeFromImage")
     @patch.object(volume, "UploadVolume")
@@ -263,7 +435,8 @@ class TestMigrateDetachedVolume(TestMigrateVolume):
                                      retrieve_vol_mock,
                                      upload_vol_mock,
                                      create_vol_mock,
-                                     ensure_img_mock):
+                                     ensure_img_mock,
+                                     collect_mock):
         self.test_tenant_id = "1111"
         self.tenant_ensure = "tenant-{}-ensure".format(self.test_tenant_id)
         self.user_ensure = "user-none-ensure"
@@ -289,6 +462,7 @@ class TestMigrateDetachedVolume(TestMigrateVolume):
             inject={"timeout": int(self.timeout)})
         ensure_img_mock.assert_called_once_with(
             self.context.src_cloud, self.context.dst_cloud,
+            image_index=self.context.image_index,
             name=self.image_ensure, provides=self.image_ensure,
             rebind=[self.volume_upload, self.user_ensure])
         flow_mock.assert_called_once_with(
@@ -298,7 +472,58 @@ class TestMigrateDetachedVolume(TestMigrateVolume):
                          [call(retrieve_vol_mock()),
                           call(upload_vol_mock()),
                           call(ensure_img_mock()),
-                          call(create_vol_mock())])
+                          call(create_vol_mock()),
+                          call(collect_mock(), collect_mock())])
+        collect_mock.assert_any_call(
+            self.context.dst_cloud, "image",
+            image_index=self.context.image_index,
+            name="{}-delete".format(self.image_ensure),
+            rebind=[self.image_ensure], requires=[self.volume_ensure])
+
+
+class TestStreamTransport(TestMigrateVolume):
+    def test_migrate_detached_volume(self):
+        self.context.config["volume_transport"] = "stream"
+        with patch.dict(transfer.volume_files, {"source": Mock(),
+                                                "destination": Mock()}):
+            flow = volume.migrate_detached_volume(self.context,
+                                                  self.test_volume_id,
+                                                  None, "1111")
+        self.assertEqual(["volume-123", "volume-123-create",
+                          "volume-123-ensure"],
+                         sorted(t.name for t in flow))
+
+    def test_not_configured(self):
+        self.context.config["volume_transport"] = "stream"
+        self.assertRaises(exceptions.ConfigError,
+                          volume.migrate_detached_volume,
+                          self.context, self.test_volume_id, None, "1111")
+
+
+class TestAutoTransport(TestMigrateVolume):
+    def migrate(self, backup_states):
+        self.context.config["volume_transport"] = "auto"
+        for cloud, state in zip((self.src_cloud, self.dst_cloud),
+                                backup_states):
+            cloud.cinder.services.list.return_value = [
+                Mock(state=state, status="enabled")]
+        flow = volume.migrate_detached_volume(self.context,
+                                              self.test_volume_id,
+                                              None, "1111")
+        return set(t.name for t in flow)
+
+    def test_backup(self):
+        self.context.config["volume_backup_shared"] = True
+        names = self.migrate(("up", "up"))
+        self.assertIn("volume-123-backup-import", names)
+
+    def test_not_shared(self):
+        names = self.migrate(("up", "up"))
+        self.assertIn("volume-123-image-ensure", names)
+
+    def test_fallback(self):
+        names = self.migrate(("up", "down"))
+        self.assertIn("volume-123-image-ensure", names)
 
 
 class TestMigrateAttachedVolume(TestMigrateVolume):
@@ -312,3 +537,83 @@ class TestMigrateAttachedVolume(TestMigrateVolume):
                                               self.test_volume_id,
                                               self.user_info,
                                               self.tenant_info)
+
+    def test_migrate_attached_volume_clone(self):
+        flow = volume.migrate_attached_volume(self.context,
+                                              self.test_server_id,
+                                              self.test_volume_id,
+                                              self.user_info["id"],
+                                              self.tenant_info["id"])
+        names = set(t.name for t in flow)
+        self.assertIn("{}-clone".format(self.volume_binding), names)
+        self.assertIn("{}-delete".format(self.volume_binding), names)
+
+    def test_migrate_attached_volume_backup(self):
+        self.context.config["volume_transport"] = "backup"
+        flow = volume.migrate_attached_volume(self.context,
+                                              self.test_server_id,
+                                              self.test_volume_id,
+                                              self.user_info["id"],
+                                              self.tenant_info["id"])
+        tasks = dict((t.name, t) for t in flow)
+        self.assertNotIn("{}-clone".format(self.volume_binding), tasks)
+        backup = tasks["{}-backup".format(self.volume_binding)]
+        self.assertIn("server-{}-suspend".format(self.test_server_id),
+                      backup.requires)
+
+
+class TestPrecopyAttachedVolume(TestMigrateVolume):
+    def test_precopy_attached_volume(self):
+        self.context.config["volume_transport"] = "backup"
+        precopy_flow, flow = volume.precopy_attached_volume(
+            self.context, self.test_server_id, self.test_volume_id,
+            self.user_info["id"], self.tenant_info["id"])
+
+        precopy_names = set(t.name for t in precopy_flow)
+        self.assertIn(self.volume_ensure, precopy_names)
+        self.assertIn("{}-backup".format(self.volume_binding),
+                      precopy_names)
+        names = set(t.name for t in flow)
+        self.assertEqual(set("{}-{}".format(self.volume_binding, phase)
+                             for phase in ("verify", "sync-backup",
+                                           "sync-backup-export",
+                                           "sync-backup-import", "sync",
+                                           "mapping")),
+                         names)
+        self.assertEqual({self.volume_retrieve: self.test_volume_id},
+                         self.context.store)
+
+    def test_precopy_attached_volume_stream(self):
+        self.context.config["volume_transport"] = "stream"
+        with patch.dict(transfer.volume_files, {"source": Mock(),
+                                                "destination": Mock()}):
+            precopy_flow, flow = volume.precopy_attached_volume(
+                self.context, self.test_server_id, self.test_volume_id,
+                self.user_info["id"], self.tenant_info["id"])
+
+        precopy_names = set(t.name for t in precopy_flow)
+        self.assertIn(self.volume_ensure, precopy_names)
+        tasks = dict((t.name, t) for t in flow)
+        self.assertEqual(set("{}-{}".format(self.volume_binding, phase)
+                             for phase in ("verify", "sync", "mapping")),
+                         set(tasks))
+        self.assertIsInstance(tasks["{}-sync".format(self.volume_binding)],
+                              volume.SyncVolume)
+
+    def test_migrate_server_volumes_no_backups(self):
+        self.context.config["volume_precopy"] = True
+        self.assertRaises(exceptions.ConfigError,
+                          volume.migrate_server_volumes,
+                          self.context, self.test_server_id,
+                          [{"id": self.test_volume_id}],
+                          self.user_info["id"], self.tenant_info["id"])
+
+    def test_migrate_server_volumes_precopy(self):
+        self.context.config["volume_precopy"] = True
+        self.context.config["volume_transport"] = "backup"
+        precopy_flows, precopy_sync, flow = volume.migrate_server_volumes(
+            self.context, self.test_server_id, [{"id": self.test_volume_id}],
+            self.user_info["id"], self.tenant_info["id"])
+
+        self.assertEqual(1, len(precopy_flows))
+        self.assertEqual([self.volume_ensure], precopy_sync)
@@ -0,0 +1,70 @@
+import copy
+import unittest
+
+from pumphouse import bindings
+
+
+class BindingTestCase(unittest.TestCase):
+    def test_name(self):
+        self.assertEqual("server-s1", bindings.Binding("server", "s1"))
+        self.assertEqual("server-s1-retrieve",
+                         bindings.Binding("server", "s1", "retrieve"))
+        self.assertEqual("user-role-u1-r1-t1-ensure",
+                         bindings.Binding("user-role", ("u1", "r1", "t1"),
+                                          "ensure"))
+
+    def test_store_key(self):
+        store = {bindings.Binding("server", "s1", "retrieve"): "s1"}
+        self.assertIn("server-s1-retrieve", store)
+        self.assertIn(bindings.Binding("server", "s1", "retrieve"), store)
+
+    def test_to(self):
+        binding = bindings.Binding("volume", "v1").to("ensure")
+        self.assertEqual(("volume", "v1", "ensure"), binding.key)
+
+    def test_copy(self):
+        binding = copy.deepcopy(bindings.Binding("image", "i1", "ensure"))
+        self.assertEqual(("image", "i1", "ensure"), binding.key)
+
+    def test_find(self):
+        store = {
+            bindings.Binding("server", "s1", "retrieve"): "s1",
+            bindings.Binding("server", "s2"): "s2",
+            bindings.Binding("image", "i1", "retrieve"): "i1",
+            "server-s3-retrieve": "s3",
+        }
+        self.assertEqual(["s1"],
+                         bindings.find(store, "server", "retrieve"))
+
+    def test_same_instance(self):
+        self.assertIs(bindings.Binding("server", "s1", "retrieve"),
+                      bindings.Binding("server", "s1").to("retrieve"))
+
+
+class StoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.store = bindings.Store({
+            bindings.Binding("server", "s1", "retrieve"): "s1",
+            bindings.Binding("server", "s2"): "s2",
+            "server-s3-retrieve": "s3",
+        })
+
+    def test_find(self):
+        self.store[bindings.Binding("server", "s4", "retrieve")] = "s4"
+        self.assertEqual(["s1", "s4"],
+                         sorted(bindings.find(self.store, "server",
+                                              "retrieve")))
+        self.assertEqual(["s2"], bindings.find(self.store, "server"))
+        self.assertEqual([], bindings.find(self.store, "image"))
+
+    def test_remove(self):
+        del self.store[bindings.Binding("server", "s1", "retrieve")]
+        self.store.pop(bindings.Binding("server", "s2"))
+        self.assertEqual([], bindings.find(self.store, "server",
+                                           "retrieve"))
+        self.assertEqual([], bindings.find(self.store, "server"))
+        self.assertEqual({"server-s3-retrieve": "s3"}, self.store)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock, patch
+from taskflow.patterns import linear_flow
+from taskflow import task
+
+from pumphouse import bindings
+from pumphouse.bindings import Binding
+from pumphouse import exceptions
+from pumphouse import flows
+from pumphouse.tasks.network.nova import network as nova_network
+
+
+class IterWavesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.items = [("a", 1), ("b", 5), ("c", 2), ("d", 1)]
+
+    def test_no_limits(self):
+        waves = list(flows.iter_waves(self.items))
+        self.assertEqual([["a", "b", "c", "d"]], waves)
+
+    def test_max_items(self):
+        waves = list(flows.iter_waves(self.items, max_items=3))
+        self.assertEqual([["a", "b", "c"], ["d"]], waves)
+
+    def test_max_size(self):
+        waves = list(flows.iter_waves(self.items, max_size=4))
+        self.assertEqual([["a"], ["b"], ["c", "d"]], waves)
+
+
+class FakeTask(task.Task):
+    def execute(self):
+        pass
+
+
+class RunWavesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.context = Mock(store={})
+        self.items = [("a", 1), ("b", 1)]
+
+    @patch.object(flows, "run_flow")
+    def test_run_waves(self, mock_run_flow):
+        def build(context, flow, wave):
+            name = "{}-ensure".format(wave[0])
+            flow.add(FakeTask(name=name, provides=name))
+
+        mock_run_flow.side_effect = [{"a-ensure": "A", "a-clone": "C"},
+                                     {"b-ensure": "B"}]
+        flows.run_waves(self.context, "test", build, self.items,
+                        max_items=1)
+        self.assertEqual(2, mock_run_flow.call_count)
+        self.assertEqual({"a-ensure": "A", "b-ensure": "B"},
+                         self.context.store)
+
+    def test_run_waves_shared(self):
+        def network(id_):
+            return Mock(to_dict=Mock(return_value={"id": id_,
+                                                   "label": id_}))
+
+        def build(context, flow, wave):
+            for network_id in wave:
+                network_flow, _ = nova_network.migrate_network(
+                    context, network_id=network_id, tenant_id="t")
+                flow.add(network_flow)
+
+        src_cloud, dst_cloud = Mock(), Mock()
+        src_cloud.nova.networks.list.return_value = [network("n1"),
+                                                     network("n2")]
+        dst_cloud.nova.networks.list.return_value = [network("n1"),
+                                                     network("n2")]
+        self.context.src_cloud = src_cloud
+        self.context.dst_cloud = dst_cloud
+        self.context.store["tenant-t-ensure"] = {"id": "t"}
+        flows.run_waves(self.context, "test", build,
+                        [("n1", 1), ("n2", 1)], max_items=1)
+        self.assertEqual({"id": "n2", "label": "n2"},
+                         self.context.store["network-n2-ensure"])
+        src_cloud.nova.networks.list.assert_called_once_with()
+        dst_cloud.nova.networks.list.assert_called_once_with()
+
+    @patch.object(flows, "run_flow")
+    def test_run_waves_empty(self, mock_run_flow):
+        build = Mock()
+        flows.run_waves(self.context, "test", build, self.items,
+                        max_items=1)
+        self.assertEqual(2, build.call_count)
+        self.assertFalse(mock_run_flow.called)
+
+
+class Interrupt(BaseException):
+    pass
+
+
+class CountingTask(task.Task):
+    def __init__(self, calls, interrupt=False, **kwargs):
+        super(CountingTask, self).__init__(**kwargs)
+        self.calls = calls
+        self.interrupt = interrupt
+
+    def execute(self):
+        self.calls.append(self.name)
+        if self.interrupt and self.calls.count(self.name) == 1:
+            raise Interrupt()
+        return self.name.upper()
+
+
+class PersistenceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.calls = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def make_flow(self):
+        return linear_flow.Flow("test").add(
+            CountingTask(self.calls, name="a", provides="a"),
+            CountingTask(self.calls, interrupt=True, name="b",
+                         provides="b"),
+        )
+
+    def check_resume(self, path):
+        backend = flows.get_backend({"path": path})
+        book = flows.create_job(backend, action="migrate", ids=["a"])
+        self.assertRaises(Interrupt, flows.run_flow, self.make_flow(), {},
+                          backend=backend, book=book)
+        book = flows.load_job(backend, book.uuid)
+        self.assertEqual({"action": "migrate", "ids": ["a"]}, book.meta)
+        result = flows.run_flow(self.make_flow(), {},
+                                backend=backend, book=book)
+        self.assertEqual({"a": "A", "b": "B"}, result)
+        self.assertEqual(["a", "b", "b"], self.calls)
+
+    def test_resume_dir(self):
+        self.check_resume(os.path.join(self.tmpdir, "jobs"))
+
+    def test_resume_sqlite(self):
+        self.check_resume(os.path.join(self.tmpdir, "jobs.sqlite"))
+
+    def test_run_flow_priorities(self):
+        flow = linear_flow.Flow("test").add(
+            CountingTask(self.calls, name="a", provides="a"))
+        result = flows.run_flow(flow, {}, priorities={"a": (0, 0)})
+        self.assertEqual({"a": "A"}, result)
+
+    def test_get_backend_not_configured(self):
+        self.assertIsNone(flows.get_backend(None))
+
+    def test_keep_items(self):
+        backend = flows.get_backend({"path": self.tmpdir})
+        book = flows.create_job(backend, action="migrate")
+        gone = set()
+
+        def build(context, flow, ids):
+            if ids[0] in gone:
+                raise exceptions.NotFound()
+            flow.add(CountingTask(self.calls, interrupt=ids[0] == "b",
+                                  name=ids[0], provides=ids[0]))
+            context.store[Binding("item", ids[0], "retrieve")] = ids[0]
+
+        prefetch = Mock()
+        context = Mock(store=bindings.Store())
+        flow = flows.keep_items(context, linear_flow.Flow("test"), build,
+                                ["a", "b", "c"], backend, book,
+                                prefetch=prefetch)
+        prefetch.assert_called_once_with(["a", "b", "c"])
+        self.assertRaises(Interrupt, flows.run_flow, flow, context.store,
+                          backend=backend, book=book)
+        gone.update(["a", "c"])
+        book = flows.load_job(backend, book.uuid)
+        prefetch.reset_mock()
+        context = Mock(store=bindings.Store())
+        flow = flows.keep_items(context, linear_flow.Flow("test"), build,
+                                ["a", "b", "c"], backend, book,
+                                prefetch=prefetch)
+        prefetch.assert_called_once_with(["b", "c"])
+        result = flows.run_flow(flow, context.store, backend=backend,
+                                book=book)
+        self.assertEqual(["a", "b", "b"], self.calls)
+        self.assertEqual("B", result["b"])
+        self.assertEqual({"item-a-retrieve": "a", "item-b-retrieve": "b",
+                          "item-c-retrieve": "c"}, context.store)
+        self.assertEqual(["a", "b", "c"],
+                         sorted(bindings.find(context.store, "item",
+                                              "retrieve")))
+
+    def test_keep_waves(self):
+        backend = flows.get_backend({"path": self.tmpdir})
+        book = flows.create_job(backend, action="migrate")
+        waves = flows.keep_waves(backend, book, "test", [["a", "b"], ["c"]])
+        self.assertEqual([["a", "b"], ["c"]], waves)
+        book = flows.load_job(backend, book.uuid)
+        waves = flows.keep_waves(backend, book, "test", [["b", "c", "d"]])
+        self.assertEqual([["b"], ["c"], ["d"]], waves)
+
+
+if __name__ == "__main__":
+    unittest.main()
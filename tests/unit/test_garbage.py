@@ -0,0 +1,160 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from pumphouse import exceptions
+from pumphouse import garbage
+
+
+class JournalTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "garbage.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_add(self):
+        journal = garbage.Journal(self.path)
+        entry = journal.add("source", "volume", "vol1")
+        self.assertIs(entry, journal.add("source", "volume", "vol1"))
+        journal.add("source", "snapshot", "snap1")
+        journal.update(entry, state="deleted")
+        self.assertEqual(1, len(journal.entries))
+        with open(self.path) as f:
+            self.assertEqual(["snap1"], [e["id"] for e in json.load(f)])
+        journal = garbage.Journal(self.path)
+        self.assertEqual([], journal.pending(["destination"]))
+        self.assertEqual(1, len(journal.pending(["source"])))
+
+    def test_corrupted(self):
+        with open(self.path, "w") as f:
+            f.write("{")
+        self.assertEqual({}, garbage.Journal(self.path).entries)
+
+
+class CollectorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.collector = garbage.Collector(batch_size=2, retry_interval=0)
+        self.cloud = mock.Mock()
+        self.cloud.name = "source"
+        self.deleted = set()
+        self.cloud.cinder.volumes.list.return_value = []
+        self.cloud.cinder.volumes.get.side_effect = self.get_volume
+        self.cloud.cinder.volumes.delete.side_effect = self.deleted.add
+        self.cloud.cinder.volume_snapshots.get.return_value = mock.Mock(
+            size=1)
+        self.cloud.glance.images.get.return_value = {"size": 100}
+        time_patcher = mock.patch("pumphouse.utils.time")
+        time_patcher.start().time.return_value = 0
+        self.addCleanup(time_patcher.stop)
+
+    def get_volume(self, volume_id):
+        if volume_id in self.deleted:
+            raise exceptions.cinder_excs.NotFound(404)
+        return mock.Mock(size=1, status="deleting")
+
+    def test_collect(self):
+        self.collector.add(self.cloud, "snapshot", "snap1")
+        self.collector.add(self.cloud, "volume", "vol1")
+        self.collector.add(self.cloud, "image", "img1")
+        reclaimed = self.collector.finish(timeout=10)
+        self.assertEqual({
+            "image": {"count": 1, "bytes": 100},
+            "volume": {"count": 1, "bytes": garbage.GiB},
+            "snapshot": {"count": 1, "bytes": garbage.GiB},
+        }, reclaimed)
+        self.cloud.cinder.volumes.delete.assert_called_once_with("vol1")
+        self.cloud.cinder.volume_snapshots.delete.assert_called_once_with(
+            "snap1")
+        self.assertEqual([], self.collector.journal.pending(["source"]))
+
+    def test_order(self):
+        self.collector.thread = mock.Mock()
+        self.collector.add(self.cloud, "snapshot", "snap1")
+        self.collector.add(self.cloud, "volume", "vol1")
+        batch = self.collector.next_batch()[0]
+        self.collector.collect(batch)
+        calls = [name for name, _, _ in self.cloud.cinder.method_calls
+                 if name.endswith((".get", ".delete"))]
+        self.assertEqual(["volumes.get", "volumes.delete", "volumes.get",
+                          "volume_snapshots.get", "volume_snapshots.delete"],
+                         calls)
+
+    def test_backup_chain(self):
+        backups = {"b1": None, "b2": "b1"}
+        deleting = set()
+
+        def get_backup(backup_id):
+            if backup_id in deleting:
+                del backups[backup_id]
+                deleting.discard(backup_id)
+            if backup_id not in backups:
+                raise exceptions.cinder_excs.NotFound(404)
+            status = "deleting" if backup_id in deleting else "available"
+            return mock.Mock(size=1, status=status)
+
+        def delete_backup(backup_id):
+            if backup_id in backups.values():
+                raise exceptions.cinder_excs.BadRequest(400)
+            deleting.add(backup_id)
+
+        self.cloud.cinder.backups.list.return_value = []
+        self.cloud.cinder.backups.get.side_effect = get_backup
+        self.cloud.cinder.backups.delete.side_effect = delete_backup
+        self.collector.thread = mock.Mock()
+        self.collector.add(self.cloud, "backup", "b2")
+        self.collector.add(self.cloud, "backup", "b1")
+        self.collector.collect(self.collector.next_batch()[0])
+        self.assertEqual({}, backups)
+        self.assertEqual({"count": 2, "bytes": 2 * garbage.GiB},
+                         self.collector.reclaimed["backup"])
+
+    def test_leftovers(self):
+        self.collector.journal.add("source", "volume", "vol1")
+        self.collector.journal.add("destination", "image", "img1")
+        reclaimed = self.collector.finish(timeout=10, clouds=[self.cloud])
+        self.assertEqual({"volume": {"count": 1, "bytes": garbage.GiB}},
+                         reclaimed)
+        self.assertEqual(1, len(self.collector.journal.entries))
+
+    def test_retry(self):
+        errors = [exceptions.cinder_excs.BadRequest(400)]
+
+        def delete(volume_id):
+            if errors:
+                raise errors.pop()
+            self.deleted.add(volume_id)
+
+        self.cloud.cinder.volumes.delete.side_effect = delete
+        self.collector.add(self.cloud, "volume", "vol1")
+        reclaimed = self.collector.finish(timeout=10)
+        self.assertEqual(1, reclaimed["volume"]["count"])
+        self.assertEqual(2, self.cloud.cinder.volumes.delete.call_count)
+
+    def test_failed(self):
+        self.cloud.cinder.volumes.delete.side_effect = (
+            exceptions.cinder_excs.BadRequest(400))
+        self.collector.add(self.cloud, "volume", "vol1")
+        self.assertEqual({}, self.collector.finish(timeout=10))
+        self.assertEqual(garbage.MAX_ATTEMPTS,
+                         self.cloud.cinder.volumes.delete.call_count)
+
+    def test_already_deleted(self):
+        self.cloud.glance.images.get.side_effect = (
+            exceptions.glance_excs.NotFound())
+        self.collector.add(self.cloud, "image", "img1")
+        reclaimed = self.collector.finish(timeout=10)
+        self.assertEqual({"count": 1, "bytes": 0}, reclaimed["image"])
+
+    def test_unknown_kind(self):
+        self.assertRaises(exceptions.NotFound, self.collector.add,
+                          self.cloud, "server", "srv1")
+
+
+if __name__ == "__main__":
+    unittest.main()
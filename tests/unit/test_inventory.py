@@ -0,0 +1,219 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock, patch
+
+from pumphouse import inventory
+
+
+class InventoryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.servers = [
+            Mock(id="srv1", tenant_id="t1",
+                 security_groups=[{"name": "default"}]),
+            Mock(id="srv2", tenant_id="t2",
+                 security_groups=[{"name": "web"}]),
+        ]
+        self.secgroup = Mock(id="sg1", tenant_id="t1")
+        self.secgroup.name = "default"
+        self.cloud = Mock()
+        self.cloud.nova.servers.list.return_value = self.servers
+        self.cloud.nova.security_groups.list.return_value = [self.secgroup]
+        self.cloud.keystone.tenants.list.return_value = []
+        self.cloud.keystone.users.list.return_value = []
+        self.inventory = inventory.SourceInventory(self.cloud)
+
+    def test_get_server(self):
+        server = self.inventory.get_server("srv1")
+        self.inventory.get_server("srv2")
+        self.assertEqual(self.servers[0], server)
+        self.cloud.nova.servers.list.assert_called_once_with(
+            search_opts={"all_tenants": 1})
+        self.assertFalse(self.cloud.nova.servers.get.called)
+
+    def test_get_missing(self):
+        tenant = self.inventory.get_tenant("t1")
+        self.inventory.get_tenant("t1")
+        self.assertEqual(self.cloud.keystone.tenants.get.return_value, tenant)
+        self.cloud.keystone.tenants.get.assert_called_once_with("t1")
+
+    def test_list_servers(self):
+        servers = self.inventory.list_servers("t2")
+        self.assertEqual([self.servers[1]], servers)
+
+    def test_list_roles(self):
+        roles = self.inventory.list_roles("u1", "t1")
+        self.inventory.list_roles("u1", "t1")
+        self.assertEqual(self.cloud.keystone.users.list_roles.return_value,
+                         roles)
+        self.cloud.keystone.users.list_roles.assert_called_once_with(
+            "u1", tenant="t1")
+
+    def test_list_server_secgroups(self):
+        secgroups = self.inventory.list_server_secgroups(self.servers[0])
+        self.assertEqual([self.secgroup], secgroups)
+        self.assertFalse(self.servers[0].list_security_group.called)
+
+    def test_list_server_secgroups_missing(self):
+        secgroups = self.inventory.list_server_secgroups(self.servers[1])
+        self.assertEqual(self.servers[1].list_security_group.return_value,
+                         secgroups)
+
+    def test_get_image(self):
+        image = self.inventory.get_image("img1")
+        self.inventory.get_image("img1")
+        self.assertEqual(self.cloud.glance.images.get.return_value, image)
+        self.cloud.glance.images.get.assert_called_once_with("img1")
+
+    def test_prefetch(self):
+        fetch = Mock(side_effect=[None, Exception, None])
+        fetched = self.inventory.prefetch(fetch, ["a", "b", "c"], workers=1)
+        self.assertEqual(["a", "c"], fetched)
+        self.assertEqual(3, fetch.call_count)
+
+    def test_prefetch_resources(self):
+        self.servers[1].image = {"id": "img1"}
+        self.inventory.prefetch_resources("t2")
+        self.cloud.keystone.tenants.get.assert_called_once_with("t2")
+        self.cloud.keystone.users.get.assert_called_once_with(
+            self.servers[1].user_id)
+        self.cloud.keystone.users.list_roles.assert_called_once_with(
+            self.servers[1].user_id, tenant="t2")
+        self.cloud.glance.images.get.assert_called_once_with("img1")
+
+
+class SnapshotTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "inventory.sqlite")
+        self.cloud = Mock()
+        self.cloud.name = "source"
+        self.cloud.namespace.auth_url = "http://keystone/v2.0"
+        self.loader = Mock(return_value=[{"id": "net1"}])
+        self.snapshot = inventory.Snapshot(ttls={"networks": 10})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_get(self):
+        self.snapshot.get(self.cloud, "networks", self.loader)
+        listing = self.snapshot.get(self.cloud, "networks", self.loader)
+        self.assertEqual([{"id": "net1"}], listing)
+        self.loader.assert_called_once_with()
+
+    def test_get_copy(self):
+        self.snapshot.get(self.cloud, "networks", self.loader)
+        listing = self.snapshot.get(self.cloud, "networks", self.loader)
+        listing[0]["id"] = "net2"
+        listing = self.snapshot.get(self.cloud, "networks", self.loader)
+        self.assertEqual([{"id": "net1"}], listing)
+
+    @patch("time.time")
+    def test_get_expired(self, mock_time):
+        mock_time.return_value = 100
+        self.snapshot.get(self.cloud, "networks", self.loader)
+        mock_time.return_value = 111
+        self.snapshot.get(self.cloud, "networks", self.loader)
+        self.assertEqual(2, self.loader.call_count)
+
+    def test_get_disabled(self):
+        snapshot = inventory.Snapshot(enabled=False)
+        snapshot.get(self.cloud, "networks", self.loader)
+        snapshot.get(self.cloud, "networks", self.loader)
+        self.assertEqual(2, self.loader.call_count)
+
+    def test_get_persistent(self):
+        snapshot = inventory.Snapshot(path=self.path)
+        snapshot.get(self.cloud, "networks", self.loader)
+        snapshot = inventory.Snapshot(path=self.path)
+        listing = snapshot.get(self.cloud, "networks", self.loader)
+        self.assertEqual([{"id": "net1"}], listing)
+        self.loader.assert_called_once_with()
+
+    def test_invalidate(self):
+        snapshot = inventory.Snapshot(path=self.path)
+        snapshot.get(self.cloud, "networks", self.loader)
+        snapshot.get(self.cloud, "servers", self.loader)
+        snapshot.invalidate(self.cloud, "networks")
+        snapshot = inventory.Snapshot(path=self.path)
+        snapshot.get(self.cloud, "servers", self.loader)
+        snapshot.get(self.cloud, "networks", self.loader)
+        self.assertEqual(3, self.loader.call_count)
+
+    def test_invalidate_other_process(self):
+        snapshot = inventory.Snapshot(path=self.path)
+        snapshot.get(self.cloud, "networks", self.loader)
+        inventory.Snapshot(path=self.path).invalidate(self.cloud, "networks")
+        snapshot.get(self.cloud, "networks", self.loader)
+        self.assertEqual(2, self.loader.call_count)
+
+    def test_get_replaced_other_process(self):
+        snapshot = inventory.Snapshot(path=self.path)
+        snapshot.get(self.cloud, "networks", self.loader)
+        other = inventory.Snapshot(path=self.path)
+        other.invalidate(self.cloud, "networks")
+        other.get(self.cloud, "networks", Mock(return_value=[{"id": "net2"}]))
+        listing = snapshot.get(self.cloud, "networks", self.loader)
+        self.assertEqual([{"id": "net2"}], listing)
+        self.loader.assert_called_once_with()
+
+    def test_invalidate_all(self):
+        self.snapshot.get(self.cloud, "networks", self.loader)
+        self.snapshot.get(self.cloud, "servers", self.loader)
+        self.snapshot.invalidate(self.cloud)
+        self.snapshot.get(self.cloud, "networks", self.loader)
+        self.snapshot.get(self.cloud, "servers", self.loader)
+        self.assertEqual(4, self.loader.call_count)
+
+
+class ImageIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.images = [
+            {"id": "img1", "checksum": "c1", "size": 1, "name": "cirros",
+             "status": "active"},
+            {"id": "img2", "checksum": None, "size": 2, "name": "empty",
+             "status": "active"},
+            {"id": "img3", "checksum": "c3", "size": 3, "name": "broken",
+             "status": "queued"},
+        ]
+        self.cloud = Mock()
+        self.cloud.glance.images.list.return_value = self.images
+        self.index = inventory.ImageIndex(self.cloud)
+
+    def test_find(self):
+        image = self.index.find({"checksum": "c1", "size": 1,
+                                 "name": "cirros"})
+        self.index.find({"checksum": "c1", "size": 1, "name": "other"})
+        self.assertEqual("img1", image["id"])
+        self.cloud.glance.images.list.assert_called_once_with()
+
+    def test_find_without_checksum(self):
+        image = self.index.find({"size": 2, "name": "empty"})
+        self.assertEqual("img2", image["id"])
+
+    def test_find_inactive(self):
+        self.assertIsNone(self.index.find({"checksum": "c3", "size": 3,
+                                           "name": "broken"}))
+
+    def test_add(self):
+        new_image = {"id": "img4", "checksum": "c4", "size": 4,
+                     "name": "new"}
+        self.index.add(new_image)
+        self.assertIsNone(self.index.find(new_image))
+        self.index.add(new_image)
+        self.assertEqual(new_image, self.index.find(new_image))
+
+    def test_remove(self):
+        image = dict(self.images[0])
+        self.index.remove(image)
+        self.assertIsNotNone(self.index.find(image))
+        self.index.remove(dict(image, id="img4"))
+        self.assertIsNotNone(self.index.find(image))
+        self.index.remove(image)
+        self.assertIsNone(self.index.find(image))
+
+
+if __name__ == "__main__":
+    unittest.main()
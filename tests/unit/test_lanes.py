@@ -0,0 +1,30 @@
+import unittest
+
+from pumphouse import lanes
+
+
+class LanesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.lanes = lanes.Lanes({"glance.dst": 1, "nova.boot": 2})
+
+    def test_acquire(self):
+        acquired = self.lanes.acquire(["nova.boot", "glance.dst", "other"])
+        self.assertEqual([self.lanes.semaphores["glance.dst"],
+                          self.lanes.semaphores["nova.boot"]], acquired)
+        self.assertFalse(
+            self.lanes.semaphores["glance.dst"].acquire(blocking=False))
+        self.assertTrue(
+            self.lanes.semaphores["nova.boot"].acquire(blocking=False))
+
+    def test_release(self):
+        acquired = self.lanes.acquire(["glance.dst"])
+        self.lanes.release(acquired)
+        self.assertTrue(
+            self.lanes.semaphores["glance.dst"].acquire(blocking=False))
+
+    def test_unlimited(self):
+        self.assertEqual([], lanes.Lanes().acquire(["glance.dst"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
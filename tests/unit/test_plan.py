@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock
+from taskflow.patterns import linear_flow
+
+from pumphouse import plan
+from pumphouse import task
+from pumphouse.bindings import Binding
+
+
+class FakeTask(task.BaseCloudTask):
+    def execute(self):
+        pass
+
+
+class HistoryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "history.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_throughput_default(self):
+        history = plan.History(self.path, default=42)
+        self.assertEqual(42, history.throughput())
+
+    def test_throughput(self):
+        history = plan.History(self.path, size=2)
+        history.record(100, 100)
+        history.record(300, 10)
+        history.record(100, 10)
+        self.assertEqual(20.0, plan.History(self.path).throughput())
+
+    def test_record_without_path(self):
+        history = plan.History()
+        history.record(100, 10)
+        self.assertEqual([], history.load())
+
+
+class MakePlanTestCase(unittest.TestCase):
+    def setUp(self):
+        self.image = {"id": "img1", "owner": "t1", "size": 100}
+        self.volume = Mock(size=2)
+        setattr(self.volume, "os-vol-tenant-attr:tenant_id", "t2")
+        self.context = Mock()
+        self.context.store = {
+            Binding("image", "img1"): "img1",
+            Binding("volume", "vol1", "retrieve"): "vol1",
+            Binding("user", "public", "ensure"): None,
+        }
+        self.context.inventory.get_image.return_value = self.image
+        self.context.inventory.get_volume.return_value = self.volume
+        self.flow = linear_flow.Flow("test").add(
+            FakeTask(Mock(), name="image-img1-ensure"),
+            FakeTask(Mock(), name="volume-vol1-ensure"),
+        )
+
+    def test_make_plan(self):
+        migration_plan = plan.make_plan(self.context, self.flow)
+        self.assertEqual({
+            "t1": {"images": 100, "volumes": 0, "snapshots": 0},
+            "t2": {"images": 0, "volumes": 2 * plan.GiB, "snapshots": 0},
+        }, migration_plan["tenants"])
+        self.assertEqual({"FakeTask": 2}, migration_plan["tasks"])
+        self.assertEqual(100 + 2 * plan.GiB, migration_plan["bytes"])
+
+    def test_estimate(self):
+        history = plan.History(default=plan.GiB)
+        migration_plan = plan.make_plan(self.context, self.flow)
+        self.assertAlmostEqual(2.0, plan.estimate(migration_plan, history),
+                               places=3)
+
+
+if __name__ == "__main__":
+    unittest.main()
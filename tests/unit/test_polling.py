@@ -0,0 +1,91 @@
+import unittest
+
+from mock import Mock, patch
+
+from pumphouse import polling
+
+
+class PollerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.resources = [Mock(id="r1", status="active"),
+                          Mock(id="r2", status="building")]
+        self.list_resources = Mock(return_value=self.resources)
+        self.get_resource = Mock()
+        self.poller = polling.Poller(self.list_resources, self.get_resource,
+                                     interval=10)
+
+    @patch("pumphouse.polling.time")
+    def test_get(self, time_mock):
+        time_mock.time.return_value = 100.0
+        self.assertEqual(self.resources[0], self.poller.get("r1"))
+        self.assertEqual(self.resources[1], self.poller.get("r2"))
+        time_mock.time.return_value = 105.0
+        self.poller.get(self.resources[0])
+        self.assertEqual(1, self.list_resources.call_count)
+        time_mock.time.return_value = 110.0
+        self.poller.get("r1")
+        self.assertEqual(2, self.list_resources.call_count)
+        self.assertFalse(self.get_resource.called)
+
+    @patch("pumphouse.polling.time")
+    def test_watch(self, time_mock):
+        time_mock.time.return_value = 100.0
+        self.poller.get("r1")
+        time_mock.time.return_value = 101.0
+        get = self.poller.watch()
+        get("r1")
+        get("r1")
+        self.assertEqual(2, self.list_resources.call_count)
+
+    def test_missing(self):
+        self.get_resource.side_effect = KeyError
+        self.assertRaises(KeyError, self.poller.get, "r3")
+        self.get_resource.assert_called_once_with("r3")
+
+    @patch("pumphouse.polling.time")
+    def test_list_error(self, time_mock):
+        time_mock.time.return_value = 100.0
+        self.list_resources.side_effect = RuntimeError
+        self.poller.get("r1")
+        self.poller.get("r1")
+        self.assertEqual(1, self.list_resources.call_count)
+        self.assertEqual(2, self.get_resource.call_count)
+        time_mock.time.return_value = 120.0
+        self.list_resources.side_effect = None
+        self.assertEqual(self.resources[0], self.poller.get("r1"))
+        self.assertEqual(2, self.list_resources.call_count)
+        self.assertEqual(2, self.get_resource.call_count)
+
+    @patch("pumphouse.polling.time")
+    def test_list_error_backoff(self, time_mock):
+        self.list_resources.side_effect = RuntimeError
+        for now in (100.0, 120.0, 130.0, 160.0):
+            time_mock.time.return_value = now
+            self.poller.get("r1")
+        self.assertEqual(3, self.list_resources.call_count)
+        self.assertEqual(240.0, self.poller.retry_at)
+
+
+class GetPollerTestCase(unittest.TestCase):
+    def test_shared(self):
+        cloud = Mock()
+        poller = polling.get_poller(cloud, "volumes")
+        self.assertIs(poller, polling.get_poller(cloud, "volumes"))
+        self.assertIsNot(poller, polling.get_poller(cloud, "servers"))
+        self.assertIsNot(poller, polling.get_poller(Mock(), "volumes"))
+        poller.list_resources()
+        cloud.cinder.volumes.list.assert_called_once_with(
+            search_opts={"all_tenants": 1})
+
+    def test_images(self):
+        cloud = Mock()
+        cloud.glance.images.list.side_effect = lambda **kwargs: iter(
+            [kwargs["filters"]["status"]])
+        poller = polling.get_poller(cloud, "images")
+        self.assertEqual(["queued", "saving"], list(poller.list_resources()))
+        cloud.glance.images.list.assert_called_with(
+            page_size=polling.IMAGE_PAGE_SIZE, filters={"status": "saving"})
+
+
+if __name__ == "__main__":
+    unittest.main()
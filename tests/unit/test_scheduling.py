@@ -0,0 +1,104 @@
+import threading
+import unittest
+
+from mock import Mock
+from taskflow.patterns import graph_flow
+from taskflow import task
+
+from pumphouse import exceptions
+from pumphouse import scheduling
+from pumphouse.bindings import Binding
+
+
+class FakeTask(task.Task):
+    def execute(self, **kwargs):
+        pass
+
+
+class PriorityExecutorTestCase(unittest.TestCase):
+    def test_order(self):
+        started = threading.Event()
+        blocker = threading.Event()
+        calls = []
+
+        def block(_):
+            started.set()
+            blocker.wait()
+
+        executor = scheduling.PriorityExecutor(1, {"a": (0, -1),
+                                                   "b": (0, -5)})
+        executor.submit(block, FakeTask(name="first"))
+        started.wait()
+        fs = [executor.submit(calls.append, FakeTask(name=name))
+              for name in ("c", "a", "b")]
+        blocker.set()
+        executor.shutdown()
+        self.assertTrue(all(future.done() for future in fs))
+        self.assertEqual(["b", "a", "c"], [t.name for t in calls])
+
+    def test_exception(self):
+        executor = scheduling.PriorityExecutor(1, {})
+        future = executor.submit(Mock(side_effect=ValueError))
+        self.assertRaises(ValueError, future.result)
+        executor.shutdown()
+
+
+class GetPrioritiesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.images = {
+            "img1": {"id": "img1", "owner": "t1", "size": 100},
+            "img2": {"id": "img2", "owner": "t2", "size": 10},
+            "img3": {"id": "img3", "owner": "t2", "size": 20},
+        }
+        self.context = Mock()
+        self.context.store = dict((Binding("image", image_id), image_id)
+                                  for image_id in self.images)
+        self.context.inventory.get_image.side_effect = self.images.get
+        self.flow = graph_flow.Flow("test").add(
+            FakeTask(name=Binding("tenant", "t1", "ensure"),
+                     provides="t1"),
+            FakeTask(name=Binding("image", "img1", "ensure"),
+                     requires=["t1"]),
+            FakeTask(name=Binding("image", "img2", "ensure")),
+            FakeTask(name=Binding("image", "img3", "ensure")),
+        )
+
+    def get_priorities(self, tenants=None):
+        scheduler = scheduling.Scheduler(workers=1, tenants=tenants)
+        return scheduler.get_priorities(self.context, self.flow)
+
+    def get_order(self, priorities):
+        return [name for name, _ in sorted(priorities.items(),
+                                           key=lambda item: item[1])]
+
+    def test_largest_first(self):
+        priorities = self.get_priorities()
+        self.assertEqual((0, -100), priorities["tenant-t1-ensure"])
+        self.assertEqual(["image-img1-ensure", "tenant-t1-ensure",
+                          "image-img3-ensure", "image-img2-ensure"],
+                         self.get_order(priorities))
+
+    def test_smallest_tenant_first(self):
+        priorities = self.get_priorities(tenants="smallest")
+        self.assertEqual(["image-img3-ensure", "image-img2-ensure",
+                          "image-img1-ensure", "tenant-t1-ensure"],
+                         self.get_order(priorities))
+
+    def test_chain_counted_once(self):
+        self.flow.add(
+            FakeTask(name=Binding("image", "img2", "upload"),
+                     provides="img2-upload"),
+            FakeTask(name=Binding("image", "img2", "verify"),
+                     requires=["img2-upload"]),
+        )
+        priorities = self.get_priorities()
+        self.assertEqual((0, -10), priorities["image-img2-upload"])
+        self.assertEqual((0, 0), priorities["image-img2-verify"])
+
+    def test_unknown_order(self):
+        self.assertRaises(exceptions.ConfigError,
+                          scheduling.Scheduler, tenants="random")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from pumphouse import timeouts
+
+
+class RatesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "rates.json")
+        self.rates = timeouts.Rates(self.path, default=100, size=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_rate(self):
+        self.assertEqual(100, self.rates.rate("source", "volume-upload"))
+        for size, duration in ((1000, 1), (3000, 1), (5000, 1)):
+            self.rates.record("source", "volume-upload", size, duration)
+        self.rates.record("source", "volume-upload", None, 1)
+        self.assertEqual(4000, self.rates.rate("source", "volume-upload"))
+        self.assertEqual(100, self.rates.rate("destination",
+                                              "volume-upload"))
+        rates = timeouts.Rates(self.path)
+        self.assertEqual(4000, rates.rate("source", "volume-upload"))
+
+    def test_corrupted(self):
+        with open(self.path, "w") as f:
+            f.write("{")
+        self.assertEqual({}, timeouts.Rates(self.path).operations)
+
+
+class EstimateTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cloud = mock.Mock()
+        self.cloud.name = "source"
+        timeouts.configure({"rate": 100, "factor": 2})
+
+    def tearDown(self):
+        timeouts.configure(None)
+
+    def test_estimate(self):
+        self.assertEqual((2000, 30),
+                         timeouts.estimate(self.cloud, "volume-upload",
+                                           100000, 120))
+        self.assertEqual((120, 1),
+                         timeouts.estimate(self.cloud, "volume-upload",
+                                           100, 120))
+        self.assertEqual((120, 1),
+                         timeouts.estimate(self.cloud, "volume-upload",
+                                           None, 120))
+
+    def test_estimate_history(self):
+        timeouts.rates.record("source", "volume-upload", 10000, 1)
+        timeout, interval = timeouts.estimate(self.cloud, "volume-upload",
+                                              100000, 10)
+        self.assertEqual(20, timeout)
+
+    @mock.patch("pumphouse.timeouts.time")
+    @mock.patch("pumphouse.timeouts.utils")
+    def test_wait_for(self, utils_mock, time_mock):
+        utils_mock.wait_for.return_value = "resource"
+        time_mock.time.side_effect = [100.0, 110.0]
+        result = timeouts.wait_for(self.cloud, "volume-upload", 4000, 60,
+                                   "vol1", mock.sentinel.get,
+                                   value="available")
+        self.assertEqual("resource", result)
+        utils_mock.wait_for.assert_called_once_with(
+            "vol1", mock.sentinel.get, timeout=80, check_interval=2,
+            value="available")
+        self.assertEqual([{"bytes": 4000, "seconds": 10.0}],
+                         timeouts.rates.operations["source:volume-upload"])
+
+
+if __name__ == "__main__":
+    unittest.main()
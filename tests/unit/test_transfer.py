@@ -0,0 +1,381 @@
+import datetime
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from pumphouse import exceptions
+from pumphouse import transfer
+
+
+class RelayTestCase(unittest.TestCase):
+    def setUp(self):
+        self.data = mock.Mock()
+        self.size = 1024
+        self.data.next.side_effect = ["*" * 512] + ["*" * 512] + [None]
+        self.reporter = mock.Mock()
+        self.relay = transfer.Relay(self.data, self.size, self.reporter,
+                                    chunk_size=256, buffers=2)
+
+    def test_read(self):
+        chunk_one = self.relay.read(512)
+        chunk_two = self.relay.read(100)
+        chunk_three = self.relay.read()
+        chunk_rest = self.relay.read(1024)
+        chunk_none = self.relay.read(512)
+        self.assertEqual("*" * 512, chunk_one)
+        self.assertEqual("*" * 100, chunk_two)
+        self.assertEqual("*" * 156, chunk_three)
+        self.assertEqual("*" * 256, chunk_rest)
+        self.assertEqual("", chunk_none)
+        self.reporter.set_size.assert_called_once_with(self.size)
+        self.assertEqual([mock.call(512), mock.call(100), mock.call(156),
+                          mock.call(256)],
+                         self.reporter.update.call_args_list)
+
+    def test_read_iterable(self):
+        relay = transfer.Relay(iter(["ab", "cde", "f"]), 6, self.reporter,
+                               chunk_size=4, buffers=1)
+        self.assertEqual("abcd", relay.read())
+        self.assertEqual("ef", relay.read(10))
+        self.assertEqual("", relay.read())
+
+    def test_checksums(self):
+        relay = transfer.Relay(iter(["ab", "cde"]), 5, self.reporter)
+        while relay.read(2):
+            pass
+        self.assertEqual({"md5": hashlib.md5("abcde").hexdigest(),
+                          "sha256": hashlib.sha256("abcde").hexdigest()},
+                         relay.checksums())
+
+    def test_read_error(self):
+        self.data.next.side_effect = ["*" * 256, IOError("Broken")]
+        self.assertEqual("*" * 256, self.relay.read(256))
+        self.assertRaises(IOError, self.relay.read, 256)
+        self.reporter.abort.assert_called_once_with()
+        self.assertFalse(self.reporter.finish.called)
+
+    def test_close(self):
+        self.relay.close()
+        self.data.close.assert_called_once_with()
+        self.reporter.abort.assert_called_once_with()
+
+    def test_close_generator(self):
+        closed = []
+
+        def generate():
+            try:
+                while True:
+                    yield "*" * 256
+            finally:
+                closed.append(True)
+
+        relay = transfer.Relay(generate(), self.size, self.reporter,
+                               chunk_size=256, buffers=1)
+        self.assertEqual("*" * 256, relay.read(256))
+        relay.close()
+        relay.thread.join(5)
+        self.assertFalse(relay.thread.is_alive())
+        self.assertEqual([True], closed)
+
+    def test_isclosed(self):
+        self.data.isclosed.return_value = True
+        self.assertTrue(self.relay.isclosed())
+
+
+class ConfigureTestCase(unittest.TestCase):
+    def tearDown(self):
+        transfer.configure(None)
+
+    def test_configure(self):
+        transfer.configure({"chunk_size": 4096, "buffers": 3})
+        relay = transfer.Relay(iter([]), 0, mock.Mock())
+        self.assertEqual(4096, relay.chunk_size)
+        self.assertEqual(3, relay.chunks.maxsize)
+
+
+class SparseFileTestCase(unittest.TestCase):
+    def test_write(self):
+        with tempfile.TemporaryFile() as f:
+            sparse = transfer.SparseFile(f)
+            for chunk in ("ab", "\0" * 8, "cd", "\0" * 4):
+                sparse.write(chunk)
+            sparse.flush()
+            f.seek(0)
+            self.assertEqual("ab" + "\0" * 8 + "cd" + "\0" * 4, f.read())
+        self.assertEqual(12, sparse.skipped)
+
+    def test_is_zero(self):
+        self.assertTrue(transfer.is_zero("\0" * 16))
+        self.assertFalse(transfer.is_zero("\0" * 15 + "a"))
+
+
+class SpoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.spool = transfer.Spool(self.tmpdir, budget=2 ** 20)
+        self.data = ["abc", "de"]
+        self.checksum = hashlib.md5("abcde").hexdigest()
+        self.fetch = mock.Mock(side_effect=lambda offset: iter(self.data))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_iter_data(self):
+        first = "".join(self.spool.iter_data(self.checksum, self.fetch))
+        second = "".join(self.spool.iter_data(self.checksum, self.fetch))
+        self.assertEqual("abcde", first)
+        self.assertEqual("abcde", second)
+        self.assertEqual(1, self.fetch.call_count)
+        self.assertEqual([self.checksum], os.listdir(self.tmpdir))
+
+    def test_iter_data_wrong_checksum(self):
+        data = "".join(self.spool.iter_data("0" * 32, self.fetch))
+        self.assertEqual("abcde", data)
+        self.assertEqual([], os.listdir(self.tmpdir))
+
+    def test_iter_data_resume(self):
+        partial_path = os.path.join(self.tmpdir,
+                                    ".{}.part".format(self.checksum))
+        with open(partial_path, "w") as f:
+            f.write("abc")
+        self.data = ["de"]
+        data = "".join(self.spool.iter_data(self.checksum, self.fetch))
+        self.assertEqual("abcde", data)
+        self.fetch.assert_called_once_with(3)
+        self.assertEqual([self.checksum], os.listdir(self.tmpdir))
+
+    def test_iter_data_failure(self):
+        self.fetch.side_effect = lambda offset: self.fail_after("abc")
+        data = self.spool.iter_data(self.checksum, self.fetch)
+        self.assertRaises(IOError, "".join, data)
+        partial_path = os.path.join(self.tmpdir,
+                                    ".{}.part".format(self.checksum))
+        with open(partial_path) as f:
+            self.assertEqual("abc", f.read())
+
+    def test_iter_data_closed(self):
+        data = self.spool.iter_data(self.checksum, self.fetch)
+        self.assertEqual("abc", next(data))
+        data.close()
+        self.assertFalse(self.spool.get_lock(self.checksum).locked())
+        self.data = ["de"]
+        data = "".join(self.spool.iter_data(self.checksum, self.fetch))
+        self.assertEqual("abcde", data)
+
+    def fail_after(self, chunk):
+        yield chunk
+        raise IOError("Broken")
+
+    def test_evict(self):
+        for name, size, mtime in (("a", 2 ** 16, 100), ("b", 2 ** 16, 300),
+                                  ("c", 2 ** 16, 200), ("d", 0, 400)):
+            path = os.path.join(self.tmpdir, name)
+            with open(path, "w") as f:
+                f.write("*" * size)
+                if not size:
+                    f.truncate(2 ** 30)
+            os.utime(path, (mtime, mtime))
+        self.spool.budget = 2 ** 17
+        self.spool.evict()
+        self.assertEqual(["b", "c", "d"], sorted(os.listdir(self.tmpdir)))
+
+    def test_get_image_data(self):
+        cloud = mock.Mock()
+        cloud.glance.images.data.return_value = iter(self.data)
+        image_info = {"id": "img1", "checksum": self.checksum, "size": 5}
+        with mock.patch.object(transfer, "spool", self.spool):
+            data = "".join(transfer.get_image_data(cloud, image_info))
+            data += "".join(transfer.get_image_data(cloud, image_info))
+        self.assertEqual("abcde" * 2, data)
+        cloud.glance.images.data.assert_called_once_with("img1")
+
+
+class IterImageTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cloud = mock.Mock()
+        self.image_info = {"id": "img1", "size": 5}
+        self.resp = mock.Mock(status_code=206)
+        self.cloud.glance.images.http_client.get.return_value = (
+            self.resp, iter(["de"]))
+
+    def broken(self, *chunks):
+        for chunk in chunks:
+            yield chunk
+        raise IOError("Broken")
+
+    def test_resume(self):
+        self.cloud.glance.images.data.return_value = self.broken("ab", "c")
+        data = "".join(transfer.iter_image(self.cloud, self.image_info))
+        self.assertEqual("abcde", data)
+        self.cloud.glance.images.http_client.get.assert_called_once_with(
+            "/v2/images/img1/file", headers={"Range": "bytes=3-"})
+
+    def test_resume_without_range(self):
+        self.resp.status_code = 200
+        self.cloud.glance.images.http_client.get.return_value = (
+            self.resp, iter(["ab", "cde"]))
+        self.cloud.glance.images.data.return_value = self.broken("ab", "c")
+        data = "".join(transfer.iter_image(self.cloud, self.image_info))
+        self.assertEqual("abcde", data)
+
+    def test_retries_exceeded(self):
+        self.cloud.glance.images.data.return_value = self.broken("ab")
+        self.cloud.glance.images.http_client.get.side_effect = (
+            lambda *args, **kwargs: (self.resp, self.broken()))
+        data = transfer.iter_image(self.cloud, self.image_info, retries=2)
+        self.assertRaises(IOError, "".join, data)
+        self.assertEqual(2,
+                         self.cloud.glance.images.http_client.get.call_count)
+
+    def test_no_retry_at_end(self):
+        self.cloud.glance.images.data.return_value = self.broken("abcde")
+        data = transfer.iter_image(self.cloud, self.image_info)
+        self.assertRaises(IOError, "".join, data)
+        self.assertFalse(self.cloud.glance.images.http_client.get.called)
+
+
+@mock.patch("pumphouse.transfer.time")
+class TokenBucketTestCase(unittest.TestCase):
+    def test_consume(self, time_mock):
+        time_mock.time.return_value = 100.0
+        bucket = transfer.TokenBucket(rate=100)
+        bucket.consume(100)
+        self.assertFalse(time_mock.sleep.called)
+        bucket.consume(50)
+        time_mock.sleep.assert_called_once_with(0.5)
+        time_mock.time.return_value = 100.25
+        bucket.consume(5)
+        time_mock.sleep.assert_called_with(0.3)
+
+    def test_unlimited(self, time_mock):
+        bucket = transfer.TokenBucket()
+        bucket.consume(2 ** 30)
+        self.assertFalse(time_mock.sleep.called)
+
+
+class GovernorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.governor = transfer.Governor({
+            "read": 100,
+            "write": 200,
+            "profiles": [
+                {"start": "09:00", "end": "18:00", "read": 10},
+                {"start": "22:00", "end": "06:00", "read": None,
+                 "write": None},
+            ],
+        })
+
+    def get_limits(self, hour):
+        return self.governor.get_limits(datetime.datetime(2014, 1, 1, hour))
+
+    def test_get_limits(self):
+        self.assertEqual({"read": 100, "write": 200}, self.get_limits(7))
+        self.assertEqual({"read": 10, "write": None}, self.get_limits(12))
+        self.assertEqual({"read": None, "write": None}, self.get_limits(23))
+        self.assertEqual({"read": None, "write": None}, self.get_limits(3))
+
+    def test_wrong_profile(self):
+        self.assertRaises(exceptions.ConfigError, transfer.Governor,
+                          {"profiles": [{"start": "25:00", "end": "1:00"}]})
+
+    def test_rotate(self):
+        telemetry = transfer.Telemetry(size=1)
+        for started in (100.0, 105.0):
+            telemetry.record({"started": started})
+        self.assertEqual([{"started": 105.0}], list(telemetry.records))
+
+    @mock.patch("pumphouse.transfer.events")
+    def test_report(self, events_mock):
+        governor = transfer.Governor({"period": 0})
+        governor.read(10)
+        self.assertEqual(1, events_mock.emit.call_count)
+        event = events_mock.emit.call_args[0][1]
+        self.assertEqual("bandwidth", event["type"])
+        self.assertEqual(0, event["data"]["write"])
+        self.assertIsNone(event["data"]["read_limit"])
+
+
+class TelemetryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.telemetry = transfer.Telemetry()
+        for started, ttfb in ((100.0, 1.0), (105.0, 3.0)):
+            self.telemetry.record({
+                "bytes": 1000.0,
+                "started": started,
+                "elapsed": 5.0,
+                "ttfb": ttfb,
+                "average": 200.0,
+                "stalls": 1,
+            })
+
+    def test_summary(self):
+        self.assertEqual({
+            "transfers": 2,
+            "bytes": 2000.0,
+            "elapsed": 10.0,
+            "throughput": 200.0,
+            "average": 200.0,
+            "ttfb": 3.0,
+            "stalls": 2,
+        }, self.telemetry.summary())
+
+    def test_summary_since(self):
+        self.assertEqual(1, self.telemetry.summary(since=101.0)["transfers"])
+        self.assertIsNone(self.telemetry.summary(since=200.0))
+
+    def test_rotate(self):
+        telemetry = transfer.Telemetry(size=1)
+        for started in (100.0, 105.0):
+            telemetry.record({"started": started})
+        self.assertEqual([{"started": 105.0}], list(telemetry.records))
+
+    @mock.patch("pumphouse.transfer.events")
+    def test_report(self, events_mock):
+        summary = self.telemetry.report()
+        self.assertEqual(2, summary["transfers"])
+        self.assertEqual(1, events_mock.emit.call_count)
+
+
+class CopyVolumeTestCase(unittest.TestCase):
+    def test_copy_volume(self):
+        src = tempfile.TemporaryFile()
+        src.write("ab" + "\0" * 6)
+        src.seek(0)
+        dst = tempfile.TemporaryFile()
+        dst.write("\0" * 8)
+        dst.seek(0)
+        reporter = mock.Mock()
+        transfer.copy_volume(src, dst, reporter)
+        dst.seek(0)
+        self.assertEqual("ab" + "\0" * 6, dst.read())
+        reporter.update.assert_called_once_with(8)
+        reporter.finish.assert_called_once_with()
+
+    def test_copy_volume_error(self):
+        src = mock.Mock()
+        src.read.side_effect = IOError("Broken")
+        reporter = mock.Mock()
+        self.assertRaises(IOError, transfer.copy_volume, src,
+                          tempfile.TemporaryFile(), reporter)
+        reporter.abort.assert_called_once_with()
+        self.assertFalse(reporter.finish.called)
+
+    def test_sync_volume(self):
+        src = tempfile.TemporaryFile()
+        src.write("ab" + "\0" * 6)
+        src.seek(0)
+        dst = tempfile.TemporaryFile()
+        dst.write("ac" + "\0" * 6)
+        dst.seek(0)
+        reporter = mock.Mock()
+        with mock.patch.dict(transfer.options, {"chunk_size": 4}):
+            written = transfer.sync_volume(src, dst, reporter)
+        dst.seek(0)
+        self.assertEqual("ab" + "\0" * 6, dst.read())
+        self.assertEqual(4, written)
+        self.assertEqual([mock.call(4), mock.call(4)],
+                         reporter.update.call_args_list)